@@ -1,36 +1,282 @@
 from __future__ import unicode_literals
 
+import base64
 from collections import OrderedDict
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.http import StreamingHttpResponse
 from django.template import Context, loader
+import hashlib
+import json
 import logging
 from rest_framework import pagination
 from rest_framework.response import Response
 
+from .renderers import JSONRenderer
+from .. import exc
+from ..util import cache, qpbool
+
 
 log = logging.getLogger(__name__)
 
+_FALSY = set([
+    'false', 'no', 'off', '0'
+])
+
+
+def encode_cursor(values):
+    """Return an opaque cursor for the key values of the last result."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)))
+
+
+def decode_cursor(cursor, fields, queryset):
+    """
+    Return the key values stored in a cursor, converted by their fields.
+
+    :param cursor:
+        Cursor returned by ``encode_cursor()``
+
+    :param fields:
+        Names of the key fields
+
+    :param queryset:
+        Queryset of the results, used to validate the values
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise exc.BadRequest('Invalid cursor: %r' % cursor)
+
+    # Values that can't be sent to the database would fail the query.
+    meta = queryset.model._meta
+    connection = connections[queryset.db]
+    try:
+        for idx, name in enumerate(fields):
+            field = meta.get_field(name)
+            values[idx] = field.to_python(values[idx])
+            if values[idx] is None:
+                raise ValueError('%s is null' % name)
+            field.get_db_prep_value(
+                field.get_prep_value(values[idx]), connection
+            )
+    except (exc.DjangoValidationError, exc.ValidationError, TypeError,
+            ValueError):
+        raise exc.BadRequest('Invalid cursor: %r' % cursor)
+    return values
+
+
+def keyset_filter(fields, values):
+    """
+    Return a filter for the rows that come after ``values`` when ordering by
+    ``fields``.
+
+    For fields ``(a, b)`` this is ``a > x OR (a = x AND b > y)``.
+    """
+    query = Q()
+    for idx, field in enumerate(fields):
+        condition = Q(**{field + '__gt': values[idx]})
+        for prev_field, prev_value in zip(fields[:idx], values[:idx]):
+            condition &= Q(**{prev_field: prev_value})
+        query |= condition
+    return query
+
+
+def count_exact(queryset):
+    """Count results with ``COUNT(*)``."""
+    return pagination._get_count(queryset)
+
+
+def count_cached(queryset):
+    """
+    Count results with ``COUNT(*)``, caching the count for up to
+    ``COUNT_CACHE_TIMEOUT`` seconds.
+
+    The cache key includes the SQL of the query and the version of the
+    resource type, so any write to that resource type (including to its
+    attributes) invalidates the count.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except (AttributeError, EmptyResultSet):
+        return count_exact(queryset)
+
+    version = cache.get_version(queryset.model.__name__)
+    digest = hashlib.md5(
+        (u'%s%r%s' % (sql, params, version)).encode('utf-8')
+    ).hexdigest()
+    key = 'nsot:count:%s' % digest
+
+    count = cache.tiered_cache.get(key)
+    if count is None:
+        count = count_exact(queryset)
+        timeout = getattr(settings, 'COUNT_CACHE_TIMEOUT', 60)
+        cache.tiered_cache.set(key, count, timeout)
+    return count
+
+
+def count_estimated(queryset):
+    """
+    Estimate the number of results from the statistics of the query planner.
+
+    This is only supported on Postgres and MySQL, and falls back to an exact
+    count on other databases. Estimates below ``COUNT_ESTIMATE_THRESHOLD``
+    are not accurate enough to be useful, so they are replaced by an exact
+    count, which is cheap at that size anyway.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except (AttributeError, EmptyResultSet):
+        return count_exact(queryset)
+
+    connection = connections[queryset.db]
+    estimate = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, basestring):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+        elif connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [col[0] for col in cursor.description]
+            row = cursor.fetchone()
+            if row is not None:
+                estimate = dict(zip(columns, row)).get('rows')
+
+    threshold = getattr(settings, 'COUNT_ESTIMATE_THRESHOLD', 1000)
+    if estimate is None or estimate < threshold:
+        return count_exact(queryset)
+    return int(estimate)
+
+
+# Mapping of count strategy names to count functions.
+COUNT_STRATEGIES = {
+    'exact': count_exact,
+    'cached': count_cached,
+    'estimated': count_estimated,
+}
+
 
 class CustomPagination(pagination.LimitOffsetPagination):
-    """Custom pagination that always shows pagination controls in list view."""
+    """
+    Custom pagination that always shows pagination controls in list view.
+
+    Two modes are supported:
+
+    + Limit/offset (the default)
+    + Keyset, if the ``cursor`` query param is passed (empty for the first
+      page). Results are ordered by the ``cursor_fields`` of the view
+      (default: ``('id',)``) and the response includes an opaque ``next``
+      cursor instead of the offset. Any page costs the same as the first one.
+
+    In both modes, passing ``count=false`` skips counting the results and
+    omits ``total`` from the response. The ``count`` query param may also be
+    the name of a count strategy (``exact``, ``cached`` or ``estimated``) to
+    use instead of the ``count_strategy`` of the view (default: ``exact``).
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    default_cursor_fields = ('id',)
+    default_count_strategy = 'exact'
+
     def paginate_queryset(self, queryset, request, view=None):
+        return list(self.slice_queryset(queryset, request, view))
+
+    def get_cursor_fields(self, queryset, view=None):
+        """
+        Return the fields used to order results in keyset mode.
+
+        Detail routes may list a different resource type than the one of the
+        view, in which case the default fields are used.
+        """
+        view_queryset = getattr(view, 'queryset', None)
+        if view_queryset is None or view_queryset.model != queryset.model:
+            return self.default_cursor_fields
+        return getattr(view, 'cursor_fields', self.default_cursor_fields)
+
+    def get_count_func(self, request, view=None):
+        """
+        Return the function used to count results, or ``None`` if results
+        shouldn't be counted.
+        """
+        strategy = request.query_params.get(self.count_query_param)
+        if strategy is None or qpbool(strategy):
+            strategy = getattr(
+                view, 'count_strategy', self.default_count_strategy
+            )
+        elif strategy.lower() in _FALSY:
+            return None
+
+        try:
+            return COUNT_STRATEGIES[strategy]
+        except KeyError:
+            raise exc.BadRequest('Invalid count strategy: %r' % strategy)
+
+    def slice_queryset(self, queryset, request, view=None):
+        """
+        Like ``paginate_queryset()``, but return the page without evaluating
+        it.
+        """
         self.limit = self.get_limit(request)
         # This is so we can always display pagination without having to specify
         # an upper limite.
         # if self.limit is None:
         #     return None
 
-        self.offset = self.get_offset(request)
-        self.count = pagination._get_count(queryset)
         self.request = request
-        if self.count > self.limit and self.template is not None:
-            self.display_page_controls = True
+        self.use_cursor = self.cursor_query_param in request.query_params
+        count_func = self.get_count_func(request, view)
+        self.use_count = count_func is not None
+        self.count = None
+        if self.use_count:
+            self.count = count_func(queryset)
+            if self.count > self.limit and self.template is not None:
+                self.display_page_controls = True
+
+        if self.use_cursor:
+            return self.slice_queryset_by_cursor(queryset, view)
+
+        self.offset = self.get_offset(request)
 
         # If we have a limit, slice it
         if self.limit:
-            return list(queryset[self.offset:self.offset + self.limit])
+            return queryset[self.offset:self.offset + self.limit]
         # Otherwise only slice from the offset
         else:
-            return list(queryset[self.offset:])
+            return queryset[self.offset:]
+
+    def slice_queryset_by_cursor(self, queryset, view=None):
+        """Return the page after the cursor, and set the ``next`` cursor."""
+        fields = self.get_cursor_fields(queryset, view)
+        queryset = queryset.order_by(*fields)
+
+        cursor = self.request.query_params[self.cursor_query_param]
+        if cursor:
+            values = decode_cursor(cursor, fields, queryset)
+            queryset = queryset.filter(keyset_filter(fields, values))
+
+        self.next_cursor = None
+        if not self.limit:
+            return queryset
+
+        # Only fetch the key of the last result and whether there are more.
+        last = list(
+            queryset.values_list(*fields)[self.limit - 1:self.limit + 1]
+        )
+        if len(last) > 1:
+            # Values aren't converted to Python by ``values_list()``.
+            meta = queryset.model._meta
+            self.next_cursor = encode_cursor(
+                meta.get_field(field).to_python(value)
+                for field, value in zip(fields, last[0])
+            )
+
+        return queryset[:self.limit]
 
     def get_next_link(self):
         if not self.limit:
@@ -43,7 +289,8 @@ class CustomPagination(pagination.LimitOffsetPagination):
         return super(CustomPagination, self).get_previous_link()
 
     def get_html_context(self):
-        if self.limit is None:
+        # Page controls need an offset and a count.
+        if self.limit is None or self.use_cursor or not self.use_count:
             return {}
         return super(CustomPagination, self).get_html_context()
 
@@ -64,18 +311,56 @@ class CustomPagination(pagination.LimitOffsetPagination):
         # If path is '/api/sites/1/attributes/', this is 'attributes'
         if result_key is None:
             result_key = self.request.path.rstrip('/').split('/')[-1]
+        page = OrderedDict()
+        if self.use_count:
+            page['total'] = self.count
+        page['limit'] = self.limit
+        if self.use_cursor:
+            page['next'] = self.next_cursor
+        else:
+            page['offset'] = self.offset
+        page[result_key] = data
+        # page['results'] = data  # Generic 'results' key
+
         return Response(
             OrderedDict([
                 ('status', 'ok'),
-                ('data', OrderedDict(
-                [
-                    ('total', self.count),
-                    ('limit', self.limit),
-                    ('offset', self.offset),
-                    # ('next', self.get_next_link()),
-                    # ('previous', self.get_previous_link()),
-                    (result_key, data),
-                    #('results', data),  # Generic 'results' key
-                ]))
+                ('data', page),
             ])
         )
+
+    def get_streaming_response(self, chunks, result_key=None, renderer=None,
+                               renderer_context=None, envelope=None):
+        """
+        Like ``get_paginated_response()``, but stream the response so that the
+        results never have to be held in memory all at once.
+
+        :param chunks:
+            Iterable of lists of serialized results
+
+        :param result_key:
+            If set, use this as the key to label the results data.
+
+        :param renderer:
+            Renderer that implements ``render_stream()`` (default: JSON)
+
+        :param renderer_context:
+            Context passed to the renderer
+
+        :param envelope:
+            Response data whose last value is the empty list of results
+            (default: the envelope of ``get_paginated_response()``)
+        """
+        if renderer is None:
+            renderer = JSONRenderer()
+
+        if envelope is None:
+            envelope = self.get_paginated_response([], result_key).data
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += '; charset=%s' % renderer.charset
+
+        return StreamingHttpResponse(
+            renderer.render_stream(envelope, chunks, renderer_context),
+            content_type=content_type
+        )
@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+
+"""
+Parsers for the alternate formats supported by the API. These always return
+a list of objects, so that they may be used for bulk creates and updates.
+"""
+
+import csv
+import json
+import logging
+import msgpack
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+
+log = logging.getLogger(__name__)
+
+
+__all__ = ('unflatten', 'NDJSONParser', 'CSVParser', 'MessagePackParser')
+
+
+def unflatten(obj):
+    """
+    Fold dotted keys (e.g. ``attributes.owner``) back into nested dicts. This
+    is the opposite of ``nsot.api.renderers.flatten()``.
+    """
+    out = {}
+    for key, value in obj.iteritems():
+        if '.' in key:
+            key, subkey = key.split('.', 1)
+            out.setdefault(key, {})[subkey] = value
+        else:
+            out[key] = value
+    return out
+
+
+class NDJSONParser(parsers.BaseParser):
+    """Newline-delimited JSON: one object per line."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        objects = []
+        for lineno, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                objects.append(json.loads(line.decode('utf-8')))
+            except ValueError as err:
+                raise ParseError(
+                    'NDJSON parse error on line %d - %s' % (lineno, err)
+                )
+        return objects
+
+
+class CSVParser(parsers.BaseParser):
+    """
+    CSV with a header row and a row per object.
+
+    Dotted columns (e.g. ``attributes.owner``) are folded into nested dicts.
+    Values that look like JSON lists or dicts are decoded, and empty values
+    are left out so that defaults apply.
+    """
+    media_type = 'text/csv'
+
+    def parse_value(self, value):
+        value = value.decode('utf-8')
+        if value[:1] in ('[', '{'):
+            try:
+                return json.loads(value)
+            except ValueError:
+                pass
+        return value
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            rows = list(csv.DictReader(stream))
+        except csv.Error as err:
+            raise ParseError('CSV parse error - %s' % err)
+
+        objects = []
+        for row in rows:
+            obj = {
+                key.decode('utf-8'): self.parse_value(value)
+                for key, value in row.iteritems()
+                if key is not None and value
+            }
+            objects.append(unflatten(obj))
+        return objects
+
+
+class MessagePackParser(parsers.BaseParser):
+    """MessagePack encoding of the same data as JSON."""
+    media_type = 'application/x-msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), encoding='utf-8')
+        except Exception as err:
+            raise ParseError('MessagePack parse error - %s' % err)
@@ -0,0 +1,223 @@
+from __future__ import unicode_literals
+
+"""
+Renderers for the alternate formats supported by the API.
+
+Renderers that implement ``render_stream()`` may be used to stream list
+results (see ``BaseNsotViewSet.stream_list()``).
+"""
+
+import csv
+import cStringIO
+import json
+import logging
+import msgpack
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+log = logging.getLogger(__name__)
+
+
+__all__ = (
+    'get_objects', 'flatten', 'JSONRenderer', 'NDJSONRenderer', 'CSVRenderer',
+    'MessagePackRenderer'
+)
+
+
+def get_objects(data, renderer_context=None):
+    """
+    Return the list of objects in a response envelope.
+
+    For list responses these are the results, for detail responses this is
+    the object and for errors this is the whole envelope.
+
+    :param data:
+        Response data
+
+    :param renderer_context:
+        Context passed to the renderer
+    """
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict) or data.get('status') != 'ok':
+        return [data]
+
+    payload = data.get('data')
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        return [data]
+
+    view = (renderer_context or {}).get('view')
+    for key in ('result_key_plural', 'result_key'):
+        result_key = getattr(view, key, None)
+        if result_key in payload:
+            objects = payload[result_key]
+            return objects if isinstance(objects, list) else [objects]
+    return [payload]
+
+
+def flatten(obj):
+    """
+    Flatten nested dicts (e.g. ``attributes``) into dotted keys.
+
+    >>> flatten({'id': 1, 'attributes': {'owner': 'jathan'}})
+    {'id': 1, 'attributes.owner': 'jathan'}
+    """
+    out = {}
+    for key, value in obj.iteritems():
+        if isinstance(value, dict):
+            for subkey, subvalue in value.iteritems():
+                out['%s.%s' % (key, subkey)] = subvalue
+        else:
+            out[key] = value
+    return out
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSON renderer that can also stream list results."""
+    def render_stream(self, envelope, chunks, renderer_context=None):
+        """
+        Render the JSON of a list response a chunk of results at a time.
+
+        The output is identical to ``render()`` of the complete envelope.
+
+        :param envelope:
+            Response data without the results
+
+        :param chunks:
+            Iterable of lists of serialized results
+        """
+        # The results are the last item of the envelope, so render it with no
+        # results and split it where they go.
+        head, tail = self.render(envelope).rsplit(b'[]', 1)
+        yield head + b'['
+        separator = b''
+        for chunk in chunks:
+            if not chunk:
+                continue
+            # Strip the brackets of the rendered list.
+            yield separator + self.render(chunk)[1:-1]
+            separator = b','
+        yield b']' + tail
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Newline-delimited JSON: one object per line, without the envelope.
+
+    Errors are rendered as their envelope on a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+    render_style = 'binary'
+
+    def render_objects(self, objects):
+        return b''.join(
+            json.dumps(
+                obj, cls=encoders.JSONEncoder, ensure_ascii=False,
+                separators=(',', ':')
+            ).encode('utf-8') + b'\n'
+            for obj in objects
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return self.render_objects(get_objects(data, renderer_context))
+
+    def render_stream(self, envelope, chunks, renderer_context=None):
+        for chunk in chunks:
+            yield self.render_objects(chunk)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    CSV with a header row and a row per object, without the envelope.
+
+    Nested dicts (e.g. ``attributes``) are flattened into dotted columns
+    (e.g. ``attributes.owner``). Lists are rendered as JSON, and so are
+    numbers, booleans and nulls except that nulls are left empty.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def get_columns(self, rows):
+        """Return the columns for the rows, plain ones first."""
+        columns = []
+        seen = set()
+        for row in rows:
+            for key in sorted(row):
+                if key not in seen:
+                    seen.add(key)
+                    columns.append(key)
+        return sorted(columns, key=lambda c: ('.' in c, c))
+
+    def format_value(self, value):
+        if value is None:
+            return b''
+        if isinstance(value, basestring):
+            return value.encode('utf-8') if isinstance(value, unicode) \
+                else value
+        return json.dumps(value, cls=encoders.JSONEncoder)
+
+    def render_rows(self, rows, columns, header=False):
+        out = cStringIO.StringIO()
+        writer = csv.writer(out)
+        if header and columns:
+            writer.writerow([c.encode('utf-8') for c in columns])
+        for row in rows:
+            writer.writerow([self.format_value(row.get(c)) for c in columns])
+        return out.getvalue()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = [flatten(obj) for obj in get_objects(data, renderer_context)]
+        return self.render_rows(rows, self.get_columns(rows), header=True)
+
+    def render_stream(self, envelope, chunks, renderer_context=None):
+        """
+        Render a chunk of results at a time. The columns are those of the
+        first chunk, plus all of the attributes that may be set on the
+        results (see ``BaseNsotViewSet.get_attribute_names()``).
+        """
+        renderer_context = renderer_context or {}
+        view = renderer_context.get('view')
+        model = renderer_context.get('model')
+
+        columns = None
+        for chunk in chunks:
+            rows = [flatten(obj) for obj in chunk]
+            if columns is None:
+                extra = {}
+                if view is not None and 'attributes' in chunk[0]:
+                    extra = dict.fromkeys(
+                        'attributes.%s' % name
+                        for name in view.get_attribute_names(model)
+                    )
+                columns = self.get_columns(rows + [extra])
+                yield self.render_rows(rows, columns, header=True)
+            else:
+                yield self.render_rows(rows, columns)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    MessagePack encoding of the same data as JSON, including the envelope.
+    This is not used for streamed list results.
+    """
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Round-trip through the JSON encoder to handle dates, decimals, etc.
+        data = json.loads(json.dumps(data, cls=encoders.JSONEncoder))
+        return msgpack.packb(data, use_bin_type=True)
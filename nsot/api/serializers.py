@@ -466,6 +466,24 @@ class InterfaceUpdateSerializer(BulkSerializerMixin,
         return obj
 
 
+############
+# Assignment
+############
+class AssignmentSerializer(NsotSerializer):
+    """Used for GET on Assignments."""
+    class Meta:
+        model = models.Assignment
+
+
+#####
+# Job
+#####
+class JobSerializer(NsotSerializer):
+    """Used for GET on Jobs."""
+    class Meta:
+        model = models.Job
+
+
 ###########
 # AuthToken
 ###########
@@ -26,6 +26,7 @@ sites_router.routes[0].mapping.update({
 })
 
 # Resources that are nested under /sites
+sites_router.register(r'assignments', views.AssignmentViewSet)
 sites_router.register(r'attributes', views.AttributeViewSet)
 sites_router.register(r'changes', views.ChangeViewSet)
 sites_router.register(r'devices', views.DeviceViewSet)
@@ -34,10 +35,12 @@ sites_router.register(r'networks', views.NetworkViewSet)
 sites_router.register(r'values', views.ValueViewSet)
 
 # Resources pinned to API index at /
+router.register(r'assignments', views.AssignmentViewSet)
 router.register(r'attributes', views.AttributeViewSet)
 router.register(r'changes', views.ChangeViewSet)
 router.register(r'devices', views.DeviceViewSet)
 router.register(r'interfaces', views.InterfaceViewSet)
+router.register(r'jobs', views.JobViewSet)
 router.register(r'networks', views.NetworkViewSet)
 router.register(r'users', views.UserViewSet)
 router.register(r'values', views.ValueViewSet)
@@ -45,6 +48,11 @@ router.register(r'values', views.ValueViewSet)
 # Wire up our API using automatic URL routing.
 # Additionally, we include login URLs for the browsable API.
 urlpatterns = [
+    # Batches of operations
+    url(r'^batch/$', views.BatchView.as_view(), name='batch'),
+    url(r'^sites/(?P<site_pk>[^/.]+)/batch/$', views.BatchView.as_view(),
+        name='site-batch'),
+
     # API routes
     url(r'^', include(router.urls)),
     url(r'^', include(sites_router.urls)),
@@ -58,4 +66,8 @@ urlpatterns = [
         name='authenticate'),
     url(r'^verify_token/', views.AuthTokenVerifyView.as_view(),
         name='verify_token'),
+
+    # Statistics of the in-process cache of the worker
+    url(r'^cache_stats/$', views.CacheStatsView.as_view(),
+        name='cache-stats'),
 ]
@@ -1,21 +1,40 @@
 from __future__ import unicode_literals
 
+from calendar import timegm
 from collections import namedtuple, OrderedDict
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.urlresolvers import Resolver404, resolve, reverse
+from django.db import transaction
 from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.encoding import force_text
+import datetime
+import io
+import ipaddress
+import itertools
+import json
 import logging
-from rest_framework import mixins, viewsets
+import os
+import re
+import time
+import urlparse
+from rest_framework import mixins, status, viewsets
 from rest_framework.views import APIView
 from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
 from rest_framework_bulk import mixins as bulk_mixins
-from rest_framework_extensions.cache.decorators import cache_response
 
 from . import auth
+from . import pagination
 from . import serializers
 from .. import exc
 from .. import models
-from ..util import cache, qpbool
+from .. import validators
+from ..util import cache, parse_timestamp, qpbool
 
 
 log = logging.getLogger(__name__)
@@ -28,9 +47,19 @@ class BaseNsotViewSet(viewsets.ReadOnlyModelViewSet):
     + Successful responses are in format ``{"status": "ok", "data": DATA}``
     + Error responses are in format ``{"status": "error", "error": ERROR}``
     + All list results always display pagination controls
+    + List results are streamed if ``stream=true`` is passed
+    + Only the keys listed in the ``fields`` query param are returned, minus
+      those in ``exclude`` (both comma-separated)
     + Objects are designed to be nested under site resources, but can also be
       top-level resources.
     """
+    # Number of objects serialized at a time when streaming list results.
+    stream_chunk_size = 1000
+
+    # How list results are counted by default: 'exact', 'cached' or
+    # 'estimated'. This can be overridden with the ``count`` query param.
+    count_strategy = 'exact'
+
     def __init__(self, *args, **kwargs):
         super(BaseNsotViewSet, self).__init__(*args, **kwargs)
 
@@ -40,6 +69,25 @@ class BaseNsotViewSet(viewsets.ReadOnlyModelViewSet):
         self.result_key_plural = self.result_key + 's'
         self.model_name = self.result_key.title()
 
+    def initialize_request(self, request, *args, **kwargs):
+        """
+        Requests made by ``call_view()`` are authenticated as the user set on
+        them by the caller, instead of by the authenticators.
+        """
+        if 'nsot.call_view' not in request.META:
+            return super(BaseNsotViewSet, self).initialize_request(
+                request, *args, **kwargs
+            )
+
+        self.authentication_classes = ()
+        user = request.user
+        request = super(BaseNsotViewSet, self).initialize_request(
+            request, *args, **kwargs
+        )
+        request.user = user
+        request.auth = None
+        return request
+
     def not_found(self, pk=None, site_pk=None, msg=None):
         """Standard formatting for 404 errors."""
         if msg is None:
@@ -96,24 +144,164 @@ class BaseNsotViewSet(viewsets.ReadOnlyModelViewSet):
             if site_pk is not None:
                 queryset = queryset.filter(site=site_pk)
 
-        page = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(page, many=True)
+        if self.should_stream():
+            return self.stream_list(queryset)
+
+        page = self.paginator.slice_queryset(queryset, request, view=self)
         return self.get_paginated_response(
-            data=serializer.data, result_key=self.result_key_plural
+            data=self.serialize_list(page), result_key=self.result_key_plural
+        )
+
+    def can_serialize_values(self, objects):
+        """
+        Return whether ``objects`` can be serialized directly from
+        ``.values_list()``, bypassing the serializer.
+
+        This is the case for querysets of models that implement
+        ``to_dicts()`` when the serializer would return ``obj.to_dict()``.
+        """
+        return (
+            isinstance(objects, QuerySet) and
+            bool(getattr(objects.model, 'DICT_FIELDS', None)) and
+            issubclass(self.get_serializer_class(),
+                       serializers.NsotSerializer)
+        )
+
+    def get_sparse_fields(self):
+        """
+        Return a 2-tuple of (fields, exclude) sets of keys to include and
+        exclude from serialized objects, as passed in the ``fields`` and
+        ``exclude`` query params (comma-separated). Either may be ``None``.
+        """
+        params = self.request.query_params
+        fields, exclude = params.get('fields'), params.get('exclude')
+        if fields is not None:
+            fields = set(f.strip() for f in fields.split(',') if f.strip())
+        if exclude is not None:
+            exclude = set(f.strip() for f in exclude.split(',') if f.strip())
+        return fields, exclude
+
+    def get_dict_keys(self, model):
+        """
+        Return the keys to fetch for a model that implements ``to_dicts()``,
+        or ``None`` for all of them.
+        """
+        fields, exclude = self.get_sparse_fields()
+        if fields is None and exclude is None:
+            return None
+        return [
+            key for key, _ in model.DICT_FIELDS
+            if (fields is None or key in fields) and
+            (exclude is None or key not in exclude)
+        ]
+
+    def prune_fields(self, data):
+        """Remove keys from serialized objects based on sparse fields."""
+        fields, exclude = self.get_sparse_fields()
+        if fields is None and exclude is None:
+            return data
+        return [
+            {
+                key: value for key, value in obj.iteritems()
+                if (fields is None or key in fields) and
+                (exclude is None or key not in exclude)
+            }
+            for obj in data
+        ]
+
+    def iter_dicts(self, objects):
+        """
+        Iterate serialized objects from a queryset using ``to_dicts()`` (see
+        ``can_serialize_values()``), only fetching the selected fields.
+        """
+        model = objects.model
+        return model.to_dicts(objects, keys=self.get_dict_keys(model))
+
+    def serialize_list(self, objects):
+        """Return a list of serialized objects."""
+        if self.can_serialize_values(objects):
+            return list(self.iter_dicts(objects))
+        data = self.get_serializer(list(objects), many=True).data
+        return self.prune_fields(data)
+
+    def should_stream(self):
+        """
+        Return whether a list should be streamed. This is requested by
+        passing ``stream=true`` and only supported by renderers that implement
+        ``render_stream()`` (JSON, NDJSON and CSV).
+        """
+        stream = self.request.query_params.get('stream', False)
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return qpbool(stream) and hasattr(renderer, 'render_stream')
+
+    def get_attribute_names(self, model):
+        """
+        Return the names of the attributes that may be set on objects of
+        ``model`` listed by this view, sorted.
+        """
+        attributes = models.Attribute.objects.filter(
+            resource_name=model.__name__
+        )
+        site_pk = self.kwargs.get('site_pk')
+        if site_pk is not None:
+            attributes = attributes.filter(site=site_pk)
+        names = attributes.values_list('name', flat=True).distinct()
+        return sorted(force_text(name) for name in names)
+
+    def stream_list(self, queryset):
+        """
+        Stream a list of objects, serializing them ``stream_chunk_size`` at a
+        time so that memory use doesn't grow with the number of results.
+        """
+        page = self.paginator.slice_queryset(queryset, self.request, view=self)
+        renderer_context = self.get_renderer_context()
+        renderer_context['model'] = getattr(page, 'model', None)
+        fast = self.can_serialize_values(page)
+        if fast:
+            page = self.iter_dicts(page)
+        elif hasattr(page, 'iterator'):
+            page = page.iterator()
+
+        def chunks():
+            page_iter = iter(page)
+            while True:
+                chunk = list(
+                    itertools.islice(page_iter, self.stream_chunk_size)
+                )
+                if not chunk:
+                    break
+                if fast:
+                    yield chunk
+                else:
+                    data = self.get_serializer(chunk, many=True).data
+                    yield self.prune_fields(data)
+
+        return self.paginator.get_streaming_response(
+            chunks(), result_key=self.result_key_plural,
+            renderer=self.request.accepted_renderer,
+            renderer_context=renderer_context
         )
 
     def retrieve(self, request, pk=None, site_pk=None, *args, **kwargs):
         """Retrieve a single object optionally filtered by site."""
+        if site_pk is not None:
+            queryset = self.queryset.filter(pk=pk, site=site_pk)
+        else:
+            queryset = self.queryset.filter(pk=pk)
+
+        if self.can_serialize_values(queryset):
+            data = next(self.iter_dicts(queryset), None)
+            if data is None:
+                self.not_found(pk, site_pk)
+            return self.success(data)
+
         try:
-            if site_pk is not None:
-                obj = self.queryset.get(pk=pk, site=site_pk)
-            else:
-                obj = self.queryset.get(pk=pk)
+            obj = queryset.get()
         except exc.ObjectDoesNotExist:
             self.not_found(pk, site_pk)
 
         serializer = self.get_serializer(obj, *args, **kwargs)
-        return self.success(serializer.data)
+        return self.success(self.prune_fields([serializer.data])[0])
 
 
 class ChangeViewSet(BaseNsotViewSet):
@@ -122,13 +310,100 @@ class ChangeViewSet(BaseNsotViewSet):
 
     All Create/Update/Delete events are logged as a Change. A Change includes
     information such as the change time, user, and the full resource after
-    modification. Changes are immutable and can only be removed by deleting the
-    entire Site.
+    modification. Changes are immutable and can only be removed by archiving
+    them (see ``nsot-server changes archive``) or deleting the entire Site.
     """
-    queryset = models.Change.objects.order_by('-change_at')
+    queryset = models.Change.objects.order_by('-change_at').select_related(
+        'site', 'user', 'checkpoint'
+    )
     serializer_class = serializers.ChangeSerializer
     filter_fields = ('event', 'resource_name', 'resource_id')
 
+    def get_int_param(self, name, default, minimum=0, maximum=None):
+        """
+        Return an integer query param.
+
+        :param name:
+            Name of the query param
+
+        :param default:
+            Value if the param isn't provided
+
+        :param minimum:
+            Minimum value, smaller values are rejected
+
+        :param maximum:
+            Maximum value, larger values are capped to it
+        """
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = None
+        if value is None or value < minimum:
+            raise exc.BadRequest(
+                '%s must be an integer of at least %s.' % (name, minimum)
+            )
+        if maximum is not None:
+            value = min(value, maximum)
+        return value
+
+    @list_route(methods=['get'])
+    def feed(self, request, site_pk=None, *args, **kwargs):
+        """
+        Return the Changes after the one with the ID ``since``, oldest first.
+
+        If there are none, wait for up to ``wait`` seconds for new ones. The
+        response includes the ID to pass as ``since`` to get the next ones.
+
+        Changes made concurrently may be committed in a different order than
+        their IDs, so Changes are only returned once they are older than
+        ``CHANGE_FEED_SETTLE_TIME``, and never after one that isn't, so that
+        a Change that is committed late is never skipped.
+        """
+        since = self.get_int_param('since', 0)
+        limit = self.get_int_param(
+            'limit', settings.CHANGE_FEED_LIMIT, minimum=1,
+            maximum=settings.CHANGE_FEED_LIMIT
+        )
+        wait = self.get_int_param(
+            'wait', 0, maximum=settings.CHANGE_FEED_MAX_WAIT
+        )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if site_pk is not None:
+            queryset = queryset.filter(site=site_pk)
+        queryset = queryset.filter(id__gt=since).order_by('id')
+
+        deadline = time.time() + wait
+        while True:
+            settled_at = timezone.now() - datetime.timedelta(
+                seconds=settings.CHANGE_FEED_SETTLE_TIME
+            )
+            changes = list(itertools.takewhile(
+                lambda change: change.change_at <= settled_at,
+                queryset[:limit]
+            ))
+            if changes or time.time() >= deadline:
+                break
+            # This only blocks the current greenlet with gevent workers,
+            # which patch time.sleep().
+            time.sleep(settings.CHANGE_FEED_POLL_INTERVAL)
+
+        if changes:
+            since = changes[-1].id
+        serializer = self.get_serializer(changes, many=True)
+        data = OrderedDict([
+            ('next', since),
+            (self.result_key_plural, serializer.data),
+        ])
+        return Response(
+            OrderedDict([
+                ('status', 'ok'),
+                ('data', data),
+            ])
+        )
+
 
 class NsotViewSet(BaseNsotViewSet, viewsets.ModelViewSet):
     """
@@ -137,22 +412,47 @@ class NsotViewSet(BaseNsotViewSet, viewsets.ModelViewSet):
     """
     def perform_create(self, serializer):
         """Support bulk create."""
+        self.save_and_log(serializer, 'Create')
+
+    def save_and_log(self, serializer, event):
+        """
+        Save the objects of a create or update and log their Changes, in the
+        same transaction.
+
+        :param serializer:
+            Validated serializer
+
+        :param event:
+            Change event (e.g. 'Create')
+        """
         try:
-            objects = serializer.save()
+            with cache.atomic():
+                objects = serializer.save()
+
+                # This is so that we can always work w/ objects as a list
+                if not isinstance(objects, list):
+                    objects = [objects]
+
+                log.debug(
+                    'NsotViewSet.save_and_log() objects = %r', objects
+                )
+                models.Change.objects.log_changes(
+                    objects, self.request.user, event,
+                    resources=self.get_change_resources(serializer)
+                )
         except exc.DjangoValidationError as err:
             raise exc.ValidationError(err.message_dict)
         except exc.IntegrityError as err:
             raise exc.Conflict(err.message)
-        else:
-            # This is so that we can always work w/ objects as a list
-            if not isinstance(objects, list):
-                objects = [objects]
-
-        log.debug('NsotViewSet.perform_create() objects = %r', objects)
-        for obj in objects:
-            models.Change.objects.create(
-                obj=obj, user=self.request.user, event='Create'
-            )
+
+    def get_change_resources(self, serializer):
+        """
+        Return the serialized objects of a create or update to be logged as
+        Changes. They're the same as the objects in the response, so they are
+        only serialized once.
+        """
+        data = serializer.data
+        return data if isinstance(data, list) else [data]
 
     def get_success_headers(self, data):
         # TODO(jathan): Implement hyperlinked fields in the API?
@@ -163,32 +463,85 @@ class NsotViewSet(BaseNsotViewSet, viewsets.ModelViewSet):
         except (TypeError, KeyError):
             return {}
 
-    def perform_update(self, serializer):
+    def get_as_of(self):
+        """Return the datetime of the ``as_of`` query param, if any."""
+        as_of = self.request.query_params.get('as_of')
+        if as_of is None:
+            return None
         try:
-            objects = serializer.save()
-        except exc.DjangoValidationError as err:
-            raise exc.ValidationError(err.message_dict)
-        except exc.IntegrityError as err:
-            raise exc.Conflict(err.message)
-        else:
-            # This is so that we can always work w/ objects as a list
-            if not isinstance(objects, list):
-                objects = [objects]
-
-        log.debug('NsotViewSet.perform_update() objects = %r', objects)
-        for obj in objects:
-            models.Change.objects.create(
-                obj=obj, user=self.request.user, event='Update'
+            return parse_timestamp(as_of)
+        except ValueError:
+            raise exc.BadRequest(
+                'as_of must be seconds since the epoch or an ISO 8601 date '
+                'or datetime.'
             )
 
-    def perform_destroy(self, instance):
-        log.debug('NsotViewSet.perform_destroy() obj = %r', instance)
-        models.Change.objects.create(
-            obj=instance, user=self.request.user, event='Delete'
+    def retrieve(self, request, pk=None, site_pk=None, *args, **kwargs):
+        """
+        Retrieve a single object, as it was at ``as_of`` if it's passed.
+
+        The object is rebuilt from its latest Change made at or before
+        ``as_of``, so this also works for objects that have since been
+        deleted.
+        """
+        as_of = self.get_as_of()
+        if as_of is None:
+            return super(NsotViewSet, self).retrieve(
+                request, pk, site_pk, *args, **kwargs
+            )
+
+        resource = self.get_resource_as_of(pk, site_pk, as_of)
+        return self.success(self.prune_fields([resource])[0])
+
+    def get_resource_as_of(self, pk, site_pk, as_of):
+        """
+        Return the serialized object as it was at ``as_of``, rebuilt from the
+        Change log, or raise a 404 if it didn't exist then.
+
+        :param pk:
+            ID of the object
+
+        :param site_pk:
+            ID of the Site of the object, if any
+
+        :param as_of:
+            Datetime
+        """
+        resource_name = self.queryset.model.__name__
+        if resource_name not in models.VALID_CHANGE_RESOURCES:
+            raise exc.BadRequest(
+                'as_of is not supported for {}s.'.format(self.model_name)
+            )
+        try:
+            resource_id = int(pk)
+        except (TypeError, ValueError):
+            self.not_found(pk, site_pk)
+
+        change = models.Change.objects.get_as_of(
+            resource_name, resource_id, as_of
         )
+        if (change is None or change.event == 'Delete' or
+                (site_pk is not None and
+                 force_text(change.site_id) != force_text(site_pk))):
+            self.not_found(
+                pk, site_pk,
+                msg='No such {} found at (site_id, id) = ({}, {}) as of '
+                    '{}'.format(self.model_name, site_pk, pk, as_of)
+            )
 
+        return change.resource
+
+    def perform_update(self, serializer):
+        self.save_and_log(serializer, 'Update')
+
+    def perform_destroy(self, instance):
+        log.debug('NsotViewSet.perform_destroy() obj = %r', instance)
         try:
-            instance.delete()
+            with cache.atomic():
+                models.Change.objects.log_changes(
+                    [instance], self.request.user, 'Delete'
+                )
+                instance.delete()
         except exc.ProtectedError as err:
             raise exc.Conflict(err.args[0])
 
@@ -201,6 +554,96 @@ class SiteViewSet(NsotViewSet):
     serializer_class = serializers.SiteSerializer
     filter_fields = ('name',)
 
+    @detail_route(methods=['get'])
+    def snapshot(self, request, pk=None, *args, **kwargs):
+        """
+        Return all of the objects in the Site as they were at ``as_of`` (now
+        by default), rebuilt from the Change log, ordered by resource name and
+        ID.
+
+        Only the resources in ``resource_name`` (comma-separated) are
+        included, if it's passed.
+
+        Results are paged by ``limit`` with a ``cursor`` like keyset list
+        results, or all streamed if ``stream=true``.
+        """
+        if not self.queryset.filter(pk=pk).exists():
+            self.not_found(pk)
+        as_of = self.get_as_of() or timezone.now()
+
+        resource_names = sorted(models.VALID_CHANGE_RESOURCES)
+        names = request.query_params.get('resource_name')
+        if names:
+            resource_names = names.split(',')
+            invalid = set(resource_names) - models.VALID_CHANGE_RESOURCES
+            if invalid:
+                raise exc.BadRequest(
+                    'Invalid resource_name: {}'.format(
+                        ', '.join(sorted(invalid))
+                    )
+                )
+
+        fields = ('resource_name', 'resource_id')
+        after = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            after = pagination.decode_cursor(
+                cursor, fields, models.Change.objects.all()
+            )
+
+        stream = self.should_stream()
+        limit = None if stream else self.paginator.get_limit(request)
+        changes = models.Change.objects.snapshot(
+            as_of, site_id=pk, resource_names=resource_names, after=after,
+            chunk_size=self.stream_chunk_size
+        )
+        if limit:
+            # Fetch one more to know whether there is a next page.
+            changes = itertools.islice(changes, limit + 1)
+
+        def serialize(change):
+            return OrderedDict([
+                ('resource_name', change.resource_name),
+                ('resource', change.resource),
+            ])
+
+        page = OrderedDict([
+            ('as_of', timegm(as_of.timetuple())),
+            ('limit', limit),
+            ('next', None),
+            ('resources', []),
+        ])
+        envelope = OrderedDict([
+            ('status', 'ok'),
+            ('data', page),
+        ])
+
+        if stream:
+            def chunks():
+                while True:
+                    chunk = list(
+                        itertools.islice(changes, self.stream_chunk_size)
+                    )
+                    if not chunk:
+                        break
+                    yield [serialize(change) for change in chunk]
+
+            return self.paginator.get_streaming_response(
+                chunks(), renderer=request.accepted_renderer,
+                renderer_context=self.get_renderer_context(),
+                envelope=envelope
+            )
+
+        changes = list(changes)
+        if limit and len(changes) > limit:
+            del changes[limit:]
+            last = changes[-1]
+            page['next'] = pagination.encode_cursor(
+                [last.resource_name, last.resource_id]
+            )
+        page['resources'] = [serialize(change) for change in changes]
+        return Response(envelope)
+
 
 class ValueViewSet(NsotViewSet):
     """
@@ -231,7 +674,107 @@ class ResourceViewSet(NsotBulkUpdateModelMixin, NsotViewSet,
                       bulk_mixins.BulkCreateModelMixin):
     """
     Resource views that include set query list endpoints.
+
+    List and detail results are cached, and support conditional requests.
+    This includes the set query and detail routes that return lists, because
+    they all call ``.list()``.
     """
+    @cache.conditional_response(etag_func=cache.list_etag_func)
+    @cache.cache_response(cache_errors=False, key_func=cache.list_key_func)
+    def list(self, *args, **kwargs):
+        """Override default list so we can cache results."""
+        return super(ResourceViewSet, self).list(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        """Run large bulk creates as Jobs."""
+        if self.should_enqueue_job():
+            return self.enqueue_job(request, *args, **kwargs)
+        return super(ResourceViewSet, self).create(request, *args, **kwargs)
+
+    def bulk_update(self, request, *args, **kwargs):
+        """Run large bulk updates as Jobs."""
+        if self.should_enqueue_job():
+            return self.enqueue_job(request, *args, **kwargs)
+        return super(ResourceViewSet, self).bulk_update(
+            request, *args, **kwargs
+        )
+
+    def bulk_destroy(self, request, site_pk=None, *args, **kwargs):
+        """
+        Delete the objects in the request, given as a list of ids or of
+        objects with an ``id``, along with everything that depends on them
+        (see ``models.DeletePlan``).
+        """
+        if not isinstance(request.data, list) or not request.data:
+            raise exc.BadRequest('Expected a list of ids.')
+
+        ids = []
+        for item in request.data:
+            if isinstance(item, dict):
+                item = item.get('id')
+            try:
+                ids.append(int(item))
+            except (TypeError, ValueError):
+                raise exc.BadRequest('Invalid id: %r' % (item,))
+
+        plan = models.DeletePlan(self.queryset.model, ids, site_id=site_pk)
+        log.debug(
+            'ResourceViewSet.bulk_destroy() deleting %s devices, %s '
+            'interfaces, %s networks, %s assignments',
+            len(plan.devices), len(plan.interfaces), len(plan.networks),
+            len(plan.assignment_ids)
+        )
+        plan.execute(request.user)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def should_enqueue_job(self):
+        """
+        Return whether a bulk request should be run as a Job, which is the
+        case if ``async=true`` is passed or if it has at least
+        ``JOB_BULK_THRESHOLD`` objects.
+        """
+        data = self.request.data
+        if not isinstance(data, list):
+            return False
+        # Jobs and batches run their operations in order and report their
+        # results, so the bulk requests they make are never deferred.
+        if 'nsot.call_view' in self.request.META:
+            return False
+        if qpbool(self.request.query_params.get('async', False)):
+            return True
+        threshold = settings.JOB_BULK_THRESHOLD
+        return threshold is not None and len(data) >= threshold
+
+    def enqueue_job(self, request, site_pk=None, *args, **kwargs):
+        """Save a bulk request as a pending Job and return the Job."""
+        site = None
+        if site_pk is not None:
+            try:
+                site = models.Site.objects.get(pk=site_pk)
+            except (models.Site.DoesNotExist, ValueError):
+                self.not_found(msg='No such Site found at id = %s' % site_pk)
+
+        query = request.query_params.copy()
+        query.pop('async', None)
+        job = models.Job.objects.create(
+            user=request.user, site=site, method=request.method,
+            path=request.path_info, query=query.urlencode(),
+            body=request.data, total=len(request.data)
+        )
+        log.debug('Enqueued job %s for %s %s', job.id, job.method, job.path)
+
+        return self.success(
+            job.to_dict(), result_key='job', status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('job-detail', args=(job.id,))}
+        )
+
+    @cache.conditional_response(etag_func=cache.object_etag_func)
+    @cache.cache_response(cache_errors=False, key_func=cache.object_key_func)
+    def retrieve(self, *args, **kwargs):
+        """Override default retrieve so we can cache results."""
+        return super(ResourceViewSet, self).retrieve(*args, **kwargs)
+
     @list_route(methods=['get'])
     def query(self, request, site_pk=None, *args, **kwargs):
         """Perform a set query."""
@@ -347,6 +890,42 @@ class DeviceViewSet(ResourceViewSet):
 
         return self.list(request, queryset=interfaces, *args, **kwargs)
 
+    @detail_route(methods=['put'], url_path='interfaces/sync')
+    def sync_interfaces(self, request, pk=None, site_pk=None, *args,
+                        **kwargs):
+        """
+        Declaratively replace all interfaces for this Device.
+
+        Only the Interfaces that actually changed are written and logged as
+        Changes.
+        """
+        device = self.get_resource_object(pk, site_pk)
+
+        try:
+            with cache.atomic():
+                result = device.sync_interfaces(request.data)
+                for event, objects in zip(models.CHANGE_EVENTS, result):
+                    if objects:
+                        models.Change.objects.log_changes(
+                            objects, request.user, event
+                        )
+        except exc.DjangoValidationError as err:
+            raise exc.ValidationError(err.message_dict)
+        except exc.IntegrityError as err:
+            raise exc.Conflict(err.message)
+
+        log.debug('DeviceViewSet.sync_interfaces() result = %r', result)
+        data = OrderedDict([
+            (key, [obj.to_dict() for obj in objects])
+            for key, objects in zip(('created', 'updated', 'deleted'), result)
+        ])
+        return Response(
+            OrderedDict([
+                ('status', 'ok'),
+                ('data', data),
+            ])
+        )
+
 
 class NetworkViewSet(ResourceViewSet):
     """
@@ -356,6 +935,10 @@ class NetworkViewSet(ResourceViewSet):
     serializer_class = serializers.NetworkSerializer
     filter_fields = ('ip_version', 'state')
 
+    # Keyset pagination uses the same index as lookups by CIDR. The id breaks
+    # ties between sites.
+    cursor_fields = ('ip_version', 'network_address', 'prefix_length', 'id')
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return serializers.NetworkCreateSerializer
@@ -364,6 +947,80 @@ class NetworkViewSet(ResourceViewSet):
 
         return self.serializer_class
 
+    def create(self, request, *args, **kwargs):
+        """Create lists of Networks in bulk (see ``bulk_create()``)."""
+        if not isinstance(request.data, list) or self.should_enqueue_job():
+            return super(NetworkViewSet, self).create(
+                request, *args, **kwargs
+            )
+        return self.bulk_create(request)
+
+    def bulk_create(self, request):
+        """
+        Create a list of Networks with ``bulk_create_networks()``, which
+        finds their parents in memory and inserts them in chunks, rather than
+        saving each of them.
+
+        If ``partial=true`` is passed, the Networks that are valid are
+        created, and the errors of the others are returned by their index in
+        the request.
+        """
+        partial = qpbool(request.query_params.get('partial', False))
+
+        items, errors = [], []
+        if partial:
+            for index, data in enumerate(request.data):
+                serializer = self.get_serializer(data=data)
+                if serializer.is_valid():
+                    items.append((index, serializer.validated_data))
+                else:
+                    errors.append(
+                        (index, exc.ValidationError(serializer.errors))
+                    )
+        else:
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            items = list(enumerate(serializer.validated_data))
+
+        try:
+            with cache.atomic():
+                result = models.Network.objects.bulk_create_networks(
+                    items, partial=partial
+                )
+                data = self.get_serializer(result.created, many=True).data
+                models.Change.objects.log_changes(
+                    result.created, request.user, 'Create', resources=data
+                )
+        except exc.Conflict:
+            raise
+        except exc.DjangoValidationError as err:
+            raise exc.ValidationError(err.message_dict)
+        except exc.IntegrityError as err:
+            raise exc.Conflict(err.message)
+
+        if not partial:
+            return self.success(data, status=status.HTTP_201_CREATED)
+
+        errors.extend(result.errors)
+        errors.sort(key=lambda error: error[0])
+        return Response(
+            OrderedDict([
+                ('status', 'ok'),
+                ('data', OrderedDict([
+                    (self.result_key_plural, data),
+                    ('errors', [
+                        {
+                            'index': error_index,
+                            'code': error.status_code,
+                            'message': error.detail,
+                        }
+                        for error_index, error in errors
+                    ]),
+                ])),
+            ]),
+            status=status.HTTP_201_CREATED,
+        )
+
     @list_route(methods=['get'])
     def query(self, request, site_pk=None, *args, **kwargs):
         """Override base query to inherit filtering by query params."""
@@ -522,7 +1179,18 @@ class NetworkViewSet(ResourceViewSet):
 
     @detail_route(methods=['get'])
     def parent(self, request, pk=None, site_pk=None, *args, **kwargs):
-        """Return the parent of this Network."""
+        """
+        Return the parent of this Network, as it was at ``as_of`` if it's
+        passed.
+        """
+        as_of = self.get_as_of()
+        if as_of is not None:
+            network = self.get_resource_as_of(pk, site_pk, as_of)
+            parent = self.get_resource_as_of(
+                network['parent_id'], site_pk, as_of
+            )
+            return self.success(self.prune_fields([parent])[0])
+
         network = self.get_resource_object(pk, site_pk)
         parent = network.parent
         if parent is not None:
@@ -534,7 +1202,26 @@ class NetworkViewSet(ResourceViewSet):
 
     @detail_route(methods=['get'])
     def root(self, request, pk=None, site_pk=None, *args, **kwargs):
-        """Return the parent of all ancestors for this Network."""
+        """
+        Return the parent of all ancestors for this Network, as it was at
+        ``as_of`` if it's passed.
+        """
+        as_of = self.get_as_of()
+        if as_of is not None:
+            network = self.get_resource_as_of(pk, site_pk, as_of)
+            if network['parent_id'] is None:
+                self.not_found(None, site_pk)
+            root = network
+            seen = set()
+            # Walk up the ancestors as they were then. The ids are tracked so
+            # that an inconsistent Change log can't loop forever.
+            while root['parent_id'] is not None and root['id'] not in seen:
+                seen.add(root['id'])
+                root = self.get_resource_as_of(
+                    root['parent_id'], site_pk, as_of
+                )
+            return self.success(self.prune_fields([root])[0])
+
         network = self.get_resource_object(pk, site_pk)
         root = network.get_root()
         if root is not None:
@@ -563,7 +1250,9 @@ class NetworkViewSet(ResourceViewSet):
         siblings to other root nodes.
         """
         network = self.get_resource_object(pk, site_pk)
-        assignments = network.assignments.all()
+        assignments = network.assignments.select_related(
+            'interface__device', 'address'
+        )
         self.result_key_plural = 'assignments'
 
         return self.list(request, queryset=assignments, *args, **kwargs)
@@ -584,16 +1273,6 @@ class InterfaceViewSet(ResourceViewSet):
     filter_fields = ('device', 'name', 'speed', 'type', 'description',
                      'parent_id')
 
-    @cache_response(cache_errors=False, key_func=cache.list_key_func)
-    def list(self, *args, **kwargs):
-        """Override default list so we can cache results."""
-        return super(InterfaceViewSet, self).list(*args, **kwargs)
-
-    @cache_response(cache_errors=False, key_func=cache.object_key_func)
-    def retrieve(self, *args, **kwargs):
-        """Override default retrieve so we can cache results."""
-        return super(InterfaceViewSet, self).retrieve(*args, **kwargs)
-
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return serializers.InterfaceCreateSerializer
@@ -615,7 +1294,9 @@ class InterfaceViewSet(ResourceViewSet):
     def assignments(self, request, pk=None, site_pk=None, *args, **kwargs):
         """Return a list of information about my assigned addresses."""
         interface = self.get_resource_object(pk, site_pk)
-        assignments = interface.assignments.all()
+        assignments = interface.assignments.select_related(
+            'interface__device', 'address'
+        )
         self.result_key_plural = 'assignments'
 
         return self.list(request, queryset=assignments, *args, **kwargs)
@@ -633,6 +1314,130 @@ class InterfaceViewSet(ResourceViewSet):
 UserPkInfo = namedtuple('UserPkInfo', 'user pk')
 
 
+class AssignmentViewSet(BaseNsotViewSet):
+    """
+    Read-only API endpoint that allows the Assignments of addresses to
+    Interfaces to be viewed.
+
+    Assignments are loaded with their Interface, Device and address in a
+    single query. They may be filtered by ``device`` (ID), ``hostname``,
+    ``interface`` (ID), ``interface_name`` and ``address`` (CIDR).
+    """
+    queryset = models.Assignment.objects.select_related(
+        'interface__device', 'address'
+    ).order_by('id')
+    serializer_class = serializers.AssignmentSerializer
+
+    def get_queryset(self):
+        """Filter the queryset based on query arguments."""
+        assignments = self.queryset
+
+        params = self.request.query_params
+        for param, lookup in (('device', 'interface__device'),
+                              ('interface', 'interface')):
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                value = int(value)
+            except ValueError:
+                raise exc.BadRequest('Invalid %s: %s' % (param, value))
+            assignments = assignments.filter(**{lookup: value})
+
+        hostname = params.get('hostname')
+        if hostname is not None:
+            assignments = assignments.filter(
+                interface__device__hostname=hostname
+            )
+
+        interface_name = params.get('interface_name')
+        if interface_name is not None:
+            assignments = assignments.filter(interface__name=interface_name)
+
+        address = params.get('address')
+        if address is not None:
+            # Without a prefix length, match the address with any of them.
+            try:
+                if '/' in address:
+                    cidr = validators.validate_cidr(address)
+                    assignments = assignments.filter(
+                        address__network_address=cidr.network_address,
+                        address__prefix_length=cidr.prefixlen
+                    )
+                else:
+                    assignments = assignments.filter(
+                        address__network_address=ipaddress.ip_address(
+                            unicode(address)
+                        )
+                    )
+            except (exc.ValidationError, ValueError):
+                raise exc.BadRequest('Invalid address: %s' % address)
+
+        return assignments
+
+    def get_site_queryset(self, site_pk=None):
+        """Return the filtered Assignments, optionally filtered by site."""
+        assignments = self.get_queryset()
+        if site_pk is not None:
+            assignments = assignments.filter(interface__device__site=site_pk)
+        return assignments
+
+    def list(self, request, site_pk=None, *args, **kwargs):
+        """List Assignments optionally filtered by site."""
+        return super(AssignmentViewSet, self).list(
+            request, site_pk, queryset=self.get_site_queryset(site_pk),
+            *args, **kwargs
+        )
+
+    def retrieve(self, request, pk=None, site_pk=None, *args, **kwargs):
+        """Retrieve a single Assignment optionally filtered by site."""
+        assignment = self.get_site_queryset(site_pk).filter(pk=pk).first()
+        if assignment is None:
+            self.not_found(pk, site_pk)
+
+        serializer = self.get_serializer(assignment)
+        return self.success(self.prune_fields([serializer.data])[0])
+
+
+class JobViewSet(BaseNsotViewSet):
+    """
+    Read-only API endpoint that allows background Jobs to be viewed.
+
+    Bulk requests are run as Jobs when ``async=true`` is passed, or if they
+    have at least ``JOB_BULK_THRESHOLD`` objects. A Job includes its status,
+    how many of its objects have been processed, and their results.
+
+    Users may only view the Jobs they submitted, since their results and
+    errors include the objects of the request.
+    """
+    queryset = models.Job.objects.select_related('user').order_by('-id')
+    serializer_class = serializers.JobSerializer
+    filter_fields = ('status',)
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    def retrieve(self, request, pk=None, site_pk=None, *args, **kwargs):
+        """
+        Retrieve a single Job with its ``results``, which are paged by
+        ``limit`` and ``offset`` if they're passed.
+
+        Results are only included here and not in lists of Jobs, since there
+        may be any number of them.
+        """
+        try:
+            job = self.get_queryset().get(pk=pk)
+        except exc.ObjectDoesNotExist:
+            self.not_found(pk, site_pk)
+
+        data = job.to_dict()
+        data['results'] = job.get_results(
+            offset=self.paginator.get_offset(request),
+            limit=self.paginator.get_limit(request)
+        )
+        return self.success(data)
+
+
 class UserViewSet(BaseNsotViewSet, mixins.CreateModelMixin):
     """
     This viewset automatically provides `list` and `detail` actins.
@@ -699,6 +1504,234 @@ class NotFoundViewSet(viewsets.GenericViewSet):
         return None
 
 
+class BatchView(APIView):
+    """
+    Perform an ordered list of write operations in a single transaction.
+
+    Each operation is a dict of ``method`` (POST, PUT, PATCH or DELETE),
+    ``path`` and optionally ``body`` and ``id``. Paths without a leading slash
+    are relative to the parent of the batch endpoint (e.g. ``devices/`` for
+    ``/api/sites/1/batch/``).
+
+    Strings in the path or body of an operation may refer to the response
+    data of an earlier operation by its ``id``, e.g. ``$dev.device.id``. A
+    string that's only a reference is replaced by the referenced value itself
+    (e.g. an integer), otherwise the reference is replaced by its text.
+
+    If an operation fails, the whole batch is rolled back and the error
+    response includes the results up to the failed operation.
+    """
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+    reference_re = re.compile(r'\$(\w+)((?:\.\w+)*)')
+
+    def post(self, request, site_pk=None, *args, **kwargs):
+        operations = self.validate_operations(request.data)
+        base_path = request.path_info.rsplit('batch', 1)[0]
+
+        results = []
+        references = {}
+        with models.cache_attributes(), cache.atomic():
+            for index, operation in enumerate(operations):
+                response = self.perform_operation(
+                    request, base_path, operation, references
+                )
+                data = getattr(response, 'data', None)
+                result = OrderedDict([
+                    ('id', operation.get('id')),
+                    ('code', response.status_code),
+                    ('response', data),
+                ])
+                results.append(result)
+
+                if response.status_code >= 400:
+                    transaction.set_rollback(True)
+                    return Response(
+                        OrderedDict([
+                            ('status', 'error'),
+                            ('error', {
+                                'message': (
+                                    'Operation {} failed, no changes were '
+                                    'made.'.format(index)
+                                ),
+                                'code': response.status_code,
+                                'results': results,
+                            }),
+                        ]),
+                        status=response.status_code,
+                    )
+
+                if operation.get('id') is not None:
+                    references[operation['id']] = (data or {}).get('data')
+
+        return Response(
+            OrderedDict([
+                ('status', 'ok'),
+                ('data', {'results': results}),
+            ])
+        )
+
+    def validate_operations(self, operations):
+        """Validate the operations before any of them is performed."""
+        if not isinstance(operations, list) or not operations:
+            raise exc.BadRequest('Expected a list of operations.')
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            raise exc.BadRequest(
+                'At most {} operations are allowed.'.format(
+                    settings.BATCH_MAX_OPERATIONS
+                )
+            )
+
+        ids = set()
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                raise exc.BadRequest(
+                    'Operation {} is not a dict.'.format(index)
+                )
+            method = operation.get('method')
+            if not isinstance(method, basestring) or (
+                    method.upper() not in self.methods):
+                raise exc.BadRequest(
+                    'Operation {} has an invalid method: {!r}'.format(
+                        index, method
+                    )
+                )
+            if not isinstance(operation.get('path'), basestring):
+                raise exc.BadRequest(
+                    'Operation {} has no path.'.format(index)
+                )
+
+            op_id = operation.get('id')
+            if op_id is None:
+                continue
+            if not isinstance(op_id, basestring) or (
+                    not re.match(r'^\w+$', op_id)):
+                raise exc.BadRequest(
+                    'Operation {} has an invalid id: {!r}'.format(
+                        index, op_id
+                    )
+                )
+            if op_id in ids:
+                raise exc.BadRequest(
+                    'Operation {} has a duplicate id: {}'.format(index, op_id)
+                )
+            ids.add(op_id)
+
+        return operations
+
+    def get_reference(self, match, references):
+        """Return the value of a reference to an earlier operation."""
+        value = references[match.group(1)]
+        for key in match.group(2).split('.')[1:]:
+            try:
+                value = value[int(key) if isinstance(value, list) else key]
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise exc.BadRequest(
+                    'Invalid reference: {}'.format(match.group(0))
+                )
+        return value
+
+    def resolve_references(self, value, references):
+        """Replace the references to earlier operations in ``value``."""
+        if isinstance(value, dict):
+            return {
+                key: self.resolve_references(item, references)
+                for key, item in value.iteritems()
+            }
+        if isinstance(value, list):
+            return [
+                self.resolve_references(item, references) for item in value
+            ]
+        if not isinstance(value, basestring):
+            return value
+
+        match = self.reference_re.match(value)
+        if (match and match.end() == len(value) and
+                match.group(1) in references):
+            return self.get_reference(match, references)
+
+        def replace(match):
+            if match.group(1) not in references:
+                return match.group(0)
+            return force_text(self.get_reference(match, references))
+        return self.reference_re.sub(replace, value)
+
+    def perform_operation(self, request, base_path, operation, references):
+        """
+        Perform an operation by calling its view with a copy of ``request``
+        (see ``call_view()``).
+        """
+        path = self.resolve_references(operation['path'], references)
+        body = self.resolve_references(operation.get('body'), references)
+        path = urlparse.urljoin(base_path, path)
+        return call_view(
+            request.user, operation['method'], path, body=body,
+            meta=request.META
+        )
+
+
+def call_view(user, method, path, body=None, meta=None):
+    """
+    Call the view of an NSoT object endpoint directly, as ``user``, and return
+    its response. This skips the middleware and authentication (see
+    ``BaseNsotViewSet.initialize_request()``), and bulk requests are never
+    run as Jobs.
+
+    :param user:
+        User the request is authenticated as
+
+    :param method:
+        HTTP method
+
+    :param path:
+        Path of the endpoint, optionally with a query string
+
+    :param body:
+        Data to send as JSON
+
+    :param meta:
+        WSGI environment to copy (e.g. from the ``request.META`` of another
+        request), minus conditional headers
+    """
+    url = urlparse.urlparse(path)
+
+    # Only the endpoints of NSoT objects may be used.
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        match = None
+    view_class = getattr(match.func, 'cls', None) if match else None
+    if not (view_class and issubclass(view_class, BaseNsotViewSet)):
+        raise exc.BadRequest('Invalid path: {}'.format(path))
+
+    data = b''
+    if body is not None:
+        data = json.dumps(body, cls=DjangoJSONEncoder).encode('utf-8')
+    environ = {
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SCRIPT_NAME': '',
+        'wsgi.url_scheme': 'http',
+    }
+    environ.update(
+        (key, value) for key, value in (meta or {}).iteritems()
+        if not key.startswith('HTTP_IF_')
+    )
+    environ.update({
+        'REQUEST_METHOD': method.upper(),
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(data)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(data),
+        'nsot.call_view': True,
+    })
+    request = WSGIRequest(environ)
+    request.user = user
+
+    return match.func(request, *match.args, **match.kwargs)
+
+
 class AuthTokenLoginView(APIView):
     permission_classes = ()
 
@@ -729,3 +1762,20 @@ class AuthTokenVerifyView(APIView):
                 ('data', True),
             ])
         )
+
+
+class CacheStatsView(APIView):
+    """
+    Read-only API endpoint that returns the hit/miss statistics of the
+    in-process cache of the worker that serves the request, along with its
+    process ID.
+    """
+    def get(self, request, *args, **kwargs):
+        data = OrderedDict([('pid', os.getpid())])
+        data.update(sorted(cache.get_stats().items()))
+        return Response(
+            OrderedDict([
+                ('status', 'ok'),
+                ('data', data),
+            ])
+        )
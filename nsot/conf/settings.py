@@ -57,6 +57,7 @@ AUTHENTICATION_BACKENDS = (
 # A tuple of middleware classes to use.
 # https://docs.djangoproject.com/en/1.8/topics/http/middleware/
 MIDDLEWARE_CLASSES = (
+    'nsot.middleware.compression.GZipMiddleware',
     'nsot.middleware.request_logging.LoggingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -146,10 +147,21 @@ TEMPLATES = [
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ('rest_framework.filters.DjangoFilterBackend',),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'nsot.api.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
+        'nsot.api.renderers.NDJSONRenderer',
+        'nsot.api.renderers.CSVRenderer',
+        'nsot.api.renderers.MessagePackRenderer',
         # 'rest_framework.renderers.AdminRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'nsot.api.parsers.NDJSONParser',
+        'nsot.api.parsers.CSVParser',
+        'nsot.api.parsers.MessagePackParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'nsot.api.pagination.CustomPagination',
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAdminUser',
@@ -192,6 +204,36 @@ CACHES = {
     }
 }
 
+# Cached API responses are also kept in an in-process cache inside of each
+# worker, which is checked before the cache backend. This is ignored if the
+# "dummy" cache is used.
+
+# The maximum number of responses kept in the in-process cache. Set to 0 to
+# disable it.
+# Default: 1000
+LOCAL_CACHE_MAX_ENTRIES = 1000
+
+# The maximum age, in seconds, of a response in the in-process cache.
+# Default: 60
+LOCAL_CACHE_TIMEOUT = 60
+
+# Identical concurrent requests for an API response that isn't cached yet are
+# coalesced so that it's only computed once. This is the maximum time, in
+# seconds, that requests in other workers wait for the response to be cached
+# before computing it themselves.
+# Default: 10
+CACHE_LOCK_TIMEOUT = 10
+
+# The maximum age, in seconds, of list result counts when using the 'cached'
+# count strategy.
+# Default: 60
+COUNT_CACHE_TIMEOUT = 60
+
+# When using the 'estimated' count strategy, estimates below this are replaced
+# by an exact count.
+# Default: 1000
+COUNT_ESTIMATE_THRESHOLD = 1000
+
 ###############
 # Application #
 ###############
@@ -247,6 +289,74 @@ NSOT_WORKER_TIMEOUT = 30
 # Default: True
 SERVE_STATIC_FILES = True
 
+# If True, Changes are first written to an outbox in the same transaction as
+# the objects that changed, and moved to the Change log in batches by
+# `nsot-server changelog_worker`, which must be running.
+# Default: False
+ASYNC_CHANGE_LOG = False
+
+# Pending changes are only moved to the Change log once they are older than
+# this many seconds, so that changes committed in a different order than they
+# were made are still logged in order. This should be longer than any write
+# transaction.
+# Default: 5
+CHANGE_LOG_SETTLE_TIME = 5
+
+# If True, the resource of each Change is stored as a delta against the
+# latest full copy of the same resource, which is much smaller. A full copy is
+# stored every CHANGE_LOG_CHECKPOINT_INTERVAL Changes of each resource.
+# Default: False
+CHANGE_LOG_DELTAS = False
+
+# Default: 20
+CHANGE_LOG_CHECKPOINT_INTERVAL = 20
+
+# The maximum number of Changes returned by each request to the change feed
+# (/api/changes/feed/).
+# Default: 1000
+CHANGE_FEED_LIMIT = 1000
+
+# The maximum time, in seconds, that requests to the change feed may wait for
+# new Changes with the `wait` query param. This should be less than
+# NSOT_WORKER_TIMEOUT unless using gevent workers.
+# Default: 20
+CHANGE_FEED_MAX_WAIT = 20
+
+# How often, in seconds, waiting requests to the change feed check for new
+# Changes.
+# Default: 1
+CHANGE_FEED_POLL_INTERVAL = 1
+
+# Changes are only returned by the change feed once they are older than this
+# many seconds, so that Changes committed in a different order than their IDs
+# are never skipped. This should be longer than any write transaction.
+# Default: 5
+CHANGE_FEED_SETTLE_TIME = 5
+
+# Maximum number of operations in a request to the batch endpoint.
+# Default: 1000
+BATCH_MAX_OPERATIONS = 1000
+
+# Bulk requests with at least this many objects are run in the background as
+# jobs by the ``jobs_worker`` command, as are those passing ``async=true``.
+# Default: None (only when ``async=true`` is passed)
+JOB_BULK_THRESHOLD = None
+
+# Number of objects of a job that are processed in each transaction.
+# Default: 1000
+JOB_CHUNK_SIZE = 1000
+
+# Running jobs that haven't made progress for this many seconds are assumed to
+# have been abandoned by a worker that crashed, and are resumed by another
+# worker. This must be longer than it takes to process a chunk.
+# Default: 600
+JOB_TIMEOUT = 600
+
+# Responses smaller than this, in bytes, aren't compressed. Streamed responses
+# are always compressed if the client accepts gzip.
+# Default: 1024
+GZIP_MIN_LENGTH = 1024
+
 ############
 # Security #
 ############
@@ -302,6 +412,13 @@ STATICFILES_DIRS = (
 # Default: $BASE_DIR/staticfiles'
 STATIC_ROOT = os.path.realpath(os.path.join(BASE_DIR, 'staticfiles'))
 
+# The storage used by collectstatic. The default also stores copies of the
+# files with a hash of their contents in their names, and gzipped copies of
+# text files, which are served with far-future caching headers when
+# SERVE_STATIC_FILES is True.
+# Default: 'nsot.util.staticfiles.GzipManifestStaticFilesStorage'
+STATICFILES_STORAGE = 'nsot.util.staticfiles.GzipManifestStaticFilesStorage'
+
 ###########
 # Swagger #
 ###########
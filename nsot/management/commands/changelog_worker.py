@@ -0,0 +1,65 @@
+from __future__ import absolute_import, print_function
+
+"""
+Command to move pending changes from the outbox to the Change log.
+"""
+
+from django.db import DatabaseError, close_old_connections
+import time
+
+from nsot.models import PendingChange
+from nsot.util.commands import NsotCommand
+
+
+class Command(NsotCommand):
+    help = (
+        'Move pending changes to the Change log when ASYNC_CHANGE_LOG is '
+        'enabled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum number of changes to move in each transaction.',
+        )
+        parser.add_argument(
+            '-i', '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait for new changes when there are none.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            default=False,
+            help='Exit once there are no more pending changes.',
+        )
+
+    def handle(self, **options):
+        batch_size = options.get('batch_size')
+        interval = options.get('interval')
+        once = options.get('once')
+
+        total = 0
+        while True:
+            try:
+                moved = PendingChange.objects.materialize(batch_size)
+            except DatabaseError:
+                # The pending changes are left in the outbox, so just retry.
+                self.log.exception('Failed to move pending changes.')
+                close_old_connections()
+                moved = 0
+                if once:
+                    raise
+
+            total += moved
+            if moved:
+                self.log.debug('Moved %s pending changes.', moved)
+            if moved < batch_size:
+                if once:
+                    break
+                time.sleep(interval)
+
+        self.log.info('Moved %s pending changes.', total)
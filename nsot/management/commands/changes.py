@@ -0,0 +1,101 @@
+from __future__ import absolute_import, print_function
+
+"""
+Command to manage the Change log.
+"""
+
+import datetime
+from django.utils import timezone
+import gzip
+
+from nsot.models import Change
+from nsot.util import parse_timestamp
+from nsot.util.commands import NsotCommand, CommandError
+
+
+class Command(NsotCommand):
+    help = (
+        'Archive old changes to a compressed NDJSON file and delete them from '
+        'the Change log.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=('archive',),
+            help='Action to perform.',
+        )
+        parser.add_argument(
+            '--before',
+            help=(
+                'Archive changes made before this date or datetime (e.g. '
+                '2016-01-01 or 2016-01-01T12:00:00).'
+            ),
+        )
+        parser.add_argument(
+            '-d', '--days',
+            type=int,
+            help='Archive changes made more than this many days ago.',
+        )
+        parser.add_argument(
+            '-k', '--keep',
+            type=int,
+            default=0,
+            help='Number of latest changes to keep for each resource.',
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help=(
+                'Path of the gzipped NDJSON file to write the archived '
+                'changes to. (default: changes-<datetime>.ndjson.gz)'
+            ),
+        )
+        parser.add_argument(
+            '-s', '--site-id',
+            type=int,
+            help='Only archive the changes of this site.',
+        )
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum number of changes to delete in each transaction.',
+        )
+
+    def get_cutoff(self, before, days):
+        """Return the datetime before which changes are archived."""
+        if (before is None) == (days is None):
+            raise CommandError(
+                'Exactly one of --before or --days is required.'
+            )
+
+        if days is not None:
+            return timezone.now() - datetime.timedelta(days=days)
+
+        try:
+            return parse_timestamp(before)
+        except ValueError:
+            raise CommandError('Invalid --before: %r' % before)
+
+    def handle(self, **options):
+        cutoff = self.get_cutoff(options.get('before'), options.get('days'))
+        keep = options.get('keep')
+        if keep < 0:
+            raise CommandError('--keep must not be negative.')
+
+        output = options.get('output')
+        if output is None:
+            output = 'changes-%s.ndjson.gz' % (
+                timezone.now().strftime('%Y%m%dT%H%M%S')
+            )
+
+        self.log.info(
+            'Archiving changes made before %s to %s.', cutoff, output
+        )
+        with gzip.open(output, 'wb') as stream:
+            total = Change.objects.archive(
+                stream, cutoff, keep=keep, site_id=options.get('site_id'),
+                batch_size=options.get('batch_size')
+            )
+
+        self.log.info('Archived %s changes.', total)
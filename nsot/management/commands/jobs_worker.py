@@ -0,0 +1,170 @@
+from __future__ import absolute_import, print_function
+
+"""
+Command to run background Jobs.
+"""
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, close_old_connections, connection, transaction
+)
+import threading
+import time
+
+from nsot import exc
+from nsot.api.views import call_view
+from nsot.models import Job
+from nsot.util import cache
+from nsot.util.commands import NsotCommand
+
+
+class Command(NsotCommand):
+    help = (
+        'Run the bulk requests that were accepted as background Jobs, using a '
+        'pool of worker threads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-w', '--workers',
+            type=int,
+            default=1,
+            help='Number of Jobs to run concurrently.',
+        )
+        parser.add_argument(
+            '-c', '--chunk-size',
+            type=int,
+            default=settings.JOB_CHUNK_SIZE,
+            help=(
+                'Maximum number of objects to process in each transaction. '
+                '(default: JOB_CHUNK_SIZE)'
+            ),
+        )
+        parser.add_argument(
+            '-i', '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait for new Jobs when there are none.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            default=False,
+            help='Exit once there are no more pending Jobs.',
+        )
+
+    def handle(self, **options):
+        num_workers = options.get('workers')
+        if num_workers <= 1:
+            self.work(**options)
+            return
+
+        workers = [
+            threading.Thread(target=self.work_in_thread, kwargs=options)
+            for _ in xrange(num_workers)
+        ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        # Join with a timeout so that the main thread is interruptible.
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(1)
+
+    def work_in_thread(self, **options):
+        """Run ``work()`` and close the thread's database connection."""
+        try:
+            self.work(**options)
+        finally:
+            connection.close()
+
+    def work(self, chunk_size, interval, once, **options):
+        """Claim and run pending Jobs, until there are none if ``once``."""
+        while True:
+            try:
+                job = Job.objects.claim()
+            except DatabaseError:
+                self.log.exception('Failed to claim a job.')
+                close_old_connections()
+                job = None
+                if once:
+                    raise
+
+            if job is not None:
+                try:
+                    self.run_job(job, chunk_size)
+                except exc.Conflict as err:
+                    self.log.warning('Giving up job %s: %s', job.id, err)
+            elif once:
+                break
+            else:
+                time.sleep(interval)
+
+    def run_job(self, job, chunk_size):
+        """
+        Send the objects of a Job to its endpoint a chunk at a time.
+
+        :param job:
+            Running Job
+
+        :param chunk_size:
+            Maximum number of objects per chunk
+        """
+        self.log.info('Running job %s: %s %s', job.id, job.method, job.path)
+        path = job.path
+        if job.query:
+            path += '?' + job.query
+
+        body = list(job.body)
+        for start in xrange(job.processed, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            try:
+                # The results are recorded in the transaction of the chunk, so
+                # that a chunk is never processed twice.
+                with cache.atomic():
+                    response = call_view(
+                        job.user, job.method, path, body=chunk
+                    )
+                    if response.status_code < 400:
+                        job.add_results(self.get_results(response.data))
+                    else:
+                        transaction.set_rollback(True)
+            except exc.Conflict:
+                raise
+            except Exception as err:
+                self.log.exception('Job %s failed.', job.id)
+                close_old_connections()
+                job.finish(error={'code': 500, 'message': str(err)})
+                return
+
+            if response.status_code >= 400:
+                error = response.data
+                if isinstance(error, dict):
+                    error = error.get('error', error)
+                self.log.info('Job %s failed: %r', job.id, error)
+                job.finish(error=error)
+                return
+
+            self.log.debug(
+                'Job %s processed %s/%s.', job.id, job.processed, job.total
+            )
+
+        job.finish()
+        self.log.info('Job %s succeeded.', job.id)
+
+    def get_results(self, data):
+        """
+        Return the list of serialized objects from the response data of a
+        bulk request.
+
+        Bulk creates are wrapped in the ``{"status": "ok", "data": DATA}``
+        envelope, while bulk updates return a bare list.
+        """
+        if isinstance(data, list):
+            return data
+
+        data = data.get('data', data)
+        if isinstance(data, dict) and len(data) == 1:
+            data = data.values()[0]
+        return data if isinstance(data, list) else [data]
@@ -0,0 +1,19 @@
+"""
+Middleware to compress HTTP responses.
+"""
+
+from django.conf import settings
+from django.middleware import gzip
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """
+    Compress responses of at least ``GZIP_MIN_LENGTH`` bytes if the client
+    accepts gzip. Streaming responses are always compressed, a chunk at a time,
+    so they're never held in memory.
+    """
+    def process_response(self, request, response):
+        if (not response.streaming and
+                len(response.content) < settings.GZIP_MIN_LENGTH):
+            return response
+        return super(GZipMiddleware, self).process_response(request, response)
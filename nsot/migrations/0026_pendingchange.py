@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.conf import settings
+import django_extensions.db.fields.json
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0025_value_site'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('change_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.CharField(max_length=10)),
+                ('resource_id', models.IntegerField()),
+                ('resource_name', models.CharField(max_length=20)),
+                ('_resource', django_extensions.db.fields.json.JSONField(blank=True)),
+                ('site', models.ForeignKey(related_name='pending_changes', to='nsot.Site')),
+                ('user', models.ForeignKey(related_name='pending_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='change',
+            name='change_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
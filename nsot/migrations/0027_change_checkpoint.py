@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0026_pendingchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='checkpoint',
+            field=models.ForeignKey(related_name='deltas', blank=True, editable=False, to='nsot.Change', null=True),
+        ),
+    ]
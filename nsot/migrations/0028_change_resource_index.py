@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0027_change_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='change',
+            index_together=set([('resource_name', 'resource_id', 'change_at')]),
+        ),
+    ]
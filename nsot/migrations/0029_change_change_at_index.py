@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0028_change_resource_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='change',
+            name='change_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, db_index=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.conf import settings
+import django_extensions.db.fields.json
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0029_change_change_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('status', models.CharField(default='pending', max_length=10, db_index=True, choices=[('pending', 'pending'), ('running', 'running'), ('succeeded', 'succeeded'), ('failed', 'failed')])),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('query', models.TextField(default='', blank=True)),
+                ('body', django_extensions.db.fields.json.JSONField(default=b'[]', blank=True)),
+                ('total', models.IntegerField(default=0)),
+                ('processed', models.IntegerField(default=0)),
+                ('results', django_extensions.db.fields.json.JSONField(default=b'[]', blank=True)),
+                ('error', django_extensions.db.fields.json.JSONField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(null=True, blank=True)),
+                ('finished_at', models.DateTimeField(null=True, blank=True)),
+                ('site', models.ForeignKey(related_name='jobs', blank=True, to='nsot.Site', null=True)),
+                ('user', models.ForeignKey(related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django_extensions.db.fields.json
+
+
+def move_job_results(apps, schema_editor):
+    """
+    Move the results of each Job to a single chunk.
+    """
+    Job = apps.get_model('nsot', 'Job')
+    JobChunk = apps.get_model('nsot', 'JobChunk')
+    for job in Job.objects.iterator():
+        if job.results:
+            JobChunk.objects.create(job=job, start=0, results=job.results)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nsot', '0031_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobChunk',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('start', models.IntegerField(help_text='Index of the first object of the chunk.')),
+                ('results', django_extensions.db.fields.json.JSONField(default=b'[]', blank=True)),
+                ('job', models.ForeignKey(related_name='chunks', to='nsot.Job')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobchunk',
+            unique_together=set([('job', 'start')]),
+        ),
+        migrations.RunPython(move_job_results),
+        migrations.RemoveField(
+            model_name='job',
+            name='results',
+        ),
+    ]
@@ -2,23 +2,31 @@
 from __future__ import unicode_literals
 
 from calendar import timegm
+import collections
+import contextlib
+import datetime
+import itertools
 from cryptography.fernet import (Fernet, InvalidToken)
 from custom_user.models import AbstractEmailUser
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router
+from django.db.models import Count, Max
 from django.db.models.query_utils import Q
 from django.conf import settings
-from django.core.cache import cache as djcache
 from django.utils import timezone
 import ipaddress
 import json
 import logging
 from operator import attrgetter
 import re
+import threading
 
 from . import exc
 from . import fields
 from . import validators
-from .util import generate_secret_key, parse_set_query, stats
+from .util import (
+    cache, diff_dict, generate_secret_key, parse_set_query, patch_dict, stats
+)
 
 
 log = logging.getLogger(__name__)
@@ -35,6 +43,8 @@ RESOURCE_BY_NAME = {
 
 CHANGE_EVENTS = ('Create', 'Update', 'Delete')
 
+JOB_STATUSES = ('pending', 'running', 'succeeded', 'failed')
+
 VALID_CHANGE_RESOURCES = set(RESOURCE_BY_IDX)
 VALID_ATTRIBUTE_RESOURCES = set([
     'Network', 'Device', 'Interface'
@@ -44,12 +54,23 @@ VALID_ATTRIBUTE_RESOURCES = set([
 # serializer/form fields.
 CHANGE_RESOURCE_CHOICES = [(c, c) for c in VALID_CHANGE_RESOURCES]
 EVENT_CHOICES = [(c, c) for c in CHANGE_EVENTS]
+JOB_STATUS_CHOICES = [(c, c) for c in JOB_STATUSES]
 IP_VERSION_CHOICES = [(c, c) for c in settings.IP_VERSIONS]
 RESOURCE_CHOICES = [(c, c) for c in VALID_ATTRIBUTE_RESOURCES]
 
 # Unique interface type IDs.
 INTERFACE_TYPES = [t[0] for t in settings.INTERFACE_TYPE_CHOICES]
 
+#: Namedtuple for the results of ``Device.sync_interfaces()``.
+InterfaceSync = collections.namedtuple(
+    'InterfaceSync', 'created updated deleted'
+)
+
+# Result of ``Network.objects.bulk_create_networks()``.
+NetworkBulkCreate = collections.namedtuple(
+    'NetworkBulkCreate', 'created errors'
+)
+
 
 class Site(models.Model):
     """A namespace for attribtues, devices, and networks."""
@@ -354,6 +375,42 @@ class ResourceManager(models.Manager):
         """
         return self.get_queryset().by_attribute(name, value, site_id)
 
+    def bulk_update(self, objects, fields, chunk_size=None):
+        """
+        Save ``fields`` of many objects with a single query per chunk, rather
+        than saving each of them. Objects aren't validated, and no signals
+        are sent.
+
+        :param objects:
+            List of objects to save
+
+        :param fields:
+            Names of the fields to save
+
+        :param chunk_size:
+            Maximum number of objects per query. Defaults to staying below the
+            999 query parameters allowed by SQLite.
+        """
+        if chunk_size is None:
+            chunk_size = max(1, 900 // (2 * len(fields) + 1))
+
+        meta = self.model._meta
+        connection = connections[self.db]
+        for start in xrange(0, len(objects), chunk_size):
+            chunk = objects[start:start + chunk_size]
+            values = {}
+            for name in fields:
+                field = meta.get_field(name)
+                values[name] = models.Case(*[
+                    models.When(pk=obj.pk, then=models.Value(
+                        field.get_db_prep_save(
+                            getattr(obj, field.attname), connection
+                        )
+                    ))
+                    for obj in chunk
+                ], output_field=field)
+            self.filter(pk__in=[obj.pk for obj in chunk]).update(**values)
+
 
 class Resource(models.Model):
     """Base for heirarchial Resource objects that may have attributes."""
@@ -382,14 +439,83 @@ class Resource(models.Model):
     def _purge_attribute_index(self):
         self.attributes.all().delete()
 
+    # Pairs of (key, field name) for the output of ``to_dict()``. This is used
+    # to build it from ``.values_list()`` (see ``to_dicts()``).
+    DICT_FIELDS = ()
+
     def get_attributes(self):
         """Return the JSON-encoded attributes as a dict."""
         return self._attributes_cache
 
-    def set_attributes(self, attributes, valid_attributes=None):
-        """Validate and store the attributes dict as a JSON-encoded string."""
-        log.debug('Resource.set_attributes() attributes = %r',
-                  attributes)
+    @classmethod
+    def get_dict_converter(cls, key, field):
+        """
+        Return a function to convert a value from ``.values_list()`` into its
+        value in ``to_dict()``, or ``None`` if it's used as-is.
+        """
+        # These fields are only converted when set on a model instance.
+        if isinstance(type(field), models.SubfieldBase):
+            return field.to_python
+        return None
+
+    @classmethod
+    def to_dicts(cls, queryset, keys=None):
+        """
+        Iterate the output of ``to_dict()`` for each object in ``queryset``.
+
+        This fetches rows using ``.values_list()`` and only converts the
+        fields that need it, which is much faster than creating model
+        instances for large querysets.
+
+        :param queryset:
+            QuerySet of this model
+
+        :param keys:
+            If set, only include these keys (and only fetch their columns)
+        """
+        fields = [
+            (key, name) for key, name in cls.DICT_FIELDS
+            if keys is None or key in keys
+        ]
+        converters = [
+            (key, cls.get_dict_converter(key, cls._meta.get_field(name)))
+            for key, name in fields
+        ]
+
+        # Always fetch a column, so that there's a row per object.
+        names = [name for key, name in fields] or ['id']
+        rows = queryset.values_list(*names).iterator()
+        for row in rows:
+            out = {}
+            for (key, convert), value in zip(converters, row):
+                out[key] = value if convert is None else convert(value)
+            if keys is None:
+                out = cls.dict_from_values(out)
+            yield out
+
+    @classmethod
+    def dict_from_values(cls, values):
+        """
+        Return a dict of all of the ``to_dict()`` values, built the same way
+        as ``to_dict()`` so that it serializes identically.
+
+        By default, this is the values of the ``DICT_FIELDS`` as-is.
+        """
+        return dict((key, values[key]) for key, name in cls.DICT_FIELDS)
+
+    def validate_attributes(self, attributes, valid_attributes=None):
+        """
+        Validate the attributes dict and return a list of Value inserts.
+
+        Each insert is a dict of ``attribute_id`` and ``value``.
+
+        :param attributes:
+            Dictionary of attribute name/value pairs
+
+        :param valid_attributes:
+            Dictionary of Attribute objects keyed by name. If not provided they
+            will be looked up for this resource's site.
+        """
         if not isinstance(attributes, dict):
             raise exc.ValidationError(
                 'Expected dictionary but received {}'.format(type(attributes))
@@ -430,6 +556,14 @@ class Resource(models.Model):
             attribute = valid_attributes[name]
             inserts.extend(attribute.validate_value(value))
 
+        return inserts
+
+    def set_attributes(self, attributes, valid_attributes=None):
+        """Validate and store the attributes dict as a JSON-encoded string."""
+        log.debug('Resource.set_attributes() attributes = %r',
+                  attributes)
+        inserts = self.validate_attributes(attributes, valid_attributes)
+
         # Purge all of our previously existing attribute values and recreate
         # them anew. This isn't exactly efficient.
         self._purge_attribute_index()
@@ -504,6 +638,306 @@ class Device(Resource):
         self.full_clean()
         super(Device, self).save(*args, **kwargs)
 
+    def sync_interfaces(self, interfaces):
+        """
+        Declaratively replace the Interfaces of this Device.
+
+        The desired state is compared to the existing Interfaces by name and
+        only the minimal set of changes is written, using bulk operations
+        inside of a single transaction. Existing Interfaces that are not
+        present in ``interfaces`` are deleted. Parent relationships are left
+        untouched unless the parent itself is deleted.
+
+        Returns an ``InterfaceSync`` of lists of (created, updated, deleted)
+        Interface objects. Deleted objects reflect their state prior to
+        deletion.
+
+        :param interfaces:
+            List of Interface dicts. Each must contain ``name`` and may contain
+            ``description``, ``type``, ``mac_address``, ``speed``,
+            ``addresses`` and ``attributes``. Omitted fields revert to their
+            default values.
+        """
+        log.debug('Device.sync_interfaces() interfaces = %r', interfaces)
+        if not isinstance(interfaces, list):
+            raise exc.ValidationError(
+                'Expected list but received {}'.format(type(interfaces))
+            )
+
+        valid_attributes = Attribute.all_by_name('Interface', self.site)
+        attributes_by_id = {a.id: a for a in valid_attributes.itervalues()}
+        mac_default = Interface._meta.get_field('mac_address').get_default()
+        fields_to_compare = ('description', 'type', 'mac_address', 'speed')
+
+        def sorted_attributes(attributes):
+            return {
+                k: sorted(v) if isinstance(v, list) else v
+                for k, v in attributes.iteritems()
+            }
+
+        # Validate the entire desired state before anything is written. This
+        # maps name => (Interface, Value inserts, attributes, addresses).
+        desired = collections.OrderedDict()
+        seen_addresses = set()
+        for item in interfaces:
+            if not isinstance(item, dict):
+                raise exc.ValidationError(
+                    'Expected dictionary but received {}'.format(type(item))
+                )
+
+            iface = Interface(
+                device=self, site_id=self.site_id,
+                name=item.get('name'),
+                description=item.get('description') or '',
+                type=item.get('type', settings.INTERFACE_DEFAULT_TYPE),
+                mac_address=item.get('mac_address', mac_default),
+                speed=item.get('speed', settings.INTERFACE_DEFAULT_SPEED),
+            )
+            iface.clean_fields()
+
+            if iface.name in desired:
+                raise exc.ValidationError({
+                    'name': 'Duplicate interface name: %r' % iface.name
+                })
+
+            inserts = iface.validate_attributes(
+                item.get('attributes') or {}, valid_attributes
+            )
+            attributes = {}
+            for insert in inserts:
+                attribute = attributes_by_id[insert['attribute_id']]
+                if attribute.multi:
+                    attributes.setdefault(attribute.name, []).append(
+                        insert['value']
+                    )
+                else:
+                    attributes[attribute.name] = insert['value']
+
+            addresses = item.get('addresses') or []
+            if not isinstance(addresses, list):
+                raise exc.ValidationError(
+                    'Expected list but received {}'.format(type(addresses))
+                )
+
+            cidrs = []
+            for cidr in addresses:
+                validators.validate_host_address(cidr)
+                cidr = validators.validate_cidr(cidr)
+                if cidr in cidrs:
+                    continue
+                if cidr in seen_addresses:
+                    raise exc.ValidationError({
+                        'address': 'Address already assigned to this Device.'
+                    })
+                seen_addresses.add(cidr)
+                cidrs.append(cidr)
+
+            desired[iface.name] = (iface, inserts, attributes, cidrs)
+
+        with cache.atomic():
+            existing = {i.name: i for i in self.interfaces.select_for_update()}
+
+            # Map interface_id => {cidr: Assignment} for all assignments on
+            # this Device.
+            assignments = collections.defaultdict(dict)
+            query = Assignment.objects.filter(interface__device=self)
+            for assignment in query.select_related('address'):
+                cidr = validators.validate_cidr(assignment.address.cidr)
+                assignments[assignment.interface_id][cidr] = assignment
+
+            to_create, to_update, to_delete = [], [], []
+            new_addresses, new_values = [], []
+            for name, (iface, inserts, attributes, cidrs) in desired.items():
+                current = existing.get(name)
+                if current is None:
+                    to_create.append(name)
+                    new_addresses.append((name, cidrs))
+                    new_values.append((name, inserts))
+                    continue
+
+                changed = False
+                for field in fields_to_compare:
+                    value = getattr(iface, field)
+                    if getattr(current, field) != value:
+                        setattr(current, field, value)
+                        changed = True
+
+                current_cidrs = set(assignments[current.id])
+                if current_cidrs != set(cidrs):
+                    new_addresses.append((name, cidrs))
+                    changed = True
+
+                current_attributes = current.get_attributes()
+                if (sorted_attributes(current_attributes) !=
+                        sorted_attributes(attributes)):
+                    current._attributes_cache = attributes
+                    new_values.append((name, inserts))
+                    changed = True
+
+                if changed:
+                    to_update.append(current)
+
+            for name, current in existing.iteritems():
+                if name not in desired:
+                    to_delete.append(current)
+
+            # Delete the interfaces that are no longer wanted, along with their
+            # assignments and attribute values. Any surviving children are
+            # orphaned so that the parent's PROTECT doesn't block the delete.
+            deleted_ids = [i.id for i in to_delete]
+            freed_ids = set(
+                assignment.address_id for iface_id in deleted_ids
+                for assignment in assignments[iface_id].itervalues()
+            )
+            if deleted_ids:
+                for current in existing.itervalues():
+                    if (current.parent_id in deleted_ids and
+                            current.id not in deleted_ids):
+                        current.parent_id = None
+                        if current not in to_update:
+                            to_update.append(current)
+
+                Interface.objects.filter(parent__in=deleted_ids).update(
+                    parent=None
+                )
+                Assignment.objects.filter(interface__in=deleted_ids).delete()
+                Value.objects.filter(
+                    resource_name='Interface', resource_id__in=deleted_ids
+                ).delete()
+                Interface.objects.filter(id__in=deleted_ids).delete()
+
+            # Look up the host Networks for all new addresses in one query and
+            # create any that are missing.
+            wanted = set()
+            for name, cidrs in new_addresses:
+                wanted.update(cidrs)
+
+            networks = {}
+            if wanted:
+                query = Network.objects.filter(
+                    site=self.site, is_ip=True,
+                    network_address__in=[
+                        unicode(c.network_address) for c in wanted
+                    ],
+                )
+                for network in query:
+                    cidr = validators.validate_cidr(network.cidr)
+                    if cidr in wanted:
+                        networks[cidr] = network
+
+                for cidr in wanted:
+                    if cidr not in networks:
+                        networks[cidr] = Network.objects.create(
+                            cidr=unicode(cidr), site=self.site
+                        )
+
+            parents = Network.objects.in_bulk(
+                set(n.parent_id for n in networks.itervalues())
+            )
+
+            def cache_addresses(iface, cidrs):
+                addresses = [networks[c] for c in cidrs]
+                parent_ids = sorted(set(a.parent_id for a in addresses))
+                iface._addresses_cache = [a.cidr for a in addresses]
+                iface._networks_cache = [parents[p].cidr for p in parent_ids]
+
+            # Create the new interfaces.
+            objects = []
+            for name in to_create:
+                iface, inserts, attributes, cidrs = desired[name]
+                iface._attributes_cache = attributes
+                cache_addresses(iface, cidrs)
+                objects.append(iface)
+
+            created = []
+            if objects:
+                Interface.objects.bulk_create(objects)
+                created = list(self.interfaces.filter(name__in=to_create))
+
+            # Update the interfaces that have changed.
+            addresses_by_name = dict(new_addresses)
+            for current in to_update:
+                if current.name in addresses_by_name:
+                    cache_addresses(current, addresses_by_name[current.name])
+            Interface.objects.bulk_update(to_update, [
+                'description', 'type', 'mac_address', 'speed', 'parent',
+                '_attributes_cache', '_addresses_cache', '_networks_cache',
+            ])
+
+            by_name = {i.name: i for i in created + to_update}
+
+            # Replace stale assignments with new ones.
+            stale, fresh = [], []
+            for name, cidrs in new_addresses:
+                iface = by_name[name]
+                current = assignments.get(iface.id, {})
+                for cidr, assignment in current.iteritems():
+                    if cidr not in cidrs:
+                        stale.append(assignment.id)
+                        freed_ids.add(assignment.address_id)
+                fresh.extend(
+                    Assignment(interface=iface, address=networks[c])
+                    for c in cidrs if c not in current
+                )
+
+            if stale:
+                Assignment.objects.filter(id__in=stale).delete()
+            address_ids = [a.address_id for a in fresh]
+            if fresh:
+                Assignment.objects.bulk_create(fresh)
+                Network.objects.filter(id__in=address_ids).update(
+                    state=Network.ASSIGNED
+                )
+
+            # Addresses that are no longer assigned to any interface are
+            # orphaned, like when their assignments are deleted.
+            freed_ids.difference_update(address_ids)
+            if freed_ids:
+                freed_ids.difference_update(
+                    Assignment.objects.filter(
+                        address__in=freed_ids
+                    ).values_list('address_id', flat=True)
+                )
+                Network.objects.filter(
+                    id__in=freed_ids, state=Network.ASSIGNED
+                ).update(state=Network.ORPHANED)
+
+            # Replace attribute values.
+            Value.objects.filter(
+                resource_name='Interface',
+                resource_id__in=[
+                    by_name[iface_name].id
+                    for iface_name, iface_inserts in new_values
+                ],
+            ).delete()
+            Value.objects.bulk_create([
+                Value(
+                    attribute_id=insert['attribute_id'],
+                    value=insert['value'],
+                    name=attributes_by_id[insert['attribute_id']].name,
+                    resource_name='Interface',
+                    resource_id=by_name[iface_name].id,
+                    site_id=self.site_id,
+                )
+                for iface_name, iface_inserts in new_values
+                for insert in iface_inserts
+            ])
+
+        # Bulk creation and updates don't send signals, so invalidate the
+        # cache. New objects can only appear in list views.
+        if created or to_update:
+            cache.invalidate_many(
+                'Interface', [self.site_id], [i.id for i in to_update]
+            )
+        if fresh:
+            cache.invalidate('Assignment', site_id=self.site_id)
+        if fresh or freed_ids:
+            cache.invalidate_many(
+                'Network', [self.site_id], freed_ids.union(address_ids)
+            )
+
+        return InterfaceSync(created, to_update, to_delete)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -512,6 +946,13 @@ class Device(Resource):
             'attributes': self.get_attributes(),
         }
 
+    DICT_FIELDS = (
+        ('id', 'id'),
+        ('site_id', 'site_id'),
+        ('hostname', 'hostname'),
+        ('attributes', '_attributes_cache'),
+    )
+
 
 class NetworkManager(ResourceManager):
     """Manager for NetworkInterface objects."""
@@ -527,6 +968,298 @@ class NetworkManager(ResourceManager):
     def reserved(self):
         return Network.objects.filter(state=Network.RESERVED)
 
+    def bulk_create_networks(self, items, partial=False, chunk_size=500):
+        """
+        Create many Networks at once, much faster than saving each of them.
+
+        Networks are created in order of prefix length, so that the parent of
+        each of them exists before it's created. Parents are found in memory
+        from the new Networks and the existing ones that overlap them, rather
+        than with queries for each Network. The Networks of each prefix length
+        are inserted with ``bulk_create()`` a chunk at a time, along with their
+        attribute Values, each chunk in a savepoint. Existing Networks that
+        are inside of the new ones are then reparented.
+
+        Returns a ``NetworkBulkCreate`` of the list of created Networks, in
+        the order of ``items``, and a list of (key, error) pairs for the
+        items that couldn't be created.
+
+        :param items:
+            List of (key, data) pairs. ``data`` is a dict that must contain
+            ``cidr`` and ``site_id`` and may contain ``state`` and
+            ``attributes``. ``key`` identifies the item in errors.
+
+        :param partial:
+            If set, items that fail are left out and returned as errors,
+            instead of raising the error
+
+        :param chunk_size:
+            Maximum number of Networks to insert at once
+        """
+        errors = []
+
+        def fail(key, err):
+            if not partial:
+                raise err
+            errors.append((key, err))
+
+        sites = Site.objects.in_bulk(
+            set(data.get('site_id') for key, data in items)
+        )
+        valid_attributes = {}
+        attributes_by_id = {}
+
+        # Validate all of the items, and group them by (site_id, ip_version,
+        # prefix_length). This maps the group to lists of (position, key,
+        # Network, Value inserts, integer network address).
+        groups = collections.defaultdict(list)
+        for position, (key, data) in enumerate(items):
+            data = dict(data)
+            attributes = data.pop('attributes', None) or {}
+            site_id = data.get('site_id')
+            if site_id not in sites:
+                fail(key, exc.ValidationError({
+                    'site_id': 'Site does not exist: %r' % site_id
+                }))
+                continue
+
+            if site_id not in valid_attributes:
+                valid_attributes[site_id] = Attribute.all_by_name(
+                    'Network', site_id
+                )
+                attributes_by_id.update(
+                    (a.id, a) for a in valid_attributes[site_id].itervalues()
+                )
+
+            network = Network(**data)
+            try:
+                network.clean_fields()
+                inserts = network.validate_attributes(
+                    attributes, valid_attributes[site_id]
+                )
+            except exc.ValidationError as err:
+                fail(key, err)
+                continue
+
+            network._attributes_cache = {}
+            for insert in inserts:
+                attribute = attributes_by_id[insert['attribute_id']]
+                if attribute.multi:
+                    network._attributes_cache.setdefault(
+                        attribute.name, []
+                    ).append(insert['value'])
+                else:
+                    network._attributes_cache[attribute.name] = (
+                        insert['value']
+                    )
+
+            address = int(ipaddress.ip_address(network.network_address))
+            group = (site_id, network.ip_version, network.prefix_length)
+            groups[group].append((position, key, network, inserts, address))
+
+        # Merge the address ranges of the new Networks into spans of
+        # contiguous addresses, for each (site_id, ip_version).
+        spans = collections.defaultdict(list)
+        for (site_id, ip_version, prefix_length), pending in groups.items():
+            bits = 32 if ip_version == '4' else 128
+            size = 1 << (bits - prefix_length)
+            spans[site_id, ip_version].extend(
+                (item[4], item[4] + size - 1) for item in pending
+            )
+        for ranges in spans.itervalues():
+            ranges.sort()
+            merged = []
+            for first, last in ranges:
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            ranges[:] = merged
+
+        # Map (site_id, ip_version) => {prefix_length: {address: id}} for
+        # every Network that may be a parent, and keep the existing Networks
+        # to check for duplicates and to reparent them. Since Networks are
+        # either nested or disjoint, only the Networks that overlap a span are
+        # either supernets of a new Network or inside of one of them, so the
+        # other Networks of the site are never fetched.
+        parents = collections.defaultdict(
+            lambda: collections.defaultdict(dict)
+        )
+        existing = collections.defaultdict(list)
+        taken = set()
+        address_field = Network._meta.get_field('network_address')
+        for (site_id, ip_version), ranges in spans.iteritems():
+            to_address = (
+                ipaddress.IPv4Address if ip_version == '4' else
+                ipaddress.IPv6Address
+            )
+            prefixes = parents[site_id, ip_version]
+            seen = set()
+
+            # Two query parameters per span, to stay well below the limit of
+            # SQLite.
+            for start in xrange(0, len(ranges), 200):
+                overlaps = Q()
+                for first, last in ranges[start:start + 200]:
+                    overlaps |= Q(
+                        network_address__lte=unicode(to_address(last)),
+                        broadcast_address__gte=unicode(to_address(first))
+                    )
+                query = Network.objects.filter(
+                    overlaps, site=site_id, ip_version=ip_version
+                ).values_list(
+                    'id', 'network_address', 'prefix_length', 'is_ip',
+                    'parent_id'
+                )
+                for row_id, address, prefix_length, is_ip, parent_id in (
+                        query.iterator()):
+                    if row_id in seen:
+                        continue
+                    seen.add(row_id)
+                    address = int(ipaddress.ip_address(
+                        unicode(address_field.to_python(address))
+                    ))
+                    if not is_ip:
+                        prefixes[prefix_length][address] = row_id
+                    existing[site_id, ip_version].append(
+                        (row_id, address, prefix_length, parent_id)
+                    )
+                    taken.add((site_id, ip_version, prefix_length, address))
+
+        def find_parent(site_id, ip_version, prefix_length, address):
+            """Return the id of the closest supernet, if any."""
+            prefixes = parents[site_id, ip_version]
+            bits = 32 if ip_version == '4' else 128
+            for length in sorted(prefixes, reverse=True):
+                if length >= prefix_length:
+                    continue
+                mask = ((1 << length) - 1) << (bits - length)
+                parent_id = prefixes[length].get(address & mask)
+                if parent_id is not None:
+                    return parent_id
+            return None
+
+        def insert(site_id, chunk):
+            """Insert a chunk of Networks and their Values."""
+            networks = [item[2] for item in chunk]
+            Network.objects.bulk_create(networks)
+
+            # Fetch the ids, since ``bulk_create()`` doesn't set them.
+            query = Network.objects.filter(
+                site=site_id, ip_version=networks[0].ip_version,
+                prefix_length=networks[0].prefix_length,
+                network_address__in=[n.network_address for n in networks]
+            ).values_list('network_address', 'id')
+            ids = {address_field.to_python(a): i for a, i in query}
+            for network in networks:
+                network.id = ids[network.network_address]
+
+            Value.objects.bulk_create([
+                Value(
+                    attribute_id=insert['attribute_id'],
+                    value=insert['value'],
+                    name=attributes_by_id[insert['attribute_id']].name,
+                    resource_name='Network',
+                    resource_id=network.id,
+                    site_id=site_id,
+                )
+                for position, key, network, inserts, address in chunk
+                for insert in inserts
+            ])
+
+        created = []
+        new_ids = set()
+        with cache.atomic():
+            for group in sorted(groups):
+                site_id, ip_version, prefix_length = group
+                pending = groups[group]
+                for start in xrange(0, len(pending), chunk_size):
+                    chunk = []
+                    for item in pending[start:start + chunk_size]:
+                        position, key, network, inserts, address = item
+                        unique = (site_id, ip_version, prefix_length, address)
+                        if unique in taken:
+                            fail(key, exc.Conflict(
+                                'Network already exists: %s' % network.cidr
+                            ))
+                            continue
+
+                        network.parent_id = find_parent(
+                            site_id, ip_version, prefix_length, address
+                        )
+                        if network.parent_id is None and network.is_ip:
+                            fail(key, exc.ValidationError(
+                                'IP Address needs base network.'
+                            ))
+                            continue
+
+                        taken.add(unique)
+                        chunk.append(item)
+
+                    if not chunk:
+                        continue
+
+                    try:
+                        with cache.atomic():
+                            insert(site_id, chunk)
+                        done = chunk
+                    except exc.IntegrityError:
+                        if not partial:
+                            raise
+
+                        # Retry one at a time to find the items that fail.
+                        done = []
+                        for item in chunk:
+                            item[2].id = None
+                            try:
+                                with cache.atomic():
+                                    insert(site_id, [item])
+                            except exc.IntegrityError as err:
+                                fail(item[1], exc.Conflict(err.message))
+                            else:
+                                done.append(item)
+
+                    for position, key, network, inserts, address in done:
+                        if not network.is_ip:
+                            parents[site_id, ip_version][prefix_length][
+                                address
+                            ] = network.id
+                        new_ids.add(network.id)
+                        created.append((position, network))
+
+            # Reparent the existing Networks that are inside of new ones.
+            reparented = collections.defaultdict(list)
+            for (site_id, ip_version), rows in existing.iteritems():
+                for row_id, address, prefix_length, parent_id in rows:
+                    new_parent_id = find_parent(
+                        site_id, ip_version, prefix_length, address
+                    )
+                    if new_parent_id in new_ids and new_parent_id != parent_id:
+                        reparented[new_parent_id].append((site_id, row_id))
+
+            for parent_id, children in reparented.iteritems():
+                child_ids = [child[1] for child in children]
+                for start in xrange(0, len(child_ids), chunk_size):
+                    Network.objects.filter(
+                        id__in=child_ids[start:start + chunk_size]
+                    ).update(parent=parent_id)
+
+        # Neither the inserts nor the reparenting send signals. The new
+        # Networks can't have been cached yet, so only the lists of their
+        # Sites are stale, along with the reparented Networks.
+        children = list(itertools.chain(*reparented.itervalues()))
+        if created or children:
+            cache.invalidate_many(
+                'Network',
+                site_ids=set(item[1].site_id for item in created).union(
+                    child[0] for child in children
+                ),
+                obj_ids=[child[1] for child in children]
+            )
+
+        created.sort(key=lambda item: item[0])
+        return NetworkBulkCreate([n for p, n in created], errors)
+
 
 class Network(Resource):
     """Represents a subnet or IP address."""
@@ -849,7 +1582,11 @@ class Network(Resource):
             broadcast_address__lte=self.broadcast_address
         )
 
-        query.update(parent=self)
+        # Updates don't send signals, so invalidate the cache of the children.
+        child_ids = list(query.values_list('id', flat=True))
+        if child_ids:
+            Network.objects.filter(id__in=child_ids).update(parent=self)
+            cache.invalidate_many('Network', [self.site_id], child_ids)
 
     def clean_state(self, value):
         """Enforce that state is one of the valid states."""
@@ -932,6 +1669,32 @@ class Network(Resource):
             'attributes': self.get_attributes(),
         }
 
+    DICT_FIELDS = (
+        ('id', 'id'),
+        ('parent_id', 'parent_id'),
+        ('site_id', 'site_id'),
+        ('is_ip', 'is_ip'),
+        ('ip_version', 'ip_version'),
+        ('network_address', 'network_address'),
+        ('prefix_length', 'prefix_length'),
+        ('state', 'state'),
+        ('attributes', '_attributes_cache'),
+    )
+
+    @classmethod
+    def dict_from_values(cls, values):
+        return {
+            'id': values['id'],
+            'parent_id': values['parent_id'],
+            'site_id': values['site_id'],
+            'is_ip': values['is_ip'],
+            'ip_version': values['ip_version'],
+            'network_address': values['network_address'],
+            'prefix_length': values['prefix_length'],
+            'state': values['state'],
+            'attributes': values['attributes'],
+        }
+
 
 class Interface(Resource):
     """A network interface."""
@@ -1241,6 +2004,47 @@ class Interface(Resource):
             'attributes': self.get_attributes(),
         }
 
+    DICT_FIELDS = (
+        ('id', 'id'),
+        ('parent_id', 'parent_id'),
+        ('name', 'name'),
+        ('device', 'device_id'),
+        ('description', 'description'),
+        ('addresses', '_addresses_cache'),
+        ('networks', '_networks_cache'),
+        ('mac_address', 'mac_address'),
+        ('speed', 'speed'),
+        ('type', 'type'),
+        ('attributes', '_attributes_cache'),
+    )
+
+    @classmethod
+    def dict_from_values(cls, values):
+        return {
+            'id': values['id'],
+            'parent_id': values['parent_id'],
+            'name': values['name'],
+            'device': values['device'],
+            'description': values['description'],
+            'addresses': values['addresses'],
+            'networks': values['networks'],
+            'mac_address': values['mac_address'],
+            'speed': values['speed'],
+            'type': values['type'],
+            'attributes': values['attributes'],
+        }
+
+    @classmethod
+    def get_dict_converter(cls, key, field):
+        """Convert MAC addresses like ``get_mac_address()`` does."""
+        if key == 'mac_address':
+            def convert(value):
+                if value is None:
+                    return
+                return str(field.to_python(value))
+            return convert
+        return super(Interface, cls).get_dict_converter(key, field)
+
 
 class Assignment(models.Model):
     """
@@ -1288,7 +2092,7 @@ class Assignment(models.Model):
     def to_dict(self):
         return {
             'id': self.id,
-            'device': self.interface.device.id,
+            'device': self.interface.device_id,
             'hostname': self.interface.device.hostname,
             'interface': self.interface.id,
             'interface_name': self.interface.name,
@@ -1296,6 +2100,28 @@ class Assignment(models.Model):
         }
 
 
+# Attributes by (resource_name, site_id) while ``cache_attributes()`` is used.
+_attribute_cache = threading.local()
+
+
+@contextlib.contextmanager
+def cache_attributes():
+    """
+    Context manager that caches ``Attribute.all_by_name()`` in this thread,
+    e.g. while validating the attributes of many objects. The cache is cleared
+    whenever an Attribute is saved or deleted.
+    """
+    if getattr(_attribute_cache, 'by_name', None) is not None:
+        yield  # Already caching.
+        return
+
+    _attribute_cache.by_name = {}
+    try:
+        yield
+    finally:
+        _attribute_cache.by_name = None
+
+
 class Attribute(models.Model):
     """Represents a flexible attribute for Resource objects."""
     # This is purposely not unique as there is a compound index with site_id.
@@ -1342,12 +2168,20 @@ class Attribute(models.Model):
         if site is None:
             raise SyntaxError('You must provided a site.')
 
+        cached = getattr(_attribute_cache, 'by_name', None)
+        key = (resource_name, getattr(site, 'pk', site))
+        if cached is not None and key in cached:
+            return dict(cached[key])
+
         query = cls.objects.filter(resource_name=resource_name, site=site)
 
-        return {
+        by_name = {
             attribute.name: attribute
             for attribute in query.all()
         }
+        if cached is not None:
+            cached[key] = dict(by_name)
+        return by_name
 
     def clean_constraints(self, value):
         """Enforce formatting of constraints."""
@@ -1563,13 +2397,358 @@ class Value(models.Model):
         }
 
 
+class ChangeManager(models.Manager):
+    """Manager for Changes that can log many changes at once."""
+    def log_changes(self, objects, user, event, resources=None):
+        """
+        Log a Change for each object in a single query.
+
+        If ``ASYNC_CHANGE_LOG`` is set, the changes are written to the outbox
+        (see ``PendingChange``) instead.
+
+        :param objects:
+            List of objects that changed
+
+        :param user:
+            User who made the changes
+
+        :param event:
+            Change event (e.g. 'Create')
+
+        :param resources:
+            Optional list of the objects already serialized, in the same
+            order. If not provided, each object is serialized.
+        """
+        if resources is None:
+            resources = [None] * len(objects)
+
+        changes = []
+        for obj, resource in zip(objects, resources):
+            change = self.model(
+                obj=obj, user=user, event=event, resource=resource
+            )
+            change.full_clean()
+            changes.append(change)
+
+        if settings.ASYNC_CHANGE_LOG:
+            return PendingChange.objects.bulk_create(
+                [PendingChange.from_change(pending) for pending in changes]
+            )
+        return self.bulk_create(self.encode_deltas(changes))
+
+    def encode_deltas(self, changes):
+        """
+        If ``CHANGE_LOG_DELTAS`` is set, store the resources of unsaved
+        Changes as deltas against the latest checkpoint (a Change with the
+        full resource) of the same resource.
+
+        A Change is stored in full as a new checkpoint instead if it's the
+        first one of the resource, if there have been
+        ``CHANGE_LOG_CHECKPOINT_INTERVAL`` Changes since the latest
+        checkpoint, if the delta isn't smaller, or if there's an earlier
+        Change of the same resource in ``changes`` (which has no ID yet).
+
+        :param changes:
+            List of unsaved Changes with full resources
+        """
+        if not settings.CHANGE_LOG_DELTAS:
+            return changes
+
+        checkpoints = self.get_checkpoints(changes)
+        seen = set()
+        for change in changes:
+            key = (change.resource_name, change.resource_id)
+            checkpoint = None if key in seen else checkpoints.get(key)
+            seen.add(key)
+            if checkpoint is None:
+                continue
+            if checkpoint.num_deltas + 1 >= (
+                    settings.CHANGE_LOG_CHECKPOINT_INTERVAL):
+                continue
+
+            # Compare with the resource as it will be decoded.
+            encoded = json.dumps(change._resource, cls=DjangoJSONEncoder)
+            delta = diff_dict(checkpoint._resource, json.loads(encoded))
+            if len(json.dumps(delta, cls=DjangoJSONEncoder)) < len(encoded):
+                change.checkpoint = checkpoint
+                change._resource = delta
+
+        return changes
+
+    def get_checkpoints(self, changes, chunk_size=500):
+        """
+        Return the latest checkpoints of the resources of ``changes``, by
+        (resource_name, resource_id). Each checkpoint has the number of
+        deltas against it as ``num_deltas``.
+
+        :param changes:
+            List of Changes
+
+        :param chunk_size:
+            Maximum number of IDs per query
+        """
+        resource_ids = collections.defaultdict(set)
+        for change in changes:
+            resource_ids[change.resource_name].add(change.resource_id)
+
+        checkpoint_ids = []
+        for resource_name, ids in resource_ids.iteritems():
+            ids = list(ids)
+            for i in xrange(0, len(ids), chunk_size):
+                latest = self.filter(
+                    resource_name=resource_name,
+                    resource_id__in=ids[i:i + chunk_size],
+                    checkpoint__isnull=True,
+                ).values('resource_id').annotate(latest=Max('id')).order_by()
+                checkpoint_ids.extend(row['latest'] for row in latest)
+
+        checkpoints = {}
+        for i in xrange(0, len(checkpoint_ids), chunk_size):
+            chunk = checkpoint_ids[i:i + chunk_size]
+            num_deltas = dict(
+                self.filter(checkpoint__in=chunk).values_list(
+                    'checkpoint'
+                ).annotate(Count('id')).order_by()
+            )
+            for checkpoint in self.filter(id__in=chunk):
+                checkpoint.num_deltas = num_deltas.get(checkpoint.id, 0)
+                key = (checkpoint.resource_name, checkpoint.resource_id)
+                checkpoints[key] = checkpoint
+
+        return checkpoints
+
+    def get_as_of(self, resource_name, resource_id, as_of):
+        """
+        Return the latest Change of a resource made at or before ``as_of``,
+        or ``None``. Its ``resource`` is the resource as it was then, unless
+        its event is ``Delete``.
+
+        :param resource_name:
+            Name of the resource's model
+
+        :param resource_id:
+            ID of the resource
+
+        :param as_of:
+            Datetime
+        """
+        return self.filter(
+            resource_name=resource_name, resource_id=resource_id,
+            change_at__lte=as_of
+        ).select_related('checkpoint').order_by('-id').first()
+
+    def snapshot(self, as_of, site_id=None, resource_names=None, after=None,
+                 chunk_size=500):
+        """
+        Yield the latest Change of each resource that existed at ``as_of``,
+        by resource name and ID. Their ``resource`` is the resource as it was
+        then.
+
+        Resources are looked up ``chunk_size`` at a time in the order of the
+        ``(resource_name, resource_id, change_at)`` index, so that each query
+        only scans the Changes of a chunk of resources instead of the whole
+        history. Resources stored as deltas are rebuilt from the checkpoint
+        fetched along with their Change.
+
+        :param as_of:
+            Datetime
+
+        :param site_id:
+            Only include the resources of this Site
+
+        :param resource_names:
+            Only include the resources of these models
+
+        :param after:
+            ``(resource_name, resource_id)`` of the resource to start after
+
+        :param chunk_size:
+            Maximum number of Changes fetched per query
+        """
+        changes = self.filter(change_at__lte=as_of)
+        if site_id is not None:
+            changes = changes.filter(site=site_id)
+        if resource_names is not None:
+            changes = changes.filter(resource_name__in=resource_names)
+
+        fields = ('resource_name', 'resource_id')
+        while True:
+            query = changes
+            if after is not None:
+                query = query.filter(Q(resource_name__gt=after[0]) | Q(
+                    resource_name=after[0], resource_id__gt=after[1]
+                ))
+            latest = list(
+                query.values_list(*fields).annotate(
+                    latest=Max('id')
+                ).order_by(*fields)[:chunk_size]
+            )
+            if not latest:
+                return
+
+            ids = [row[2] for row in latest]
+            chunk = self.filter(id__in=ids).exclude(
+                event='Delete'
+            ).select_related('checkpoint')
+            for change in sorted(chunk, key=attrgetter(*fields)):
+                yield change
+
+            if len(latest) < chunk_size:
+                return
+            after = latest[-1][:2]
+
+    def archive(self, stream, before, keep=0, site_id=None,
+                batch_size=1000):
+        """
+        Write Changes made before ``before`` to ``stream`` as NDJSON, oldest
+        first, and delete them.
+
+        Each batch of Changes is written and then deleted in its own short
+        transaction, so that the Change log is never locked for long. Deltas
+        that are kept (see ``encode_deltas()``) are stored in full before
+        their checkpoint is deleted.
+
+        Returns the number of Changes that were archived.
+
+        :param stream:
+            File-like object to write to
+
+        :param before:
+            Datetime before which Changes are archived
+
+        :param keep:
+            Number of latest Changes to keep for each resource, regardless of
+            when they were made
+
+        :param site_id:
+            Only archive the Changes of this Site
+
+        :param batch_size:
+            Maximum number of Changes to delete per transaction
+        """
+        changes = self.filter(change_at__lt=before).select_related(
+            'site', 'user', 'checkpoint'
+        ).order_by('id')
+        if site_id is not None:
+            changes = changes.filter(site=site_id)
+
+        kept = {}
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(changes.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            if keep:
+                kept.update(self.get_latest_ids(
+                    [c for c in batch
+                     if (c.resource_name, c.resource_id) not in kept],
+                    keep
+                ))
+                batch = [
+                    c for c in batch
+                    if c.id not in kept[(c.resource_name, c.resource_id)]
+                ]
+                if not batch:
+                    continue
+
+            for change in batch:
+                stream.write(json.dumps(
+                    change.to_dict(), cls=DjangoJSONEncoder,
+                    separators=(',', ':')
+                ) + '\n')
+            stream.flush()
+
+            ids = [c.id for c in batch]
+            with cache.atomic():
+                self.materialize_deltas(
+                    [c.id for c in batch if c.checkpoint_id is None],
+                    exclude=ids
+                )
+                self.filter(id__in=ids).delete()
+
+            total += len(batch)
+            log.debug('Archived %s changes.', total)
+
+        return total
+
+    def get_latest_ids(self, changes, keep, chunk_size=500):
+        """
+        Return the IDs of the ``keep`` latest Changes of the resources of
+        ``changes``, as sets by (resource_name, resource_id).
+
+        :param changes:
+            List of Changes
+
+        :param keep:
+            Number of Changes per resource
+
+        :param chunk_size:
+            Maximum number of IDs per query
+        """
+        resource_ids = collections.defaultdict(set)
+        for change in changes:
+            resource_ids[change.resource_name].add(change.resource_id)
+
+        latest = {}
+        for resource_name, ids in resource_ids.iteritems():
+            ids = list(ids)
+            for i in xrange(0, len(ids), chunk_size):
+                rows = self.filter(
+                    resource_name=resource_name,
+                    resource_id__in=ids[i:i + chunk_size],
+                ).order_by('resource_id', '-id').values_list(
+                    'resource_id', 'id'
+                )
+                for resource_id, change_id in rows:
+                    key = (resource_name, resource_id)
+                    kept = latest.setdefault(key, set())
+                    if len(kept) < keep:
+                        kept.add(change_id)
+
+        return latest
+
+    def materialize_deltas(self, checkpoint_ids, exclude=(), chunk_size=500):
+        """
+        Store the deltas against ``checkpoint_ids`` with their full resources,
+        so that the checkpoints may be deleted.
+
+        :param checkpoint_ids:
+            IDs of the checkpoints
+
+        :param exclude:
+            IDs of deltas to leave as they are (e.g. because they're deleted
+            too)
+
+        :param chunk_size:
+            Maximum number of IDs per query
+        """
+        exclude = set(exclude)
+        for i in xrange(0, len(checkpoint_ids), chunk_size):
+            deltas = self.filter(
+                checkpoint__in=checkpoint_ids[i:i + chunk_size]
+            ).select_related('checkpoint')
+            for delta in deltas:
+                if delta.id in exclude:
+                    continue
+                self.filter(id=delta.id).update(
+                    _resource=delta.resource, checkpoint=None
+                )
+
+
 class Change(models.Model):
     """Record of all changes in NSoT."""
     site = models.ForeignKey(Site, db_index=True, related_name='changes')
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, related_name='changes', db_index=True
     )
-    change_at = models.DateTimeField(auto_now_add=True, null=False)
+    # Not auto_now_add, so that Changes logged through the outbox keep the
+    # time of the change.
+    change_at = models.DateTimeField(
+        default=timezone.now, editable=False, null=False, db_index=True
+    )
     event = models.CharField(
         max_length=10, null=False, choices=EVENT_CHOICES,
     )
@@ -1580,12 +2759,23 @@ class Change(models.Model):
     )
     _resource = fields.JSONField('Resource', null=False, blank=True)
 
+    # If set, _resource is a delta against the resource of this Change.
+    checkpoint = models.ForeignKey(
+        'self', null=True, blank=True, editable=False, related_name='deltas'
+    )
+
+    objects = ChangeManager()
+
     def __init__(self, *args, **kwargs):
         self._obj = kwargs.pop('obj', None)
+        self._obj_resource = kwargs.pop('resource', None)
         super(Change, self).__init__(*args, **kwargs)
 
     class Meta:
         get_latest_by = 'change_at'
+        index_together = [
+            ('resource_name', 'resource_id', 'change_at'),
+        ]
 
     def __unicode__(self):
         return u'%s %s(%s)' % (self.event, self.resource_name,
@@ -1593,7 +2783,9 @@ class Change(models.Model):
 
     @property
     def resource(self):
-        return self._resource
+        if self.checkpoint_id is None:
+            return self._resource
+        return patch_dict(self.checkpoint._resource, self._resource)
 
     def get_change_at(self):
         return timegm(self.change_at.timetuple())
@@ -1628,6 +2820,11 @@ class Change(models.Model):
         # Site doesn't have an id to itself, so if obj is a Site, use it.
         self.site = obj if isinstance(obj, Site) else obj.site
 
+        # Skip serializing the object if it's been done already.
+        if self._obj_resource is not None:
+            self._resource = self._obj_resource
+            return
+
         serializer_class = self.get_serializer_for_resource(self.resource_name)
         serializer = serializer_class(obj)
         self._resource = serializer.data
@@ -1653,15 +2850,538 @@ class Change(models.Model):
         }
 
 
+class PendingChangeManager(models.Manager):
+    """Manager for PendingChanges."""
+    def materialize(self, batch_size=1000):
+        """
+        Move the oldest pending changes to the Change log, in order.
+
+        The pending changes are locked until they're moved, so that
+        concurrent workers never move the same changes, and the Changes of
+        each batch are always logged after those of the previous one.
+
+        Pending changes may be committed in a different order than their IDs,
+        so they are only moved once they are older than
+        ``CHANGE_LOG_SETTLE_TIME``, and never after one that isn't, so that a
+        pending change that is committed late is still logged in order.
+
+        Returns the number of changes that were moved.
+
+        :param batch_size:
+            Maximum number of changes to move
+        """
+        settled_at = timezone.now() - datetime.timedelta(
+            seconds=settings.CHANGE_LOG_SETTLE_TIME
+        )
+        with cache.atomic():
+            pending = list(itertools.takewhile(
+                lambda change: change.change_at <= settled_at,
+                self.select_for_update().order_by('id')[:batch_size]
+            ))
+            if not pending:
+                return 0
+
+            Change.objects.bulk_create(
+                Change.objects.encode_deltas(
+                    [change.to_change() for change in pending]
+                )
+            )
+            self.filter(id__in=[change.id for change in pending]).delete()
+
+        log.debug('Materialized %s pending changes.', len(pending))
+        return len(pending)
+
+
+class PendingChange(models.Model):
+    """
+    Outbox of changes waiting to be written to the Change log.
+
+    When ``ASYNC_CHANGE_LOG`` is set, changes are written here in the same
+    transaction as the objects that changed, which is cheaper than writing to
+    the indexed Change log. The ``changelog_worker`` command moves them to the
+    Change log in batches.
+    """
+    site = models.ForeignKey(Site, related_name='pending_changes')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='pending_changes'
+    )
+    change_at = models.DateTimeField(default=timezone.now, null=False)
+    event = models.CharField(max_length=10, null=False)
+    resource_id = models.IntegerField(null=False)
+    resource_name = models.CharField(max_length=20, null=False)
+    _resource = fields.JSONField(null=False, blank=True)
+
+    objects = PendingChangeManager()
+
+    def __unicode__(self):
+        return u'%s %s(%s)' % (self.event, self.resource_name,
+                               self.resource_id)
+
+    @classmethod
+    def from_change(cls, change):
+        """
+        Return a PendingChange for a validated but unsaved Change.
+
+        :param change:
+            Change instance
+        """
+        return cls(
+            site=change.site, user=change.user, change_at=change.change_at,
+            event=change.event, resource_id=change.resource_id,
+            resource_name=change.resource_name, _resource=change._resource
+        )
+
+    def to_change(self):
+        """Return an unsaved Change for this pending change."""
+        return Change(
+            site_id=self.site_id, user_id=self.user_id,
+            change_at=self.change_at, event=self.event,
+            resource_id=self.resource_id, resource_name=self.resource_name,
+            _resource=self._resource
+        )
+
+
+class DeletePlan(object):
+    """
+    Plan for deleting many Devices, Interfaces or Networks at once, along with
+    everything that depends on them, using set-based queries rather than
+    deleting each object.
+
+    The plan is the closure of the objects to delete: the Interfaces of the
+    Devices, the Assignments of the Interfaces and of the addresses, and the
+    Values of every deleted Resource. Addresses that are left without any
+    Assignments are marked as orphaned rather than deleted.
+
+    :param model:
+        Device, Interface or Network
+
+    :param ids:
+        Ids of the objects to delete
+
+    :param site_id:
+        If set, the objects must be in this Site
+
+    :param chunk_size:
+        Maximum number of ids per query
+    """
+    def __init__(self, model, ids, site_id=None, chunk_size=500):
+        self.chunk_size = chunk_size
+        if model not in (Device, Interface, Network):
+            raise exc.ValidationError(
+                'Cannot bulk delete %s objects.' % model.__name__
+            )
+
+        # The Site of each object is used to log its Change.
+        queryset = model.objects.select_related('site')
+        if site_id is not None:
+            queryset = queryset.filter(site=site_id)
+        objects = list(self.filter(queryset, 'id', ids))
+        missing = set(ids) - set(obj.id for obj in objects)
+        if missing:
+            raise exc.NotFound(
+                'No such {} found at (site_id, id) = ({}, {})'.format(
+                    model.__name__, site_id, min(missing)
+                )
+            )
+
+        self.devices = objects if model is Device else []
+        self.networks = objects if model is Network else []
+        if model is Interface:
+            self.interfaces = objects
+        else:
+            self.interfaces = list(self.filter(
+                Interface.objects.select_related('site'), 'device',
+                [d.id for d in self.devices]
+            ))
+
+        interface_ids = set(i.id for i in self.interfaces)
+        network_ids = set(n.id for n in self.networks)
+
+        # Objects that aren't deleted can't refer to deleted ones through a
+        # protected foreign key.
+        self.check_protected(Interface, interface_ids)
+        self.check_protected(Network, network_ids)
+
+        assignments = Assignment.objects.values_list(
+            'id', 'interface_id', 'address_id'
+        )
+        rows = sorted(set(itertools.chain(
+            self.filter(assignments, 'interface', interface_ids),
+            self.filter(assignments, 'address', network_ids),
+        )))
+        self.assignment_ids = [row[0] for row in rows]
+
+        # Interfaces that aren't deleted but lose some of their addresses.
+        self.updated_interface_ids = sorted(
+            set(row[1] for row in rows) - interface_ids
+        )
+
+        # Addresses that aren't deleted but lose all of their Assignments.
+        address_ids = set(row[2] for row in rows) - network_ids
+        assignment_ids = set(self.assignment_ids)
+        still_assigned = set(
+            address_id for row_id, interface_id, address_id in self.filter(
+                assignments, 'address', address_ids
+            )
+            if row_id not in assignment_ids
+        )
+        self.orphaned_ids = sorted(address_ids - still_assigned)
+
+    def chunks(self, ids):
+        """Iterate ``ids`` (sorted) a chunk at a time."""
+        ids = sorted(ids)
+        for start in xrange(0, len(ids), self.chunk_size):
+            yield ids[start:start + self.chunk_size]
+
+    def filter(self, queryset, field, ids):
+        """Iterate the rows of ``queryset`` with ``field`` in ``ids``."""
+        for chunk in self.chunks(ids):
+            for obj in queryset.filter(**{field + '__in': chunk}):
+                yield obj
+
+    def check_protected(self, model, ids):
+        """Raise a Conflict if objects not in ``ids`` have a parent in it."""
+        for chunk in self.chunks(ids):
+            children = model.objects.filter(parent__in=chunk).exclude(
+                id__in=chunk
+            ).values_list('id', 'parent_id')
+            for child_id, parent_id in children:
+                if child_id not in ids:
+                    raise exc.Conflict(
+                        'Cannot delete %s %s, because it has children that '
+                        'are not deleted.' % (model.__name__, parent_id)
+                    )
+
+    def delete(self, model, ids, field='id', **filters):
+        """
+        Delete the rows of ``model`` with ``field`` in ``ids``.
+
+        ``QuerySet.delete()`` would fetch every object to send its signals
+        and collect its dependent objects, but those are deleted explicitly,
+        so the rows are deleted with SQL instead.
+
+        :param model:
+            Model of the rows
+
+        :param ids:
+            Values of ``field`` of the rows to delete
+
+        :param field:
+            Name of the field matched against ``ids``
+
+        :param filters:
+            Values of other fields that the rows must have
+        """
+        connection = connections[router.db_for_write(model)]
+        qn = connection.ops.quote_name
+        meta = model._meta
+        conditions, params = [], []
+        for name, value in sorted(filters.iteritems()):
+            conditions.append('%s = %%s' % qn(meta.get_field(name).column))
+            params.append(value)
+
+        with connection.cursor() as cursor:
+            for chunk in self.chunks(ids):
+                sql = 'DELETE FROM %s WHERE %s IN (%s)' % (
+                    qn(meta.db_table), qn(meta.get_field(field).column),
+                    ', '.join(['%s'] * len(chunk))
+                )
+                cursor.execute(
+                    ' AND '.join([sql] + conditions), chunk + params
+                )
+
+    def execute(self, user):
+        """
+        Log a Delete Change for each deleted Resource, and delete everything
+        in the plan.
+
+        :param user:
+            User who deletes the objects
+        """
+        interface_ids = [i.id for i in self.interfaces]
+        device_ids = [d.id for d in self.devices]
+        network_ids = [n.id for n in self.networks]
+
+        with cache.atomic():
+            for objects in (self.interfaces, self.devices, self.networks):
+                if objects:
+                    Change.objects.log_changes(objects, user, 'Delete')
+
+            self.delete(Assignment, self.assignment_ids)
+            for chunk in self.chunks(self.orphaned_ids):
+                Network.objects.filter(
+                    id__in=chunk, state=Network.ASSIGNED
+                ).update(state=Network.ORPHANED)
+            for chunk in self.chunks(self.updated_interface_ids):
+                for interface in Interface.objects.filter(id__in=chunk):
+                    interface.clean_addresses()
+                    Interface.objects.filter(id=interface.id).update(
+                        _addresses_cache=interface._addresses_cache,
+                        _networks_cache=interface._networks_cache,
+                    )
+
+            for resource_name, ids in (('Interface', interface_ids),
+                                       ('Device', device_ids),
+                                       ('Network', network_ids)):
+                self.delete(
+                    Value, ids, field='resource_id',
+                    resource_name=resource_name
+                )
+
+            # Parents are cleared first, so that the objects can be deleted
+            # in any order.
+            for model, ids in ((Interface, interface_ids),
+                               (Network, network_ids)):
+                for chunk in self.chunks(ids):
+                    model.objects.filter(id__in=chunk).exclude(
+                        parent=None
+                    ).update(parent=None)
+                self.delete(model, ids)
+            self.delete(Device, device_ids)
+
+        # Set-based deletes and updates don't send signals, so invalidate the
+        # cache.
+        site_ids = set(
+            obj.site_id for obj in itertools.chain(
+                self.interfaces, self.devices, self.networks
+            )
+        )
+        for resource_name, ids in (
+                ('Interface', interface_ids + self.updated_interface_ids),
+                ('Device', device_ids),
+                ('Network', network_ids + self.orphaned_ids)):
+            if ids:
+                cache.invalidate_many(resource_name, site_ids, ids)
+        if self.assignment_ids:
+            cache.invalidate_many('Assignment', site_ids)
+
+
+class JobManager(models.Manager):
+    """Manager for Jobs."""
+    def claim(self):
+        """
+        Mark the oldest pending Job as running and return it, or return
+        ``None`` if there are none.
+
+        Running Jobs whose worker hasn't recorded any progress for
+        ``JOB_TIMEOUT`` seconds are assumed to have been abandoned by a worker
+        that crashed, and are claimed again. They resume after the objects
+        that were already processed.
+
+        The Job is locked while it's claimed, so that concurrent workers never
+        run the same Job.
+        """
+        now = timezone.now()
+        stale = now - datetime.timedelta(seconds=settings.JOB_TIMEOUT)
+        with cache.atomic():
+            job = self.select_for_update().filter(
+                Q(status='pending') |
+                Q(status='running', heartbeat_at__lt=stale)
+            ).order_by('id').first()
+            if job is None:
+                return None
+
+            if job.status == 'running':
+                log.warning(
+                    'Job %s has had no progress since %s, claiming it again.',
+                    job.id, job.heartbeat_at
+                )
+            job.status = 'running'
+            job.started_at = job.started_at or now
+            job.heartbeat_at = now
+            job.attempts += 1
+            job.save(update_fields=[
+                'status', 'started_at', 'heartbeat_at', 'attempts'
+            ])
+
+        log.debug('Claimed job %s.', job.id)
+        return job
+
+
+class Job(models.Model):
+    """
+    Bulk request run in the background by the ``jobs_worker`` command.
+
+    The objects in the ``body`` of the request are sent to its endpoint a
+    chunk at a time, each in its own transaction, and the serialized objects
+    of each chunk are stored as a ``JobChunk`` in the same transaction.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='jobs')
+    site = models.ForeignKey(
+        Site, null=True, blank=True, related_name='jobs'
+    )
+    status = models.CharField(
+        max_length=10, null=False, default='pending', db_index=True,
+        choices=JOB_STATUS_CHOICES
+    )
+    method = models.CharField(max_length=10, null=False)
+    path = models.CharField(max_length=255, null=False)
+    query = models.TextField(null=False, blank=True, default='')
+    body = fields.JSONField(null=False, blank=True, default=[])
+    total = models.IntegerField(null=False, default=0)
+    processed = models.IntegerField(null=False, default=0)
+    error = fields.JSONField(null=False, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, null=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Updated by the worker running the Job whenever it makes progress, and
+    # incremented whenever the Job is claimed, so that a worker never records
+    # progress for a Job that was claimed again by another one.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(null=False, default=0)
+
+    objects = JobManager()
+
+    def __unicode__(self):
+        return u'%s %s (%s)' % (self.method, self.path, self.status)
+
+    def update_fields(self, **values):
+        """
+        Set and save fields of the Job, unless it was claimed again by another
+        worker since it was fetched, in which case ``Conflict`` is raised.
+        """
+        values['heartbeat_at'] = timezone.now()
+        for name, value in values.iteritems():
+            setattr(self, name, value)
+        updated = Job.objects.filter(
+            id=self.id, attempts=self.attempts
+        ).update(**values)
+        if not updated:
+            raise exc.Conflict(
+                'Job %s was claimed again by another worker.' % self.id
+            )
+
+    def get_results(self, offset=0, limit=None):
+        """
+        Return the serialized objects of the chunks processed so far, only
+        fetching the chunks that hold the requested ones.
+
+        :param offset:
+            Index of the first object to return
+
+        :param limit:
+            Maximum number of objects to return
+        """
+        chunks = self.chunks.order_by('start')
+        if offset:
+            first = self.chunks.filter(start__lte=offset).aggregate(
+                start=Max('start')
+            )['start']
+            chunks = chunks.filter(start__gte=first or 0)
+        if limit is not None:
+            chunks = chunks.filter(start__lt=offset + limit)
+
+        results = []
+        for chunk in chunks:
+            results.extend(chunk.results[max(offset - chunk.start, 0):])
+        if limit is not None:
+            del results[limit:]
+        return results
+
+    def add_results(self, results):
+        """
+        Record the serialized objects of a chunk that's been processed.
+
+        This must be called in the transaction of the chunk, so that a chunk
+        is never recorded without being processed or processed twice.
+
+        :param results:
+            List of serialized objects
+        """
+        results = list(results)
+        JobChunk.objects.create(
+            job=self, start=self.processed, results=results
+        )
+        self.update_fields(processed=self.processed + len(results))
+
+    def finish(self, error=None):
+        """
+        Mark the Job as finished.
+
+        :param error:
+            Error response data if the Job failed
+        """
+        self.update_fields(
+            status='failed' if error else 'succeeded', error=error or {},
+            finished_at=timezone.now()
+        )
+
+    def to_dict(self):
+        def timestamp(value):
+            return None if value is None else timegm(value.timetuple())
+
+        return {
+            'id': self.id,
+            'user': self.user.email,
+            'site_id': self.site_id,
+            'status': self.status,
+            'method': self.method,
+            'path': self.path,
+            'total': self.total,
+            'processed': self.processed,
+            'error': self.error or None,
+            'created_at': timestamp(self.created_at),
+            'started_at': timestamp(self.started_at),
+            'finished_at': timestamp(self.finished_at),
+        }
+
+
+class JobChunk(models.Model):
+    """Serialized objects of a chunk of a Job that's been processed."""
+    job = models.ForeignKey(Job, related_name='chunks')
+    start = models.IntegerField(
+        null=False, help_text='Index of the first object of the chunk.'
+    )
+    results = fields.JSONField(null=False, blank=True, default=[])
+
+    class Meta:
+        unique_together = ('job', 'start')
+
+    def __unicode__(self):
+        return u'%s [%s:%s]' % (
+            self.job_id, self.start, self.start + len(self.results)
+        )
+
+
 # Signals
 def delete_resource_values(sender, instance, **kwargs):
     """Delete values when a Resource object is deleted."""
     instance.attributes.delete()  # These are instances of Value
 
 
-def change_api_updated_at(sender=None, instance=None, *args, **kwargs):
-    """Anytime the API is updated, invalidate the cache."""
-    djcache.set('api_updated_at_timestamp', timezone.now())
+def invalidate_cache(sender, instance, **kwargs):
+    """Anytime an object is updated, invalidate its cached responses."""
+    cache.invalidate(
+        sender.__name__, site_id=getattr(instance, 'site_id', None),
+        obj_id=instance.pk
+    )
+
+
+def invalidate_assignment_cache(sender, instance, **kwargs):
+    """Assignments don't have a site, so use the one of their Interface."""
+    try:
+        site_id = instance.interface.site_id
+    except Interface.DoesNotExist:
+        site_id = None
+    cache.invalidate(sender.__name__, site_id=site_id, obj_id=instance.pk)
+
+
+def clear_attribute_cache(sender, instance, **kwargs):
+    """Clear the Attributes cached by ``cache_attributes()``, if any."""
+    if getattr(_attribute_cache, 'by_name', None):
+        _attribute_cache.by_name = {}
+
+
+def invalidate_value_cache(sender, instance, **kwargs):
+    """
+    Values are used by set queries and attribute filters, so invalidate the
+    cached responses of their Resource.
+    """
+    cache.invalidate(
+        instance.resource_name, site_id=instance.site_id,
+        obj_id=instance.resource_id
+    )
 
 
 # Register signals
@@ -1675,12 +3395,31 @@ for model_class in resource_subclasses:
     )
 
 
-# Invalidate Interface cache on save/delete
+# Invalidate cache on save/delete
+cache_handlers = [
+    (model_class, invalidate_cache) for model_class in resource_subclasses
+] + [
+    (Attribute, invalidate_cache),
+    (Assignment, invalidate_assignment_cache),
+    (Value, invalidate_value_cache),
+]
+for model_class, handler in cache_handlers:
+    name = model_class.__name__.lower()
+    models.signals.post_save.connect(
+        handler, sender=model_class,
+        dispatch_uid='invalidate_cache_post_save_' + name
+    )
+    models.signals.post_delete.connect(
+        handler, sender=model_class,
+        dispatch_uid='invalidate_cache_post_delete_' + name
+    )
+
+# Clear cached Attributes on save/delete
 models.signals.post_save.connect(
-    change_api_updated_at, sender=Interface,
-    dispatch_uid='invalidate_cache_post_save_interface'
+    clear_attribute_cache, sender=Attribute,
+    dispatch_uid='clear_attribute_cache_post_save'
 )
 models.signals.post_delete.connect(
-    change_api_updated_at, sender=Interface,
-    dispatch_uid='invalidate_cache_post_delete_interface'
+    clear_attribute_cache, sender=Attribute,
+    dispatch_uid='clear_attribute_cache_post_delete'
 )
@@ -1,37 +1,746 @@
 """
 Used for caching read-only REST API responses (provided by drf-extensions).
+
+Cache keys include version numbers that are stored in the cache itself.
+Versions are tracked per resource type, per resource type within a Site, and
+per individual object. Writing an object bumps all three, so that only the
+cached responses that could contain that object are invalidated:
+
++ Nested list views (e.g. ``/api/sites/1/interfaces/``) use the version of
+  the resource type within that Site.
++ Top-level list views (e.g. ``/api/interfaces/``) use the version of the
+  resource type across all Sites.
++ Detail views (e.g. ``/api/interfaces/1/``) use the version of the object.
+
+List views use the versions of both the resource type of the view and of the
+objects being listed (e.g. ``/api/devices/1/interfaces/`` uses the versions of
+Devices and Interfaces).
+
+Cached responses are also kept in a size-bounded, in-process LRU cache in front
+of the cache backend (see ``LOCAL_CACHE_MAX_ENTRIES``). Because response keys
+include the current versions, which are always read from the cache backend, an
+entry in the local cache can never be served after a write that invalidates
+it, even if the write happened in another process.
+
+Identical concurrent requests for a response that isn't cached are coalesced,
+so that only one of them is computed: within a worker other requests wait for
+the first one, and across workers a short lock is held in the cache backend
+(see ``CACHE_LOCK_TIMEOUT``).
+
+The same versions are used to build the ``ETag`` of list and detail responses
+so that conditional requests can be answered with ``304 Not Modified`` without
+running the query of the view. The dummy cache backend doesn't keep versions,
+so in that case the ID of the latest Change is used instead. ``Last-Modified``
+is always the time of the latest Change.
+
+Versions are bumped as soon as an object is written, but a request running
+concurrently with a transaction that hasn't committed yet could still cache the
+old state of the object under the new versions. Versions that are invalidated
+within a transaction are therefore bumped again once the outermost transaction
+has ended (see ``atomic()``).
 """
 
+import calendar
+import collections
+import contextlib
+import hashlib
 import logging
+import re
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework_extensions.cache.decorators import CacheResponse
+from rest_framework_extensions.etag.decorators import ETAGProcessor
 from rest_framework_extensions.key_constructor import bits, constructors
-from django.core.cache import cache as djcache
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache as djcache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.db.models.query import EmptyQuerySet
 from django.utils import timezone
 from django.utils.encoding import force_text
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.utils.six.moves import cPickle as pickle
+import threading
+import time
 
 
 log = logging.getLogger(__name__)
 
 
-__all__ = ('object_key_func', 'list_key_func')
+__all__ = (
+    'get_version', 'get_versions', 'bump_version', 'bump_versions',
+    'invalidate', 'invalidate_many', 'atomic', 'flush_invalidations',
+    'LocalCache', 'TieredCache', 'local_cache', 'tiered_cache', 'get_stats',
+    'KeyedLock', 'coalesce', 'cache_response', 'get_latest_change',
+    'conditional_response', 'object_key_func', 'list_key_func',
+    'object_etag_func', 'list_etag_func'
+)
+
+
+def version_key(resource_name, site_id=None, obj_id=None):
+    """
+    Return the cache key used to store a version.
+
+    :param resource_name:
+        Name of the resource type (e.g. 'Interface')
+
+    :param site_id:
+        ID of a Site to scope the version to
+
+    :param obj_id:
+        ID of an object to scope the version to
+    """
+    key = 'nsot:version:%s' % resource_name
+    if obj_id is not None:
+        return '%s:obj:%s' % (key, obj_id)
+    if site_id is not None:
+        return '%s:site:%s' % (key, site_id)
+    return key
+
+
+def _new_version():
+    """
+    Return a fresh version number.
+
+    Versions are seeded from the current time in microseconds so that if a
+    version is evicted from the cache it never restarts at a value that may
+    still be part of a cached response key.
+    """
+    return int(time.time() * 1000000)
+
+
+def get_version(resource_name, site_id=None, obj_id=None):
+    """Return the current version, initializing it if it isn't set."""
+    return get_versions([(resource_name, site_id, obj_id)])[0]
+
+
+def get_versions(scopes):
+    """
+    Return the current versions for many scopes in one cache round trip.
+
+    :param scopes:
+        List of (resource_name, site_id, obj_id) tuples
+    """
+    keys = [version_key(*scope) for scope in scopes]
+    found = djcache.get_many(keys)
+    versions = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            value = _new_version()
+            djcache.add(key, value, None)
+            found[key] = value
+        versions.append(value)
+    return versions
+
+
+def bump_version(resource_name, site_id=None, obj_id=None):
+    """Increment a version, invalidating all cache keys that include it."""
+    key = version_key(resource_name, site_id, obj_id)
+    try:
+        return djcache.incr(key)
+    except ValueError:
+        value = _new_version()
+        djcache.set(key, value, None)
+        return value
+
+
+def bump_versions(scopes):
+    """
+    Bump many versions, with a single round trip for the versions of objects.
+
+    The versions of the resource types are incremented, while the versions of
+    objects are all replaced with a fresh version.
+
+    :param scopes:
+        Iterable of (resource_name, site_id, obj_id) tuples
+    """
+    scopes = set(scopes)
+    objects = [scope for scope in scopes if scope[2] is not None]
+    for scope in scopes.difference(objects):
+        bump_version(*scope)
+    if objects:
+        value = _new_version()
+        djcache.set_many(
+            dict((version_key(*scope), value) for scope in objects), None
+        )
+
+
+def invalidate(resource_name, site_id=None, obj_id=None, using=None):
+    """
+    Invalidate cached responses for a resource type.
+
+    This always bumps the version for the resource type across all Sites, and
+    additionally the version within ``site_id`` and for ``obj_id`` if they are
+    provided.
+
+    When called within a transaction, the versions are bumped again by
+    ``flush_invalidations()`` once the transaction has ended.
+    """
+    log.debug('Invalidating cache for %s (site_id=%s, obj_id=%s)',
+              resource_name, site_id, obj_id)
+    scopes = [(resource_name, None, None)]
+    if site_id is not None:
+        scopes.append((resource_name, site_id, None))
+    if obj_id is not None:
+        scopes.append((resource_name, None, obj_id))
+    _invalidate(scopes, using)
+
+
+def invalidate_many(resource_name, site_ids=(), obj_ids=(), using=None):
+    """
+    Invalidate cached responses for many objects of a resource type at once.
+
+    Unlike calling ``invalidate()`` for each object, the versions for the
+    resource type and for each Site are only bumped once.
+
+    :param resource_name:
+        Name of the resource type (e.g. 'Network')
+
+    :param site_ids:
+        IDs of the Sites of the objects
+
+    :param obj_ids:
+        IDs of the objects
+    """
+    obj_ids = set(obj_ids)
+    log.debug('Invalidating cache for %d %s objects', len(obj_ids),
+              resource_name)
+    scopes = [(resource_name, None, None)]
+    scopes.extend((resource_name, s, None) for s in set(site_ids))
+    scopes.extend((resource_name, None, o) for o in obj_ids)
+    _invalidate(scopes, using)
+
+
+def _invalidate(scopes, using=None):
+    """Bump versions, and bump them again after the current transaction."""
+    bump_versions(scopes)
+    if transaction.get_connection(using).in_atomic_block:
+        _pending_invalidations().update(scopes)
+
+
+_deferred = threading.local()
+
+
+def _pending_invalidations():
+    """Return the set of invalidations deferred in this thread."""
+    if not hasattr(_deferred, 'pending'):
+        _deferred.pending = set()
+    return _deferred.pending
+
+
+def flush_invalidations(using=None, **kwargs):
+    """
+    Bump again the versions that were invalidated within a transaction.
+
+    This does nothing until the outermost transaction has ended, so that any
+    response cached while the transaction was in progress is discarded.
+    """
+    pending = getattr(_deferred, 'pending', None)
+    if not pending or transaction.get_connection(using).in_atomic_block:
+        return
+
+    _deferred.pending = set()
+    log.debug('Flushing %d deferred cache invalidations', len(pending))
+    bump_versions(pending)
+
+
+@contextlib.contextmanager
+def atomic(using=None):
+    """
+    Same as ``transaction.atomic()``, but flush the deferred invalidations once
+    the outermost transaction has ended, whether it was committed or not.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        flush_invalidations(using=using)
+
+
+# Requests that write outside of ``atomic()`` are flushed once they are done.
+request_finished.connect(flush_invalidations)
+
+
+class LocalCache(object):
+    """
+    A size-bounded, in-process LRU cache with a TTL.
+
+    Values are stored pickled so that every caller gets its own copy, like
+    they would from the cache backend.
+
+    :param max_entries:
+        Maximum number of entries to keep. If 0, nothing is cached.
+
+    :param timeout:
+        Maximum age of an entry in seconds
+    """
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            try:
+                expires, pickled = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires <= now:
+                self.misses += 1
+                return default
+
+            # Re-insert the entry so that it's the most recently used.
+            self._data[key] = (expires, pickled)
+            self.hits += 1
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=None):
+        if not self.max_entries:
+            return
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + timeout, pickled)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss statistics of this cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+            }
+
+
+class TieredCache(object):
+    """
+    A cache that checks a ``LocalCache`` before the cache backend.
+
+    The local cache is bypassed if the backend is the dummy cache, so that
+    caching stays disabled unless a cache backend is configured.
+
+    :param local:
+        A ``LocalCache`` instance
+
+    :param alias:
+        Alias of the Django cache backend
+    """
+    def __init__(self, local, alias=DEFAULT_CACHE_ALIAS):
+        self.local = local
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        return not isinstance(self.backend, DummyCache)
+
+    def get(self, key, default=None):
+        enabled = self.enabled
+        if enabled:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+
+        value = self.backend.get(key)
+        if value is None:
+            return default
+        if enabled:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, timeout)
+        if self.enabled:
+            self.local.set(key, value, timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.backend.delete(key)
 
 
-class UpdatedAtKeyBit(bits.KeyBitBase):
-    """Used to store/retrieve timestamp from the cache."""
-    def get_data(self, **kwargs):
-        key = 'api_updated_at_timestamp'
-        value = djcache.get(key, None)
-        if not value:
-            value = timezone.now()
-            djcache.set(key, value=value)
+local_cache = LocalCache(
+    max_entries=getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 1000),
+    timeout=getattr(settings, 'LOCAL_CACHE_TIMEOUT', 60),
+)
+tiered_cache = TieredCache(local_cache)
 
-        return force_text(value)
+
+def get_stats():
+    """Return the hit/miss statistics of the in-process cache."""
+    return local_cache.stats()
+
+
+class KeyedLock(object):
+    """
+    A lock per key. Locks are discarded once nobody is holding or waiting on
+    them.
+    """
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def __call__(self, key):
+        with self._lock:
+            lock, count = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, count + 1)
+
+        lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+            with self._lock:
+                lock, count = self._locks[key]
+                if count == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, count - 1)
+
+
+key_lock = KeyedLock()
+
+# How often to check if another worker released a lock, in seconds.
+LOCK_POLL_INTERVAL = 0.05
+
+
+@contextlib.contextmanager
+def coalesce(key, cache=None):
+    """
+    Only let one caller at a time compute the value for ``key``.
+
+    Callers must check the cache again once they are let through, as the value
+    may have been computed while they were waiting. Within a process callers
+    wait on each other, and across processes they wait on a lock stored in the
+    cache backend for up to ``CACHE_LOCK_TIMEOUT`` seconds, after which they
+    go ahead anyway.
+
+    :param key:
+        Cache key of the value
+
+    :param cache:
+        A ``TieredCache`` instance
+    """
+    if cache is None:
+        cache = tiered_cache
+
+    # Nothing gets cached, so there's nothing to wait for.
+    if not cache.enabled:
+        yield
+        return
+
+    timeout = getattr(settings, 'CACHE_LOCK_TIMEOUT', 10)
+    lock_key = 'nsot:lock:%s' % key
+    with key_lock(key):
+        backend = cache.backend
+        if backend.add(lock_key, 1, timeout):
+            try:
+                yield
+            finally:
+                backend.delete(lock_key)
+            return
+
+        log.debug('Waiting on another worker to compute %s', key)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if backend.get(lock_key) is None or backend.get(key) is not None:
+                break
+            time.sleep(LOCK_POLL_INTERVAL)
+        yield
+
+
+class cache_response(CacheResponse):
+    """
+    Like ``rest_framework_extensions.cache.decorators.cache_response``, but
+    uses the in-process cache in front of the cache backend, and coalesces
+    identical concurrent requests.
+    """
+    def __init__(self, *args, **kwargs):
+        super(cache_response, self).__init__(*args, **kwargs)
+        self.cache = tiered_cache
+
+    def process_cache_response(self, view_instance, view_method, request,
+                               args, kwargs):
+        key = self.calculate_key(
+            view_instance=view_instance,
+            view_method=view_method,
+            request=request,
+            args=args,
+            kwargs=kwargs
+        )
+        response = self.cache.get(key)
+        if response is None:
+            with coalesce(key, self.cache):
+                response = self.cache.get(key)
+                if response is None:
+                    response = view_method(
+                        view_instance, request, *args, **kwargs
+                    )
+                    response = view_instance.finalize_response(
+                        request, response, *args, **kwargs
+                    )
+
+                    # Streamed responses can't be cached.
+                    if response.streaming:
+                        return response
+
+                    # Must be rendered before pickling.
+                    response.render()
+
+                    if response.status_code < 400 or self.cache_errors:
+                        self.cache.set(key, response, self.timeout)
+
+        if not hasattr(response, '_closable_objects'):
+            response._closable_objects = []
+
+        return response
+
+
+def get_latest_change(site_id=None):
+    """
+    Return the ``(id, change_at)`` of the latest Change, or ``(None, None)``
+    if there aren't any. If ``ASYNC_CHANGE_LOG`` is set, changes that are
+    still pending are included, and the ID is a string that includes the ID
+    of the latest pending change.
+
+    :param site_id:
+        ID of a Site to limit the Changes to
+    """
+    from ..models import Change, PendingChange  # Avoid circular import
+
+    models = [Change]
+    if settings.ASYNC_CHANGE_LOG:
+        models.append(PendingChange)
+
+    latest = []
+    for model in models:
+        changes = model.objects.order_by('-id')
+        if site_id is not None:
+            changes = changes.filter(site=site_id)
+        changes = changes.values_list('id', 'change_at')[:1]
+        latest.append(next(iter(changes), (None, None)))
+    if len(latest) == 1:
+        return latest[0]
+
+    # Changes waiting in the outbox are newer than any in the Change log, but
+    # their IDs are from another sequence.
+    (change_id, change_at), (pending_id, pending_at) = latest
+    if pending_id is None:
+        return change_id, change_at
+    return '%s:%s' % (change_id, pending_id), pending_at
+
+
+def _timestamp(value):
+    """Return the seconds since the epoch of a datetime."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return calendar.timegm(value.utctimetuple())
+
+
+class conditional_response(ETAGProcessor):
+    """
+    Like ``rest_framework_extensions.etag.decorators.etag``, but also sets
+    ``Last-Modified`` and handles ``If-Modified-Since``.
+
+    The latest Change of the Site (or across all Sites for top-level views) is
+    used for ``Last-Modified``. Changes of any resource type count, because
+    some writes also modify other resources (e.g. creating a Network may
+    reparent others). ``If-Modified-Since`` is ignored if ``If-None-Match`` is
+    also sent, since it's only precise to the second.
+    """
+    def process_conditional_request(self, view_instance, view_method, request,
+                                    args, kwargs):
+        if request.method not in SAFE_METHODS:
+            return view_method(view_instance, request, *args, **kwargs)
+
+        change_id, change_at = get_latest_change(
+            view_instance.kwargs.get('site_pk')
+        )
+        last_modified = None if change_at is None else _timestamp(change_at)
+        etag = self.calculate_etag(
+            view_instance=view_instance,
+            view_method=view_method,
+            request=request,
+            args=args,
+            kwargs=kwargs,
+        )
+        if not tiered_cache.enabled:
+            etag = hashlib.md5('%s:%s' % (etag, change_id)).hexdigest()
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = view_method(view_instance, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def is_not_modified(self, request, etag, last_modified):
+        """
+        Return whether the conditional headers of the request match.
+
+        :param etag:
+            Current ETag of the response
+
+        :param last_modified:
+            Current modification time of the response in seconds since the
+            epoch, or None
+        """
+        etags, if_none_match, _ = self.get_etags_and_matchers(request)
+        if if_none_match:
+            # GZipMiddleware appends ';gzip' to the ETag of compressed
+            # responses.
+            etags = [re.sub(r';gzip$', '', e) for e in etags]
+            return etag in etags or '*' in etags
+
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        if if_modified_since is None or last_modified is None:
+            return False
+        return last_modified <= if_modified_since
+
+
+def _view_resource_name(view_instance):
+    return view_instance.queryset.model.__name__
+
+
+class ViewKwargsKeyBit(bits.AllArgsMixin, bits.KeyBitDictBase):
+    """
+    Used to key on the URL kwargs (e.g. ``site_pk``, ``pk``) and the action of
+    the view.
+
+    This is used instead of the kwargs passed to the view method, because
+    detail routes pass querysets that would be evaluated to build the key.
+    """
+    def get_source_dict(self, params, view_instance, view_method, request,
+                        args, kwargs):
+        source = dict(view_instance.kwargs)
+        source['action'] = getattr(view_instance, 'action', None)
+        return source
+
+
+class VersionKeyBitBase(bits.KeyBitBase):
+    """
+    Base class for version bits. The dummy cache backend doesn't keep
+    versions, so they're left out of the key in that case.
+    """
+    def get_data(self, params, view_instance, view_method, request, args,
+                 kwargs):
+        if not tiered_cache.enabled:
+            return None
+        return self.get_version_data(view_instance, args, kwargs)
+
+    def get_version_data(self, view_instance, args, kwargs):
+        """
+        Return the versions the response depends on. By default, this is the
+        version of the resource type of the view, scoped to its Site if it's
+        nested under one.
+        """
+        name = _view_resource_name(view_instance)
+        site_id = view_instance.kwargs.get('site_pk')
+        return {name: get_version(name, site_id)}
+
+
+class ListVersionKeyBit(VersionKeyBitBase):
+    """
+    Used to retrieve versions of the resource types in a list view.
+
+    If the view is nested under a Site, versions are scoped to that Site.
+    """
+    def get_version_data(self, view_instance, args, kwargs):
+        names = set([_view_resource_name(view_instance)])
+
+        # Detail routes may list a different resource type.
+        queryset = kwargs.get('queryset')
+        if queryset is not None:
+            names.add(queryset.model.__name__)
+
+        site_id = view_instance.kwargs.get('site_pk')
+        names = sorted(names)
+        versions = get_versions([(name, site_id, None) for name in names])
+        return dict(zip(names, versions))
+
+
+class ObjectVersionKeyBit(VersionKeyBitBase):
+    """
+    Used to retrieve the version of the object in a detail view.
+
+    Detail routes (e.g. ``/api/networks/1/parent/``) may retrieve a different
+    object than the one in the URL, so the versions of both are used.
+    """
+    def get_version_data(self, view_instance, args, kwargs):
+        lookup_field = view_instance.lookup_field
+        obj_ids = set([force_text(view_instance.kwargs[lookup_field])])
+        if lookup_field in kwargs:
+            obj_ids.add(force_text(kwargs[lookup_field]))
+        elif args:
+            obj_ids.add(force_text(args[0]))
+
+        name = _view_resource_name(view_instance)
+        obj_ids = sorted(obj_ids)
+        versions = get_versions([(name, None, obj_id) for obj_id in obj_ids])
+        return dict(zip(obj_ids, versions))
+
+
+class ListSqlQueryKeyBit(bits.ListSqlQueryKeyBit):
+    """
+    Used to key on the SQL of a list view.
+
+    The default bit interpolates the parameters into the SQL, which fails for
+    binary parameters (e.g. network addresses), so the parameters are keyed
+    on by their representation instead.
+    """
+    def _get_queryset_query_string(self, queryset):
+        if isinstance(queryset, EmptyQuerySet):
+            return None
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        return force_text(sql) + force_text(repr(params))
 
 
 class ObjectKeyConstructor(constructors.DefaultKeyConstructor):
     """Cache key generator for object/detail views."""
     retrieve_sql = bits.RetrieveSqlQueryKeyBit()
-    updated_at = UpdatedAtKeyBit()
-    kwargs = bits.KwargsKeyBit()
+    version = ObjectVersionKeyBit()
+    kwargs = ViewKwargsKeyBit()
     params = bits.QueryParamsKeyBit()
     unique_view_id = bits.UniqueMethodIdKeyBit()
     format = bits.FormatKeyBit()
@@ -40,11 +749,37 @@ object_key_func = ObjectKeyConstructor()
 
 class ListKeyConstructor(constructors.DefaultKeyConstructor):
     """Cache key generator for list views."""
-    list_sql = bits.ListSqlQueryKeyBit()
+    list_sql = ListSqlQueryKeyBit()
     pagination = bits.PaginationKeyBit()
-    updated_at = UpdatedAtKeyBit()
-    kwargs = bits.KwargsKeyBit()
+    version = ListVersionKeyBit()
+    kwargs = ViewKwargsKeyBit()
     params = bits.QueryParamsKeyBit()
     unique_view_id = bits.UniqueMethodIdKeyBit()
     format = bits.FormatKeyBit()
 list_key_func = ListKeyConstructor()
+
+
+class ObjectETagKeyConstructor(constructors.DefaultKeyConstructor):
+    """
+    ETag generator for object/detail views. Unlike the cache key, this doesn't
+    need to build the query of the view.
+    """
+    version = ObjectVersionKeyBit()
+    kwargs = ViewKwargsKeyBit()
+    params = bits.QueryParamsKeyBit()
+    unique_view_id = bits.UniqueMethodIdKeyBit()
+    format = bits.FormatKeyBit()
+object_etag_func = ObjectETagKeyConstructor()
+
+
+class ListETagKeyConstructor(constructors.DefaultKeyConstructor):
+    """
+    ETag generator for list views. Unlike the cache key, this doesn't need to
+    build the query of the view.
+    """
+    version = ListVersionKeyBit()
+    kwargs = ViewKwargsKeyBit()
+    params = bits.QueryParamsKeyBit()
+    unique_view_id = bits.UniqueMethodIdKeyBit()
+    format = bits.FormatKeyBit()
+list_etag_func = ListETagKeyConstructor()
@@ -4,7 +4,10 @@ Project-wide utilities.
 
 import collections
 from cryptography.fernet import Fernet
+import datetime
+from django.conf import settings
 from django.core.exceptions import FieldDoesNotExist
+from django.utils import dateparse, timezone
 import logging
 from logan.runner import run_app, configure_app
 
@@ -18,8 +21,8 @@ _TRUTHY = set([
 
 __all__ = (
     'qpbool', 'normalize_auth_header', 'generate_secret_key', 'get_field_attr',
-    'SetQuery', 'parse_set_query', 'generate_settings', 'initialize_app',
-    'main'
+    'diff_dict', 'patch_dict', 'parse_timestamp', 'SetQuery',
+    'parse_set_query', 'generate_settings', 'initialize_app', 'main'
 )
 
 def qpbool(arg):
@@ -46,6 +49,95 @@ def get_field_attr(model, field_name, attr):
         return getattr(field, attr, '')
 
 
+def diff_dict(old, new):
+    """
+    Return a delta that turns ``old`` into ``new`` using ``patch_dict()``.
+
+    Nested dicts (e.g. attributes) are diffed recursively, and any other
+    values that changed are replaced.
+
+    >>> diff_dict({'a': 1, 'b': {'c': 2}}, {'b': {'c': 3}})
+    {'patch': {'b': {'set': {'c': 3}}}, 'unset': ['a']}
+
+    :param old:
+        Previous dict
+
+    :param new:
+        Current dict
+    """
+    changed = {}
+    nested = {}
+    for key, value in new.iteritems():
+        if key not in old:
+            changed[key] = value
+        elif old[key] == value:
+            continue
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested[key] = diff_dict(old[key], value)
+        else:
+            changed[key] = value
+
+    delta = {}
+    if changed:
+        delta['set'] = changed
+    if nested:
+        delta['patch'] = nested
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta['unset'] = removed
+    return delta
+
+
+def patch_dict(old, delta):
+    """
+    Return a copy of ``old`` with a delta from ``diff_dict()`` applied.
+
+    :param old:
+        Previous dict
+
+    :param delta:
+        Delta returned by ``diff_dict()``
+    """
+    new = dict(old)
+    for key in delta.get('unset', ()):
+        new.pop(key, None)
+    new.update(delta.get('set', {}))
+    for key, nested in delta.get('patch', {}).iteritems():
+        new[key] = patch_dict(new.get(key) or {}, nested)
+    return new
+
+
+def parse_timestamp(value):
+    """
+    Return the datetime of a timestamp, in the form used for datetimes in the
+    database. Raise ``ValueError`` if it's invalid.
+
+    :param value:
+        Seconds since the epoch (as in the ``change_at`` of Changes), or an
+        ISO 8601 date or datetime (in the default time zone if there's none)
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        stamp = dateparse.parse_datetime(value)
+        if stamp is None:
+            date = dateparse.parse_date(value)
+            if date is None:
+                raise ValueError('Invalid timestamp: %r' % value)
+            stamp = datetime.datetime.combine(date, datetime.time())
+    else:
+        # This is the inverse of the calendar.timegm() of Change.change_at.
+        stamp = datetime.datetime.utcfromtimestamp(seconds)
+        if settings.USE_TZ:
+            stamp = timezone.make_aware(stamp, timezone.utc)
+
+    if settings.USE_TZ and timezone.is_naive(stamp):
+        stamp = timezone.make_aware(stamp)
+    elif not settings.USE_TZ and timezone.is_aware(stamp):
+        stamp = timezone.make_naive(stamp)
+    return stamp
+
+
 #: Namedtuple for resultant items from ``parse_set_query()``
 SetQuery = collections.namedtuple('SetQuery', 'action name value')
 
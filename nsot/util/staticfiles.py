@@ -0,0 +1,135 @@
+"""
+Storage and serving of static files.
+
+``collectstatic`` stores a copy of each static file with the hash of its
+contents in its name (e.g. ``nsot.min.3f2a9c1b8e4d.css``), along with gzipped
+copies (``.gz``) of text files. Hashed files never change, so they're served
+with far-future caching headers, and gzipped copies are served to clients
+that accept them.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage
+)
+from django.utils.http import http_date
+import dj_static
+import static
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+__all__ = ('GzipManifestStaticFilesStorage', 'Cling')
+
+
+#: Extensions of files that are worth compressing.
+GZIP_EXTENSIONS = (
+    '.css', '.eot', '.htm', '.html', '.js', '.json', '.map', '.svg', '.ttf',
+    '.txt', '.xml'
+)
+
+#: Minimum size, in bytes, of files that are compressed.
+GZIP_MIN_SIZE = 256
+
+#: How long, in seconds, clients may cache files with hashed names.
+MAX_AGE = 365 * 24 * 60 * 60
+
+
+class GzipManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Like ``ManifestStaticFilesStorage``, but also writes gzipped copies of
+    the collected files.
+
+    Files that haven't been collected are referred to by their original name
+    instead of failing, e.g. when running from a checkout. References to
+    missing files in CSS (which are common in vendored packages) are left as
+    they are, with a warning, instead of failing ``collectstatic``.
+    """
+    def url(self, name, force=False):
+        try:
+            return super(GzipManifestStaticFilesStorage, self).url(name, force)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = super(GzipManifestStaticFilesStorage, self).post_process(
+            paths, dry_run=dry_run, **options
+        )
+        for name, hashed_name, was_processed in processed:
+            if isinstance(was_processed, Exception):
+                log.warning('Not all references in %s were hashed: %s',
+                            name, was_processed)
+                continue
+            self.gzip_file(name)
+            self.gzip_file(hashed_name)
+            yield name, hashed_name, was_processed
+
+    def gzip_file(self, name):
+        """
+        Write a gzipped copy of a file next to it, if it's worth it.
+
+        :param name:
+            Name of the file in the storage
+        """
+        if not name or not name.endswith(GZIP_EXTENSIONS):
+            return
+
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            content = f.read()
+        if len(content) < GZIP_MIN_SIZE:
+            return
+
+        gz_path = path + '.gz'
+        with open(gz_path, 'wb') as f:
+            with gzip.GzipFile(
+                filename='', mode='wb', fileobj=f, mtime=0
+            ) as gz:
+                gz.write(content)
+
+        # Only keep it if it's smaller.
+        if os.path.getsize(gz_path) >= len(content):
+            os.remove(gz_path)
+        else:
+            log.debug('Compressed static file %s', name)
+
+
+class CachingCling(static.Cling):
+    """Serve static files, with far-future caching for hashed names."""
+    def __init__(self, root, hashed_names=None, **kwargs):
+        static.Cling.__init__(self, root, **kwargs)
+        self.hashed_names = hashed_names or frozenset()
+
+    def __call__(self, environ, start_response):
+        name = environ.get('PATH_INFO', '').lstrip('/')
+        if name not in self.hashed_names:
+            return static.Cling.__call__(self, environ, start_response)
+
+        def cache_forever(status, headers, *args):
+            if status.startswith('200'):
+                headers.extend([
+                    ('Cache-Control', 'public, max-age=%d' % MAX_AGE),
+                    ('Expires', http_date(time.time() + MAX_AGE)),
+                ])
+            return start_response(status, headers, *args)
+        return static.Cling.__call__(self, environ, cache_forever)
+
+
+class Cling(dj_static.Cling):
+    """
+    Like ``dj_static.Cling``, but serves files with hashed names (see
+    ``GzipManifestStaticFilesStorage``) with far-future caching headers.
+    """
+    def __init__(self, application, base_dir=None, ignore_debug=False):
+        super(Cling, self).__init__(application, base_dir, ignore_debug)
+        hashed_names = getattr(staticfiles_storage, 'hashed_files', {})
+        self.cling = CachingCling(
+            self.cling.root, hashed_names=frozenset(hashed_names.values())
+        )
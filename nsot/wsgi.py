@@ -16,9 +16,9 @@ from django.conf import settings
 
 
 # If we're set to serve static files ourself (default), wrap the app w/ Cling
-# (provided by dj-static).
+# (based on the one provided by dj-static).
 if settings.SERVE_STATIC_FILES:
-    from dj_static import Cling
+    from nsot.util.staticfiles import Cling
     application = Cling(get_wsgi_application())
 else:
     application = get_wsgi_application()
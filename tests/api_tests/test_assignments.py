@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+
+# Allow everything in there to access the DB
+pytestmark = pytest.mark.django_db
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import logging
+from rest_framework import status
+
+from nsot import models
+
+from .fixtures import live_server, client, user, site
+from .util import assert_error, assert_success
+
+
+log = logging.getLogger(__name__)
+
+
+def test_assignments(site, client):
+    """Test listing Assignments site-wide and by Network and Interface."""
+    dev_uri = site.list_uri('device')
+    net_uri = site.list_uri('network')
+    ifc_uri = site.list_uri('interface')
+    asn_uri = reverse('assignment-list', args=(site.id,))
+
+    client.create(net_uri, cidr='10.0.0.0/8')
+    devices = [
+        client.create(
+            dev_uri, hostname='foo-bar%s' % i
+        ).json()['data']['device']
+        for i in range(1, 3)
+    ]
+    ifcs = [
+        client.create(
+            ifc_uri, device=dev['id'], name='eth0',
+            addresses=['10.0.0.%s/32' % dev['id'], '10.1.0.%s/32' % dev['id']]
+        ).json()['data']['interface']
+        for dev in devices
+    ]
+
+    expected = [
+        asn.to_dict() for asn in models.Assignment.objects.order_by('id')
+    ]
+    assert len(expected) == 4
+    assert expected[0] == {
+        'id': expected[0]['id'],
+        'device': devices[0]['id'],
+        'hostname': 'foo-bar1',
+        'interface': ifcs[0]['id'],
+        'interface_name': 'eth0',
+        'address': '10.0.0.%s/32' % devices[0]['id'],
+    }
+
+    assert_success(
+        client.get(asn_uri),
+        {'assignments': expected, 'limit': None, 'offset': 0, 'total': 4}
+    )
+    assert_success(
+        client.get(reverse('assignment-list')),
+        {'assignments': expected, 'limit': None, 'offset': 0, 'total': 4}
+    )
+
+    # Filters
+    resp = client.retrieve(asn_uri, hostname='foo-bar2')
+    assert resp.json()['data']['assignments'] == expected[2:]
+    resp = client.retrieve(asn_uri, device=devices[0]['id'])
+    assert resp.json()['data']['assignments'] == expected[:2]
+    resp = client.retrieve(asn_uri, interface=ifcs[1]['id'])
+    assert resp.json()['data']['assignments'] == expected[2:]
+    resp = client.retrieve(asn_uri, interface_name='eth0')
+    assert resp.json()['data']['assignments'] == expected
+    resp = client.retrieve(asn_uri, address=expected[1]['address'])
+    assert resp.json()['data']['assignments'] == expected[1:2]
+    resp = client.retrieve(asn_uri, address=expected[1]['address'][:-3])
+    assert resp.json()['data']['assignments'] == expected[1:2]
+
+    resp = client.retrieve(asn_uri, device='foo')
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+    for address in ('bogus', '10.0.0.1/bogus', '10.0.0.1/24'):
+        resp = client.retrieve(asn_uri, address=address)
+        assert_error(resp, status.HTTP_400_BAD_REQUEST)
+
+    # Details
+    asn_id = expected[0]['id']
+    asn_obj_uri = reverse('assignment-detail', args=(site.id, asn_id))
+    assert_success(client.get(asn_obj_uri), {'assignment': expected[0]})
+    other_site = client.create(
+        reverse('site-list'), name='Other'
+    ).json()['data']['site']
+    resp = client.get(
+        reverse('assignment-detail', args=(other_site['id'], asn_id))
+    )
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+    resp = client.get(reverse('assignment-list', args=(other_site['id'],)))
+    assert resp.json()['data']['assignments'] == []
+
+    # Detail routes of Networks and Interfaces.
+    ifc_asn_uri = reverse(
+        'interface-assignments', args=(site.id, ifcs[0]['id'])
+    )
+    resp = client.get(ifc_asn_uri)
+    assert resp.json()['data']['assignments'] == expected[:2]
+
+    net = models.Network.objects.get_by_address(expected[3]['address'])
+    net_asn_uri = reverse('network-assignments', args=(site.id, net.id))
+    resp = client.get(net_asn_uri)
+    assert resp.json()['data']['assignments'] == expected[3:]
+
+
+def test_assignments_queries(site, client):
+    """Test that listing Assignments costs the same queries for any size."""
+    dev_uri = site.list_uri('device')
+    net_uri = site.list_uri('network')
+    ifc_uri = site.list_uri('interface')
+    asn_uri = reverse('assignment-list', args=(site.id,))
+
+    client.create(net_uri, cidr='10.0.0.0/8')
+    dev = client.create(dev_uri, hostname='foo-bar1').json()['data']['device']
+
+    def count_queries(uri):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get(uri)
+        assert resp.status_code == status.HTTP_200_OK
+        return len(ctx.captured_queries)
+
+    ifc = client.create(
+        ifc_uri, device=dev['id'], name='eth0', addresses=['10.0.0.1/32']
+    ).json()['data']['interface']
+    ifc_asn_uri = reverse('interface-assignments', args=(site.id, ifc['id']))
+    num_queries = [count_queries(asn_uri), count_queries(ifc_asn_uri)]
+
+    client.update(
+        site.detail_uri('interface', id=ifc['id']), name='eth0',
+        addresses=['10.0.0.%s/32' % i for i in range(1, 11)]
+    )
+    assert models.Assignment.objects.count() == 10
+    assert [count_queries(asn_uri), count_queries(ifc_asn_uri)] == (
+        num_queries
+    )
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+
+# Allow everything in there to access the DB
+pytestmark = pytest.mark.django_db
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+import logging
+from rest_framework import status
+
+from nsot import models
+
+from .fixtures import live_server, client, user, site
+from .util import assert_error
+
+
+log = logging.getLogger(__name__)
+
+
+def test_batch(site, client):
+    """Test performing operations that refer to each other in a batch."""
+    batch_uri = reverse('site-batch', args=(site.id,))
+    operations = [
+        {
+            'method': 'POST', 'path': 'attributes/',
+            'body': {'resource_name': 'Device', 'name': 'rack'},
+        },
+        {
+            'method': 'POST', 'path': 'networks/',
+            'body': {'cidr': '10.0.0.0/24'},
+        },
+        {
+            'method': 'POST', 'path': 'networks/',
+            'body': {'cidr': '10.1.0.0/24'}, 'id': 'net',
+        },
+        {
+            'id': 'dev', 'method': 'POST', 'path': 'devices/',
+            'body': {'hostname': 'foo-bar1', 'attributes': {'rack': 'r1'}},
+        },
+        {
+            'id': 'ifc', 'method': 'POST',
+            'path': '/api/sites/%s/interfaces/' % site.id,
+            'body': {
+                'device': '$dev.device.id', 'name': 'eth0',
+                'addresses': ['10.0.0.1/32'],
+                'description': 'Uplink of $dev.device.hostname',
+            },
+        },
+        {
+            'method': 'PUT', 'path': 'devices/$dev.device.id/',
+            'body': {'hostname': 'foo-bar1', 'attributes': {'rack': 'r2'}},
+        },
+        {'method': 'delete', 'path': 'networks/$net.network.id/'},
+    ]
+    resp = client.post(batch_uri, data=json.dumps(operations))
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()['data']['results']
+    assert [r['code'] for r in results] == [
+        201, 201, 201, 201, 201, 200, 204
+    ]
+    assert [r['id'] for r in results] == [
+        None, None, 'net', 'dev', 'ifc', None, None
+    ]
+
+    dev = results[3]['response']['data']['device']
+    ifc = results[4]['response']['data']['interface']
+    assert ifc['device'] == dev['id']
+    assert ifc['addresses'] == ['10.0.0.1/32']
+    assert ifc['description'] == 'Uplink of foo-bar1'
+    assert results[5]['response']['data']['device']['attributes'] == {
+        'rack': 'r2'
+    }
+
+    assert models.Device.objects.get(id=dev['id']).get_attributes() == {
+        'rack': 'r2'
+    }
+    assert not models.Network.objects.filter(
+        network_address='10.1.0.0', prefix_length=24
+    ).exists()
+    changes = models.Change.objects.filter(resource_name='Device')
+    assert [c.event for c in changes.order_by('id')] == ['Create', 'Update']
+
+
+def test_batch_no_jobs(site, client):
+    """Test that bulk operations in a batch are never run as Jobs."""
+    batch_uri = reverse('site-batch', args=(site.id,))
+    operations = [
+        {
+            'method': 'POST', 'path': 'devices/?async=true',
+            'body': [{'hostname': 'foo-bar1'}, {'hostname': 'foo-bar2'}],
+        },
+        {
+            'method': 'POST', 'path': 'devices/',
+            'body': {'hostname': 'foo-bar3'},
+        },
+    ]
+    resp = client.post(batch_uri, data=json.dumps(operations))
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()['data']['results']
+    assert [r['code'] for r in results] == [201, 201]
+    assert models.Device.objects.count() == 3
+    assert not models.Job.objects.exists()
+
+    # Operations are performed as the user who sent the batch.
+    changes = models.Change.objects.filter(resource_name='Device')
+    assert set(c.user.email for c in changes) == set(['admin@localhost'])
+
+
+def test_batch_rollback(site, client):
+    """Test that a failed operation rolls back the whole batch."""
+    batch_uri = reverse('batch')
+    dev_uri = site.list_uri('device')
+    operations = [
+        {
+            'id': 'dev', 'method': 'POST', 'path': dev_uri,
+            'body': {'hostname': 'foo-bar1'},
+        },
+        {
+            'method': 'POST', 'path': dev_uri,
+            'body': {'hostname': 'foo-bar1'},
+        },
+        {
+            'method': 'POST', 'path': dev_uri,
+            'body': {'hostname': 'foo-bar2'},
+        },
+    ]
+    resp = client.post(batch_uri, data=json.dumps(operations))
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    error = resp.json()['error']
+    assert error['message'] == 'Operation 1 failed, no changes were made.'
+    assert [r['code'] for r in error['results']] == [201, 400]
+    assert not models.Device.objects.exists()
+    assert not models.Change.objects.filter(resource_name='Device').exists()
+
+    # Invalid batches aren't performed at all.
+    for operations in (
+            [], {'method': 'POST'}, [{'method': 'GET', 'path': dev_uri}],
+            [{'method': 'POST'}],
+            [{'method': 'POST', 'path': dev_uri, 'id': 'a b'}],
+            [{'method': 'POST', 'path': dev_uri, 'id': 'a'}] * 2,
+            [{'method': 'POST', 'path': '/nope/'}],
+            [{'method': 'POST', 'path': batch_uri}]):
+        resp = client.post(batch_uri, data=json.dumps(operations))
+        assert_error(resp, status.HTTP_400_BAD_REQUEST)
+
+    operations = [
+        {
+            'id': 'dev', 'method': 'POST', 'path': dev_uri,
+            'body': {'hostname': 'foo-bar1'},
+        },
+        {
+            'method': 'DELETE',
+            'path': site.detail_uri('device', id='$dev.device.nope'),
+        },
+    ]
+    resp = client.post(batch_uri, data=json.dumps(operations))
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+    assert not models.Device.objects.exists()
+
+
+def test_batch_attribute_cache(site, client):
+    """Test that the Attributes of a site are only fetched once per batch."""
+    client.create(site.list_uri('attribute'), resource_name='Device', name='a')
+    operations = [
+        {
+            'method': 'POST', 'path': 'devices/',
+            'body': {'hostname': 'foo-bar%s' % i, 'attributes': {'a': 'b'}},
+        }
+        for i in range(5)
+    ]
+    batch_uri = reverse('site-batch', args=(site.id,))
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.post(batch_uri, data=json.dumps(operations))
+    assert resp.status_code == status.HTTP_200_OK
+
+    queries = [
+        q['sql'] for q in ctx.captured_queries
+        if '"nsot_attribute"."resource_name" = ' in q['sql']
+    ]
+    assert len(queries) == 1
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+
+# Allow everything in here to access the DB
+pytestmark = pytest.mark.django_db
+
+import calendar
+import datetime
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import gzip
+import json
+import logging
+from rest_framework import status
+import time
+
+from nsot import models
+from nsot.api import views
+
+from .fixtures import live_server, client, site
+from .util import assert_error
+
+
+log = logging.getLogger(__name__)
+
+
+def test_feed(site, client, settings, monkeypatch):
+    """Test the change feed."""
+    settings.CHANGE_FEED_SETTLE_TIME = 0
+    dev_uri = site.list_uri('device')
+    feed_uri = reverse('change-feed', args=(site.id,))
+
+    for i in range(3):
+        client.create(dev_uri, hostname='foo-bar%s' % i)
+
+    # Changes are returned oldest first, including the Site's creation.
+    data = client.get(feed_uri).json()['data']
+    ids = [c['id'] for c in data['changes']]
+    assert ids == sorted(ids)
+    assert [c['resource_name'] for c in data['changes']] == (
+        ['Site'] + ['Device'] * 3
+    )
+    assert data['next'] == ids[-1]
+
+    # Changes are paged through with since.
+    data = client.retrieve(feed_uri, since=ids[0], limit=2).json()['data']
+    assert [c['id'] for c in data['changes']] == ids[1:3]
+    data = client.retrieve(feed_uri, since=data['next']).json()['data']
+    assert [c['id'] for c in data['changes']] == ids[3:]
+
+    # Filters are supported.
+    data = client.retrieve(feed_uri, resource_name='Site').json()['data']
+    assert [c['id'] for c in data['changes']] == ids[:1]
+
+    # There's nothing new, so it's returned right away.
+    data = client.retrieve(feed_uri, since=ids[-1]).json()['data']
+    assert data == {'next': ids[-1], 'changes': []}
+
+    # Waiting returns the changes as soon as there are some.
+    settings.CHANGE_FEED_POLL_INTERVAL = 0.1
+    device = models.Device.objects.get(hostname='foo-bar0')
+    user = models.Change.objects.latest('id').user
+
+    def sleep(seconds):
+        models.Change.objects.log_changes([device], user, 'Update')
+    monkeypatch.setattr(views.time, 'sleep', sleep)
+    resp = client.retrieve(feed_uri, since=ids[-1], wait=10)
+    monkeypatch.undo()
+    changes = resp.json()['data']['changes']
+    assert [c['event'] for c in changes] == ['Update']
+
+    # Waiting is bounded.
+    start = time.time()
+    resp = client.retrieve(feed_uri, since=changes[0]['id'], wait=1)
+    assert time.time() - start >= 1
+    assert resp.json()['data']['changes'] == []
+
+    assert_error(
+        client.retrieve(feed_uri, since='bogus'), status.HTTP_400_BAD_REQUEST
+    )
+    assert_error(
+        client.retrieve(feed_uri, limit=0), status.HTTP_400_BAD_REQUEST
+    )
+
+
+def test_feed_settle_time(site, client, settings):
+    """Test that the change feed never skips Changes committed late."""
+    settings.CHANGE_FEED_SETTLE_TIME = 60
+    dev_uri = site.list_uri('device')
+    feed_uri = reverse('change-feed', args=(site.id,))
+    since = models.Change.objects.latest('id').id
+
+    for i in range(2):
+        client.create(dev_uri, hostname='foo-bar%s' % i)
+    first, second = models.Change.objects.filter(
+        id__gt=since
+    ).order_by('id')
+
+    def get_feed():
+        return client.retrieve(feed_uri, since=since).json()['data']
+
+    # Recent Changes aren't returned yet.
+    assert get_feed() == {'next': since, 'changes': []}
+
+    # Nor are those after a recent Change, since it may have been committed
+    # after them.
+    past = timezone.now() - datetime.timedelta(seconds=120)
+    models.Change.objects.filter(id=second.id).update(change_at=past)
+    assert get_feed() == {'next': since, 'changes': []}
+
+    models.Change.objects.filter(id=first.id).update(change_at=past)
+    data = get_feed()
+    assert [c['id'] for c in data['changes']] == [first.id, second.id]
+    assert data['next'] == second.id
+
+
+def test_deltas(site, client, settings):
+    """Test storing Changes as deltas against checkpoints."""
+    settings.CHANGE_LOG_DELTAS = True
+    settings.CHANGE_LOG_CHECKPOINT_INTERVAL = 3
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+    chg_uri = site.list_uri('change')
+
+    client.create(attr_uri, resource_name='Device', name='owner')
+    client.create(attr_uri, resource_name='Device', name='description')
+    description = 'Top of rack switch in row 12, rack 3 of the datacenter.'
+    dev = client.create(
+        dev_uri, hostname='foo-bar0',
+        attributes={'owner': 'jathan', 'description': description}
+    ).json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+
+    expected = [dev]
+    for i in range(1, 5):
+        attributes = {'description': description}
+        if i % 2:
+            attributes['owner'] = 'gary'
+        resp = client.update(
+            dev_obj_uri, hostname='foo-bar%s' % i, attributes=attributes
+        )
+        expected.append(resp.json()['data']['device'])
+
+    # Every third Change is a checkpoint.
+    changes = models.Change.objects.filter(
+        resource_name='Device'
+    ).order_by('id')
+    checkpoints = [c.checkpoint_id for c in changes]
+    assert checkpoints == [
+        None, changes[0].id, changes[0].id, None, changes[3].id
+    ]
+    assert changes[1]._resource == {
+        'set': {'hostname': 'foo-bar1'},
+        'patch': {'attributes': {'set': {'owner': 'gary'}}},
+    }
+
+    # Resources are reconstructed on read.
+    data = client.retrieve(chg_uri, resource_name='Device').json()['data']
+    resources = [c['resource'] for c in data['changes']]
+    assert sorted(resources, key=lambda r: r['hostname']) == expected
+
+    settings.CHANGE_FEED_SETTLE_TIME = 0
+    feed_uri = reverse('change-feed', args=(site.id,))
+    data = client.retrieve(feed_uri, resource_name='Device').json()['data']
+    assert [c['resource'] for c in data['changes']] == expected
+
+    # Changes logged through the outbox are also stored as deltas.
+    settings.ASYNC_CHANGE_LOG = True
+    settings.CHANGE_LOG_SETTLE_TIME = 0
+    client.update(
+        dev_obj_uri, hostname='foo-bar5',
+        attributes={'description': description}
+    )
+    call_command('changelog_worker', once=True, verbosity=0)
+    change = models.Change.objects.latest('id')
+    assert change.checkpoint_id == changes[3].id
+    assert change.resource['hostname'] == 'foo-bar5'
+
+
+def test_archive(site, client, settings, tmpdir):
+    """Test archiving old Changes."""
+    settings.CHANGE_LOG_DELTAS = True
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+
+    client.create(attr_uri, resource_name='Device', name='description')
+    description = 'Top of rack switch in row 12, rack 3 of the datacenter.'
+    devices = [
+        client.create(
+            dev_uri, hostname='foo-bar%s' % i,
+            attributes={'description': description}
+        ).json()['data']['device']
+        for i in range(2)
+    ]
+    dev_obj_uri = site.detail_uri('device', id=devices[0]['id'])
+    for i in range(3):
+        client.update(
+            dev_obj_uri, hostname='foo-baz%s' % i,
+            attributes={'description': description}
+        )
+
+    # Only the Changes made before the cutoff are archived.
+    old = models.Change.objects.exclude(resource_name='Site')
+    old.update(change_at=timezone.now() - datetime.timedelta(days=30))
+    expected = [c.to_dict() for c in old.order_by('id')]
+    latest = [c.resource for c in old.order_by('-id')[:2]]
+    assert models.Change.objects.filter(checkpoint__isnull=False).count() == 3
+
+    output = str(tmpdir.join('changes.ndjson.gz'))
+    call_command(
+        'changes', 'archive', days=7, keep=2, output=output, batch_size=2,
+        verbosity=0
+    )
+
+    # The latest 2 Changes of each resource are kept, so only the creation
+    # and first update of the first device are archived. Deltas against
+    # archived checkpoints are stored in full.
+    with gzip.open(output) as f:
+        archived = [json.loads(line) for line in f]
+    assert archived == json.loads(json.dumps([expected[1], expected[3]]))
+
+    remaining = models.Change.objects.exclude(resource_name='Site')
+    assert remaining.count() == 4
+    assert not remaining.filter(checkpoint__isnull=False).exists()
+    assert [c.resource for c in remaining.order_by('-id')[:2]] == latest
+    assert models.Change.objects.filter(resource_name='Site').exists()
+
+    call_command(
+        'changes', 'archive', before='2000-01-01', output=output, verbosity=0
+    )
+    with gzip.open(output) as f:
+        assert f.read() == b''
+    assert models.Change.objects.count() == 5
+
+    with pytest.raises(CommandError):
+        call_command('changes', 'archive', output=output, verbosity=0)
+
+
+def test_as_of(site, client, settings):
+    """Test retrieving objects as they were at a point in time."""
+    settings.CHANGE_LOG_DELTAS = True
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+
+    client.create(attr_uri, resource_name='Device', name='description')
+    description = 'Top of rack switch in row 12, rack 3 of the datacenter.'
+    dev = client.create(
+        dev_uri, hostname='foo-bar1', attributes={'description': description}
+    ).json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+    updated = client.update(
+        dev_obj_uri, hostname='foo-bar2',
+        attributes={'description': description}
+    ).json()['data']['device']
+    other = client.create(
+        dev_uri, hostname='foo-bar3'
+    ).json()['data']['device']
+    client.delete(dev_obj_uri)
+
+    # Spread the Changes of the devices a day apart, after the others.
+    now = timezone.now().replace(microsecond=0)
+    models.Change.objects.update(change_at=now - datetime.timedelta(days=5))
+    changes = models.Change.objects.filter(resource_name='Device')
+    for i, change in enumerate(changes.order_by('-id')):
+        changes.filter(id=change.id).update(
+            change_at=now - datetime.timedelta(days=i)
+        )
+    stamps = [
+        calendar.timegm((now - datetime.timedelta(days=i)).timetuple())
+        for i in (4, 3, 2, 1, 0)
+    ]
+    assert changes.filter(checkpoint__isnull=False).count() == 2
+
+    # Before it was created.
+    resp = client.retrieve(dev_obj_uri, as_of=stamps[0])
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+
+    resp = client.retrieve(dev_obj_uri, as_of=stamps[1])
+    assert resp.json()['data']['device'] == dev
+
+    resp = client.retrieve(dev_obj_uri, as_of=stamps[2])
+    assert resp.json()['data']['device'] == updated
+    resp = client.retrieve(dev_obj_uri, as_of=stamps[3], fields='hostname')
+    assert resp.json()['data']['device'] == {'hostname': 'foo-bar2'}
+
+    # After it was deleted.
+    resp = client.retrieve(dev_obj_uri, as_of=stamps[4])
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+
+    as_of = datetime.datetime.utcfromtimestamp(stamps[2]).isoformat()
+    resp = client.retrieve(dev_obj_uri, as_of=as_of)
+    assert resp.json()['data']['device'] == updated
+
+    resp = client.retrieve(dev_obj_uri, as_of='yesterday')
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+
+    # Snapshots of the whole Site.
+    snapshot_uri = reverse('site-snapshot', args=(site.id,))
+    data = client.retrieve(snapshot_uri, as_of=stamps[3]).json()['data']
+    assert data['as_of'] == stamps[3]
+    assert data['next'] is None
+
+    def by_name(resources):
+        result = {}
+        for item in resources:
+            result.setdefault(item['resource_name'], []).append(
+                item['resource']
+            )
+        return result
+
+    resources = by_name(data['resources'])
+    assert resources['Device'] == [updated, other]
+    assert [a['name'] for a in resources['Attribute']] == ['description']
+    assert [s['id'] for s in resources['Site']] == [site.id]
+    assert 'Network' not in resources
+    assert sorted(data['resources'], key=lambda i: i['resource_name']) == (
+        data['resources']
+    )
+
+    data = client.retrieve(snapshot_uri, resource_name='Device').json()
+    assert data['data']['resources'] == [
+        {'resource_name': 'Device', 'resource': other}
+    ]
+
+    # Paged by cursor, or streamed.
+    full = client.retrieve(snapshot_uri, as_of=stamps[3]).json()['data']
+    pages = []
+    params = {'as_of': stamps[3], 'limit': 2}
+    while True:
+        page = client.retrieve(snapshot_uri, **params).json()['data']
+        assert page['limit'] == 2
+        pages.extend(page['resources'])
+        if page['next'] is None:
+            break
+        params['cursor'] = page['next']
+    assert pages == full['resources']
+
+    # The same resources are found whatever the size of the chunks.
+    changes = models.Change.objects.snapshot(timezone.now(), site_id=site.id)
+    chunked = models.Change.objects.snapshot(
+        timezone.now(), site_id=site.id, chunk_size=1
+    )
+    assert [c.id for c in chunked] == [c.id for c in changes]
+
+    resp = client.retrieve(snapshot_uri, as_of=stamps[3], stream='true')
+    assert resp.json()['data']['resources'] == full['resources']
+
+    resp = client.retrieve(snapshot_uri, cursor='bogus')
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+
+    resp = client.retrieve(snapshot_uri, resource_name='Value')
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+    resp = client.retrieve(reverse('site-snapshot', args=(0,)))
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+
+
+def test_network_as_of(site, client):
+    """Test the parent and root of Networks as they were at a point in time."""
+    net_uri = site.list_uri('network')
+    net_8 = client.create(
+        net_uri, cidr='10.0.0.0/8'
+    ).json()['data']['network']
+    net_24 = client.create(
+        net_uri, cidr='10.0.0.0/24'
+    ).json()['data']['network']
+
+    now = timezone.now().replace(microsecond=0)
+    models.Change.objects.update(change_at=now - datetime.timedelta(days=2))
+    as_of = calendar.timegm((now - datetime.timedelta(days=1)).timetuple())
+
+    # The /16 is the parent of the /24 since, and the /24 is since deleted.
+    client.create(net_uri, cidr='10.0.0.0/16')
+    client.delete(site.detail_uri('network', id=net_24['id']))
+
+    for route in ('network-parent', 'network-root'):
+        uri = reverse(route, args=(site.id, net_24['id']))
+        resp = client.retrieve(uri, as_of=as_of)
+        assert resp.json()['data']['network'] == net_8
+        assert_error(client.retrieve(uri), status.HTTP_404_NOT_FOUND)
+
+        # Networks without parents
+        uri = reverse(route, args=(site.id, net_8['id']))
+        resp = client.retrieve(uri, as_of=as_of)
+        assert_error(resp, status.HTTP_404_NOT_FOUND)
+
+
+def test_list_queries(site, client):
+    """Test that listing Changes costs the same queries for any page size."""
+    dev_uri = site.list_uri('device')
+    chg_uri = site.list_uri('change')
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get(chg_uri)
+        assert resp.status_code == status.HTTP_200_OK
+        return len(resp.json()['data']['changes']), len(ctx.captured_queries)
+
+    client.create(dev_uri, hostname='foo-bar0')
+    num_changes, num_queries = count_queries()
+
+    client.post(
+        dev_uri,
+        data=json.dumps([{'hostname': 'foo-bar%s' % i} for i in range(1, 10)])
+    )
+    assert count_queries() == (num_changes + 9, num_queries)
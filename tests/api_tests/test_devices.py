@@ -7,11 +7,19 @@ import pytest
 pytestmark = pytest.mark.django_db
 
 import copy
+import datetime
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.utils import timezone
 import json
 import logging
+import os
 from rest_framework import status
 
+from nsot import models
+from nsot.api import views
+from nsot.util import cache
+
 from .fixtures import live_server, client, user, site
 from .util import (
     assert_created, assert_error, assert_success, assert_deleted, load_json,
@@ -208,6 +216,62 @@ def test_set_queries(client, site):
     )
 
 
+def test_streaming(client, site, monkeypatch):
+    """Test that streamed lists are identical to regular lists."""
+    # Make sure results span multiple chunks.
+    monkeypatch.setattr(views.BaseNsotViewSet, 'stream_chunk_size', 2)
+
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+    query_uri = site.query_uri('device')
+
+    client.post(attr_uri, data=load('attributes.json'))
+    client.post(dev_uri, data=load('devices.json'))
+
+    for uri, params in [
+        (dev_uri, {}),
+        (dev_uri, {'limit': 2, 'offset': 1}),
+        (dev_uri, {'hostname': 'nope'}),
+        (query_uri, {'query': 'foo=bar'}),
+    ]:
+        expected = client.retrieve(uri, **params)
+        params['stream'] = 'true'
+        resp = client.retrieve(uri, **params)
+        assert resp.status_code == status.HTTP_200_OK
+        assert 'Content-Length' not in resp.headers
+        assert resp.content == expected.content
+
+
+def test_sparse_fields(client, site):
+    """Test selecting the fields of Devices with fields/exclude."""
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+
+    client.create(attr_uri, resource_name='Device', name='owner')
+    dev_resp = client.create(
+        dev_uri, hostname='foo-bar1', attributes={'owner': 'jathan'}
+    )
+    dev = dev_resp.json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+
+    resp = client.retrieve(dev_uri, fields='id,hostname')
+    assert resp.json()['data']['devices'] == [
+        {'id': dev['id'], 'hostname': 'foo-bar1'}
+    ]
+
+    resp = client.retrieve(dev_uri, exclude='attributes', stream='true')
+    assert resp.json()['data']['devices'] == [
+        {'id': dev['id'], 'hostname': 'foo-bar1', 'site_id': site.id}
+    ]
+
+    resp = client.retrieve(dev_obj_uri, fields='hostname,bogus')
+    assert resp.json()['data']['device'] == {'hostname': 'foo-bar1'}
+
+    # Resources that aren't serialized from values are pruned.
+    resp = client.retrieve(attr_uri, fields='name')
+    assert resp.json()['data']['attributes'] == [{'name': 'owner'}]
+
+
 def test_update(live_server, user, site):
     admin_client = Client(live_server, user='admin')
     user_client = Client(live_server, user='user')
@@ -271,6 +335,94 @@ def test_deletion(site, client):
     assert_deleted(client.delete(dev1_obj_uri))
 
 
+def test_bulk_deletion(site, client):
+    """Test deleting Devices along with everything that depends on them."""
+    dev_uri = site.list_uri('device')
+    ifc_uri = site.list_uri('interface')
+    client.create(site.list_uri('network'), cidr='10.0.0.0/8')
+    client.create(site.list_uri('attribute'), resource_name='Device', name='a')
+
+    devices = [
+        client.create(
+            dev_uri, hostname='foo-bar%s' % i, attributes={'a': 'b'}
+        ).json()['data']['device']
+        for i in range(1, 4)
+    ]
+    eth0 = client.create(
+        ifc_uri, device=devices[0]['id'], name='eth0',
+        addresses=['10.0.0.1/32']
+    ).json()['data']['interface']
+    client.create(
+        ifc_uri, device=devices[0]['id'], name='eth0.1', parent_id=eth0['id'],
+        addresses=['10.0.0.2/32']
+    )
+    client.create(
+        ifc_uri, device=devices[1]['id'], name='eth0',
+        addresses=['10.0.0.1/32', '10.0.0.3/32']
+    )
+    client.create(
+        ifc_uri, device=devices[2]['id'], name='eth0',
+        addresses=['10.0.0.3/32']
+    )
+
+    # Nothing is deleted if any of the objects don't exist.
+    headers = {'Content-type': 'application/json'}
+    resp = client.delete(
+        dev_uri, data=json.dumps([devices[0]['id'], 0]), headers=headers
+    )
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+    resp = client.delete(
+        dev_uri, data=json.dumps({'id': devices[0]['id']}), headers=headers
+    )
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+    assert models.Device.objects.count() == 3
+
+    # An Interface can't be deleted without its children.
+    resp = client.delete(
+        ifc_uri, data=json.dumps([eth0['id']]), headers=headers
+    )
+    assert_error(resp, status.HTTP_409_CONFLICT)
+
+    resp = client.delete(
+        dev_uri, headers=headers,
+        data=json.dumps([devices[0]['id'], {'id': devices[1]['id']}])
+    )
+    assert resp.status_code == status.HTTP_204_NO_CONTENT
+
+    assert list(models.Device.objects.values_list('hostname', flat=True)) == [
+        'foo-bar3'
+    ]
+    interfaces = models.Interface.objects.all()
+    assert [i.device_id for i in interfaces] == [devices[2]['id']]
+    assert [a.address.cidr for a in models.Assignment.objects.all()] == [
+        '10.0.0.3/32'
+    ]
+    assert [v.resource_id for v in models.Value.objects.all()] == [
+        devices[2]['id']
+    ]
+
+    # Addresses that are no longer assigned are orphaned.
+    states = {
+        n.cidr: n.state for n in models.Network.objects.filter(is_ip=True)
+    }
+    assert states == {
+        '10.0.0.1/32': 'orphaned', '10.0.0.2/32': 'orphaned',
+        '10.0.0.3/32': 'assigned',
+    }
+
+    changes = models.Change.objects.filter(event='Delete')
+    assert sorted(
+        c.resource['name'] for c in changes if c.resource_name == 'Interface'
+    ) == ['eth0', 'eth0', 'eth0.1']
+    assert sorted(
+        c.resource_id for c in changes if c.resource_name == 'Device'
+    ) == [devices[0]['id'], devices[1]['id']]
+    assert_error(
+        client.get(site.detail_uri('device', id=devices[0]['id'])),
+        status.HTTP_404_NOT_FOUND
+    )
+
+
 def test_detail_routes(site, client):
     """Test detail routes for Devices."""
     ifc_uri = site.list_uri('interface')
@@ -304,3 +456,340 @@ def test_detail_routes(site, client):
         'interfaces': interfaces,
     }
     assert_success(client.retrieve(ifaces_uri), expected)
+
+
+def test_sync_interfaces(site, client):
+    """Test declarative sync of the Interfaces on a Device."""
+    attr_uri = site.list_uri('attribute')
+    chg_uri = site.list_uri('change')
+    dev_uri = site.list_uri('device')
+    ifc_uri = site.list_uri('interface')
+    net_uri = site.list_uri('network')
+
+    client.create(attr_uri, resource_name='Interface', name='vlan')
+    client.create(net_uri, cidr='10.1.1.0/24')
+
+    dev_resp = client.create(dev_uri, hostname='foo-bar1')
+    dev = dev_resp.json()['data']['device']
+    sync_uri = reverse(
+        'device-interfaces/sync', args=(site.id, dev['id'])
+    )
+
+    client.create(ifc_uri, device=dev['id'], name='eth0')
+    client.create(ifc_uri, device=dev['id'], name='eth9')
+    num_changes = client.get(chg_uri).json()['data']['total']
+
+    # eth0 is updated, eth1 is created and eth9 is deleted.
+    wanted = [
+        {'name': 'eth0', 'addresses': ['10.1.1.1/32'],
+         'attributes': {'vlan': '300'}},
+        {'name': 'eth1', 'speed': 10000, 'addresses': ['10.1.1.2/32']},
+    ]
+    sync_resp = client.put(sync_uri, data=json.dumps(wanted))
+    assert_success(sync_resp)
+
+    result = sync_resp.json()['data']
+    assert [i['name'] for i in result['created']] == ['eth1']
+    assert [i['name'] for i in result['updated']] == ['eth0']
+    assert [i['name'] for i in result['deleted']] == ['eth9']
+    assert result['created'][0]['addresses'] == ['10.1.1.2/32']
+    assert result['created'][0]['networks'] == ['10.1.1.0/24']
+    assert result['updated'][0]['attributes'] == {'vlan': '300'}
+
+    interfaces = client.get(ifc_uri).json()['data']['interfaces']
+    assert sorted(i['name'] for i in interfaces) == ['eth0', 'eth1']
+
+    changes = client.get(chg_uri).json()['data']['total']
+    assert changes == num_changes + 3
+
+    # Syncing the same state again is a no-op.
+    sync_resp = client.put(sync_uri, data=json.dumps(wanted))
+    assert_success(
+        sync_resp, {'created': [], 'updated': [], 'deleted': []}
+    )
+    assert client.get(chg_uri).json()['data']['total'] == changes
+
+    # Moving an address between interfaces is allowed.
+    wanted[0]['addresses'], wanted[1]['addresses'] = ['10.1.1.2/32'], []
+    sync_resp = client.put(sync_uri, data=json.dumps(wanted))
+    result = sync_resp.json()['data']
+    assert sorted(i['name'] for i in result['updated']) == ['eth0', 'eth1']
+    assert result['created'] == result['deleted'] == []
+
+    # Addresses that are no longer assigned are orphaned, including those of
+    # deleted interfaces.
+    def states():
+        return dict(
+            (n.cidr, n.state)
+            for n in models.Network.objects.filter(is_ip=True)
+        )
+    assert states() == {'10.1.1.1/32': 'orphaned', '10.1.1.2/32': 'assigned'}
+
+    wanted[1]['description'] = 'uplink'
+    wanted.append({'name': 'eth2', 'addresses': ['10.1.1.3/32']})
+    assert_success(client.put(sync_uri, data=json.dumps(wanted)))
+    assert states()['10.1.1.3/32'] == 'assigned'
+    eth1 = client.retrieve(ifc_uri, name='eth1').json()['data']['interfaces']
+    assert (eth1[0]['description'], eth1[0]['speed']) == ('uplink', 10000)
+
+    del wanted[2]
+    result = client.put(sync_uri, data=json.dumps(wanted)).json()['data']
+    assert [i['name'] for i in result['deleted']] == ['eth2']
+    assert states() == {
+        '10.1.1.1/32': 'orphaned', '10.1.1.2/32': 'assigned',
+        '10.1.1.3/32': 'orphaned',
+    }
+
+    # Invalid state is rejected without applying anything.
+    bad = wanted + [{'name': 'eth2', 'attributes': {'bogus': 'foo'}}]
+    assert_error(
+        client.put(sync_uri, data=json.dumps(bad)),
+        status.HTTP_400_BAD_REQUEST
+    )
+    dupe = wanted + [{'name': 'eth0'}]
+    assert_error(
+        client.put(sync_uri, data=json.dumps(dupe)),
+        status.HTTP_400_BAD_REQUEST
+    )
+    interfaces = client.get(ifc_uri).json()['data']['interfaces']
+    assert sorted(i['name'] for i in interfaces) == ['eth0', 'eth1']
+
+
+def test_cached_responses(site, client, locmem_cache):
+    """Test that cached Device responses are invalidated by writes."""
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+    query_uri = site.query_uri('device')
+
+    client.create(attr_uri, resource_name='Device', name='owner')
+    dev_resp = client.create(
+        dev_uri, hostname='foo-bar1', attributes={'owner': 'jathan'}
+    )
+    dev = dev_resp.json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+
+    # Prime the cache.
+    resp = client.retrieve(query_uri, query='owner=jathan')
+    assert resp.json()['data']['total'] == 1
+    resp = client.get(dev_obj_uri)
+    assert resp.json()['data']['device']['attributes'] == {'owner': 'jathan'}
+
+    # Updating attributes invalidates the set query and the detail view.
+    client.update(
+        dev_obj_uri, hostname='foo-bar1', attributes={'owner': 'gary'}
+    )
+    resp = client.retrieve(query_uri, query='owner=jathan')
+    assert resp.json()['data']['total'] == 0
+    resp = client.get(dev_obj_uri)
+    assert resp.json()['data']['device']['attributes'] == {'owner': 'gary'}
+
+    # Deleting the device invalidates the list view.
+    assert client.get(dev_uri).json()['data']['total'] == 1
+    assert_deleted(client.delete(dev_obj_uri))
+    assert client.get(dev_uri).json()['data']['total'] == 0
+
+
+def test_cache_invalidation_after_transaction(site, client, locmem_cache):
+    """
+    Test that a response cached while a write is in progress isn't served
+    once the transaction has ended.
+    """
+    dev_uri = site.list_uri('device')
+    dev = client.create(dev_uri, hostname='foo-bar1').json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+
+    def get_hostname():
+        return client.get(dev_obj_uri).json()['data']['device']['hostname']
+
+    assert get_hostname() == 'foo-bar1'
+
+    # Read the Device mid-transaction, then roll back.
+    with pytest.raises(RuntimeError):
+        with cache.atomic():
+            device = models.Device.objects.get(id=dev['id'])
+            device.hostname = 'foo-bar2'
+            device.save()
+            assert get_hostname() == 'foo-bar2'
+            raise RuntimeError('rollback')
+
+    assert get_hostname() == 'foo-bar1'
+
+
+def test_cache_stats(site, client, locmem_cache):
+    """Test that the statistics of the in-process cache are exposed."""
+    dev_uri = site.list_uri('device')
+    stats_uri = reverse('cache-stats')
+    client.create(dev_uri, hostname='foo-bar1')
+
+    client.get(dev_uri)
+    before = client.get(stats_uri).json()['data']
+    assert before['pid'] == os.getpid()  # The live server is in-process.
+    client.get(dev_uri)
+    after = client.get(stats_uri).json()['data']
+    assert after['hits'] > before['hits']
+    assert set(after) == set([
+        'pid', 'hits', 'misses', 'hit_rate', 'entries', 'max_entries'
+    ])
+
+
+def test_count_strategies(site, client, locmem_cache):
+    """Test the strategies used to count list results."""
+    dev_uri = site.list_uri('device')
+    client.create(dev_uri, hostname='foo-bar1')
+    client.create(dev_uri, hostname='foo-bar2')
+
+    for strategy in ('true', 'exact', 'cached', 'estimated'):
+        resp = client.retrieve(dev_uri, count=strategy, limit=1)
+        assert resp.json()['data']['total'] == 2
+
+    # Cached counts are invalidated by writes.
+    client.create(dev_uri, hostname='foo-bar3')
+    resp = client.retrieve(dev_uri, count='cached', limit=1)
+    assert resp.json()['data']['total'] == 3
+
+    assert_error(
+        client.retrieve(dev_uri, count='bogus'), status.HTTP_400_BAD_REQUEST
+    )
+
+
+def test_bulk_change_logging(site, client, monkeypatch):
+    """Test that bulk writes log Changes from the response data."""
+    dev_uri = site.list_uri('device')
+    chg_uri = site.list_uri('change')
+
+    # The objects are only serialized for the response.
+    def get_serializer_for_resource(*args, **kwargs):
+        raise AssertionError('Change serialized an object.')
+    monkeypatch.setattr(
+        models.Change, 'get_serializer_for_resource',
+        get_serializer_for_resource
+    )
+
+    hostnames = [{'hostname': 'foo-bar%s' % i} for i in range(3)]
+    resp = client.post(dev_uri, data=json.dumps(hostnames))
+    assert resp.status_code == status.HTTP_201_CREATED
+    devices = resp.json()['data']['devices']
+
+    for dev in devices:
+        dev['hostname'] += '-new'
+    resp = client.put(dev_uri, data=json.dumps(devices))
+    assert resp.json() == devices
+
+    changes = client.retrieve(chg_uri, resource_name='Device')
+    changes = changes.json()['data']['changes']
+    events = sorted(
+        (c['event'], c['resource_id'], c['resource']['hostname'])
+        for c in changes
+    )
+    assert events == sorted(
+        [('Create', d['id'], d['hostname'][:-4]) for d in devices] +
+        [('Update', d['id'], d['hostname']) for d in devices]
+    )
+
+
+def test_async_change_log(site, client, settings):
+    """Test logging Changes through the outbox."""
+    settings.ASYNC_CHANGE_LOG = True
+    dev_uri = site.list_uri('device')
+    chg_uri = site.list_uri('change')
+
+    dev = client.create(dev_uri, hostname='foo-bar1').json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+    etag = client.get(dev_uri).headers['ETag']
+    client.update(dev_obj_uri, hostname='foo-bar2')
+    assert_deleted(client.delete(dev_obj_uri))
+
+    # Pending changes are taken into account for conditional requests.
+    assert client.get(dev_uri).headers['ETag'] != etag
+
+    # The changes are only logged by the worker, in order.
+    params = {'resource_name': 'Device'}
+    assert client.retrieve(chg_uri, **params).json()['data']['total'] == 0
+    assert models.PendingChange.objects.count() == 3
+
+    # Recent changes, and those after them, are left until they settle.
+    settings.CHANGE_LOG_SETTLE_TIME = 60
+    pending = models.PendingChange.objects.order_by('id')
+    models.PendingChange.objects.filter(id=pending[0].id).update(
+        change_at=timezone.now() - datetime.timedelta(seconds=120)
+    )
+    assert models.PendingChange.objects.materialize() == 1
+    assert models.PendingChange.objects.count() == 2
+
+    settings.CHANGE_LOG_SETTLE_TIME = 0
+    call_command('changelog_worker', once=True, batch_size=2, verbosity=0)
+    assert models.PendingChange.objects.count() == 0
+
+    changes = client.retrieve(chg_uri, **params).json()['data']['changes']
+    changes.sort(key=lambda c: c['id'])
+    assert [(c['event'], c['resource']['hostname']) for c in changes] == [
+        ('Create', 'foo-bar1'), ('Update', 'foo-bar2'),
+        ('Delete', 'foo-bar2'),
+    ]
+    assert [c['resource_id'] for c in changes] == [dev['id']] * 3
+
+
+def check_conditional_requests(site, client, monkeypatch):
+    dev_uri = site.list_uri('device')
+    dev = client.create(dev_uri, hostname='foo-bar1').json()['data']['device']
+    dev_obj_uri = site.detail_uri('device', id=dev['id'])
+
+    list_resp = client.get(dev_uri)
+    obj_resp = client.get(dev_obj_uri)
+    for resp in (list_resp, obj_resp):
+        assert resp.headers['ETag']
+        assert resp.headers['Last-Modified']
+
+    # The ETag depends on the format and the query params.
+    csv_resp = client.retrieve(dev_uri, format='csv')
+    assert csv_resp.headers['ETag'] != list_resp.headers['ETag']
+    assert client.retrieve(dev_uri, limit=1).headers['ETag'] != \
+        list_resp.headers['ETag']
+
+    # Conditional requests are answered without querying devices.
+    def get_queryset(*args, **kwargs):
+        raise AssertionError('Devices were queried.')
+    monkeypatch.setattr(views.DeviceViewSet, 'get_queryset', get_queryset)
+
+    for uri, resp in ((dev_uri, list_resp), (dev_obj_uri, obj_resp)):
+        for headers in ({'If-None-Match': resp.headers['ETag']},
+                        {'If-Modified-Since': resp.headers['Last-Modified']}):
+            not_modified = client.get(uri, headers=headers)
+            assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+            assert not_modified.content == b''
+            assert not_modified.headers['ETag'] == resp.headers['ETag']
+    monkeypatch.undo()
+
+    # A stale If-Modified-Since is ignored if the ETag doesn't match.
+    resp = client.get(
+        dev_uri, headers={
+            'If-None-Match': csv_resp.headers['ETag'],
+            'If-Modified-Since': list_resp.headers['Last-Modified'],
+        }
+    )
+    assert resp.status_code == status.HTTP_200_OK
+
+    # Writes change the ETags.
+    client.update(dev_obj_uri, hostname='foo-bar2')
+    for uri, resp in ((dev_uri, list_resp), (dev_obj_uri, obj_resp)):
+        modified = client.get(
+            uri, headers={'If-None-Match': resp.headers['ETag']}
+        )
+        assert modified.status_code == status.HTTP_200_OK
+        assert modified.headers['ETag'] != resp.headers['ETag']
+
+    # Errors don't have an ETag.
+    resp = client.get(site.detail_uri('device', id=0))
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert 'ETag' not in resp.headers
+
+
+def test_conditional_requests(site, client, monkeypatch):
+    """Test conditional requests based on the latest Change."""
+    check_conditional_requests(site, client, monkeypatch)
+
+
+def test_conditional_requests_cached(site, client, monkeypatch,
+                                     locmem_cache):
+    """Test conditional requests based on cached data versions."""
+    check_conditional_requests(site, client, monkeypatch)
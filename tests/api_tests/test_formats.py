@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+
+# Allow everything in there to access the DB
+pytestmark = pytest.mark.django_db
+
+import csv
+import json
+import logging
+import msgpack
+import requests
+from rest_framework import status
+
+from .fixtures import live_server, client, user, site
+from .util import assert_error, load
+
+
+log = logging.getLogger(__name__)
+
+
+def test_ndjson(site, client):
+    """Test rendering and parsing NDJSON."""
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+
+    client.post(attr_uri, data=load('attributes.json'))
+    devices = json.loads(load('devices.json'))
+    data = '\n'.join(json.dumps(d) for d in devices) + '\n'
+    resp = client.post(
+        dev_uri, data=data,
+        headers={'Content-type': 'application/x-ndjson'}
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+
+    expected = client.get(dev_uri).json()['data']['devices']
+    for params in ({'format': 'ndjson'}, {'format': 'ndjson', 'stream': 1}):
+        resp = client.retrieve(dev_uri, **params)
+        assert resp.headers['Content-Type'] == 'application/x-ndjson'
+        lines = resp.content.splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+    # Detail and error responses are a single line.
+    dev_obj_uri = site.detail_uri('device', id=expected[0]['id'])
+    resp = client.get(
+        dev_obj_uri, headers={'Accept': 'application/x-ndjson'}
+    )
+    assert json.loads(resp.content) == expected[0]
+
+    resp = client.retrieve(site.detail_uri('device', id=0), format='ndjson')
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+    assert json.loads(resp.content)['status'] == 'error'
+
+    resp = client.post(
+        dev_uri, data='{"hostname":',
+        headers={'Content-type': 'application/x-ndjson'}
+    )
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+
+
+def test_csv(site, client):
+    """Test rendering and parsing CSV."""
+    attr_uri = site.list_uri('attribute')
+    dev_uri = site.list_uri('device')
+
+    client.post(attr_uri, data=load('attributes.json'))
+    data = (
+        'hostname,attributes.foo,attributes.owner\r\n'
+        'foo-bar1,bar,jathan\r\n'
+        'foo-bar2,baz,"gary"\r\n'
+    )
+    resp = client.post(
+        dev_uri, data=data, headers={'Content-type': 'text/csv'}
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+
+    expected = client.get(dev_uri).json()['data']['devices']
+    assert [d['attributes'] for d in expected] == [
+        {'foo': 'bar', 'owner': 'jathan'}, {'foo': 'baz', 'owner': 'gary'}
+    ]
+
+    resp = client.retrieve(dev_uri, format='csv')
+    assert resp.headers['Content-Type'] == 'text/csv; charset=utf-8'
+    rows = list(csv.DictReader(resp.content.splitlines()))
+    assert rows == [
+        {
+            'id': str(d['id']), 'site_id': str(d['site_id']),
+            'hostname': d['hostname'],
+            'attributes.foo': d['attributes']['foo'],
+            'attributes.owner': d['attributes']['owner'],
+        }
+        for d in expected
+    ]
+
+    # Streamed CSV includes columns for all of the attributes.
+    resp = client.retrieve(dev_uri, format='csv', stream='true')
+    rows = list(csv.DictReader(resp.content.splitlines()))
+    assert [r.pop('attributes.cluster') for r in rows] == ['', '']
+    assert rows == [
+        {
+            'id': str(d['id']), 'site_id': str(d['site_id']),
+            'hostname': d['hostname'],
+            'attributes.foo': d['attributes']['foo'],
+            'attributes.owner': d['attributes']['owner'],
+        }
+        for d in expected
+    ]
+
+
+def test_msgpack(site, client):
+    """Test rendering and parsing MessagePack."""
+    dev_uri = site.list_uri('device')
+
+    data = msgpack.packb([{'hostname': 'foo-bar1'}, {'hostname': 'foo-bar2'}])
+    resp = client.post(
+        dev_uri, data=data,
+        headers={'Content-type': 'application/x-msgpack'}
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+
+    expected = client.get(dev_uri).json()
+
+    # Betamax can't record binary responses, so skip it.
+    resp = requests.get(
+        client.base_url + dev_uri,
+        headers={
+            'X-NSoT-Email': client.user, 'Accept': 'application/x-msgpack'
+        }
+    )
+    assert resp.headers['Content-Type'] == 'application/x-msgpack'
+    assert msgpack.unpackb(resp.content, encoding='utf-8') == expected
+
+
+def test_compression(site, client):
+    """Test gzip compression of responses."""
+    dev_uri = site.list_uri('device')
+    client.post(
+        dev_uri,
+        data=json.dumps([{'hostname': 'foo-bar%s' % i} for i in range(50)])
+    )
+    devices = client.get(dev_uri).json()['data']['devices']
+    dev_obj_uri = site.detail_uri('device', id=devices[0]['id'])
+
+    # Small responses aren't compressed.
+    resp = client.get(dev_obj_uri, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
+
+    for params in ({}, {'stream': 'true'}):
+        resp = client.get(
+            dev_uri, params=params, headers={'Accept-Encoding': 'gzip'}
+        )
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert resp.json()['data']['devices'] == devices
+
+    # The ETag of compressed responses may be used in conditional requests.
+    etag = resp.headers['ETag']
+    assert etag.endswith(';gzip"')
+    resp = client.get(
+        dev_uri, params={'stream': 'true'},
+        headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+    )
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+
+    resp = client.get(dev_uri, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in resp.headers
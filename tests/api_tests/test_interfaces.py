@@ -12,6 +12,8 @@ import json
 import logging
 from rest_framework import status
 
+from nsot.api import views
+
 from .fixtures import live_server, client, user, site
 from .util import (
     assert_created, assert_error, assert_success, assert_deleted, load_json,
@@ -461,3 +463,33 @@ def test_detail_routes(site, client):
 
     # Verify assignments
     # FIXME(jathan): Assignments detail route testing is NYI!
+
+
+def test_values_serialization(site, client, monkeypatch):
+    """Responses serialized from values match the serializer's output."""
+    dev_uri = site.list_uri('device')
+    net_uri = site.list_uri('network')
+    ifc_uri = site.list_uri('interface')
+
+    dev_resp = client.create(dev_uri, hostname='foo-bar1')
+    dev = dev_resp.json()['data']['device']
+    client.create(net_uri, cidr='10.0.0.0/8')
+    resp = client.create(
+        ifc_uri, device=dev['id'], name='eth0',
+        mac_address='00:de:ad:be:ef:00', addresses=['10.10.10.1/32']
+    )
+    ifc = resp.json()['data']['interface']
+
+    uris = [
+        dev_uri, net_uri, ifc_uri,
+        site.detail_uri('interface', id=ifc['id']),
+        site.detail_uri('device', id=ifc['device']) + 'interfaces/',
+    ]
+    fast = [client.get(uri).content for uri in uris]
+    assert all(json.loads(content)['status'] == 'ok' for content in fast)
+
+    monkeypatch.setattr(
+        views.BaseNsotViewSet, 'can_serialize_values',
+        lambda self, objects: False
+    )
+    assert [client.get(uri).content for uri in uris] == fast
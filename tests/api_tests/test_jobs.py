@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+
+# Allow everything in there to access the DB
+pytestmark = pytest.mark.django_db
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+import datetime
+import json
+import logging
+from rest_framework import status
+
+from nsot import exc, models
+
+from .fixtures import live_server, client, user, site
+from .util import assert_error, Client
+
+
+log = logging.getLogger(__name__)
+
+
+def run_jobs(**options):
+    call_command('jobs_worker', once=True, verbosity=0, **options)
+
+
+def test_jobs(live_server, site, client):
+    """Test running bulk creates and updates as Jobs."""
+    dev_uri = site.list_uri('device')
+    devices = [{'hostname': 'foo-bar%s' % i} for i in range(1, 6)]
+
+    resp = client.post(
+        dev_uri, data=json.dumps(devices), params={'async': 'true'}
+    )
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    job = resp.json()['data']['job']
+    job_uri = reverse('job-detail', args=(job['id'],))
+    assert resp.headers['Location'].endswith(job_uri)
+    assert job['status'] == 'pending'
+    assert job['site_id'] == site.id
+    assert (job['total'], job['processed']) == (5, 0)
+    assert not models.Device.objects.exists()
+
+    run_jobs(chunk_size=2)
+
+    job = client.get(job_uri).json()['data']['job']
+    assert job['status'] == 'succeeded'
+    assert (job['total'], job['processed']) == (5, 5)
+    assert job['error'] is None
+    assert job['finished_at'] is not None
+    assert [d['hostname'] for d in job['results']] == [
+        d['hostname'] for d in devices
+    ]
+    assert models.Device.objects.count() == 5
+    assert models.JobChunk.objects.filter(job=job['id']).count() == 3
+
+    # Bulk updates
+    for dev in job['results']:
+        dev['attributes'] = {}
+    resp = client.put(
+        dev_uri, data=json.dumps(job['results']), params={'async': 'true'}
+    )
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    job_uri = reverse('job-detail', args=(resp.json()['data']['job']['id'],))
+    run_jobs(chunk_size=2)
+    job = client.get(job_uri).json()['data']['job']
+    assert (job['status'], job['processed']) == ('succeeded', 5)
+
+    resp = client.retrieve(reverse('job-list'), status='succeeded')
+    jobs = resp.json()['data']['jobs']
+    assert len(jobs) == 2
+    assert 'results' not in jobs[0]
+
+    # Results are paged by limit and offset.
+    resp = client.retrieve(job_uri, limit=2, offset=1)
+    assert [d['hostname'] for d in resp.json()['data']['job']['results']] == [
+        d['hostname'] for d in devices[1:3]
+    ]
+    resp = client.retrieve(job_uri, offset=4)
+    assert [d['hostname'] for d in resp.json()['data']['job']['results']] == [
+        devices[4]['hostname']
+    ]
+
+    # Jobs are only visible to the user who submitted them.
+    other_client = Client(live_server, 'other')
+    resp = other_client.retrieve(reverse('job-list'))
+    assert resp.json()['data']['jobs'] == []
+    assert_error(other_client.get(job_uri), status.HTTP_404_NOT_FOUND)
+
+    # Single objects are never run as Jobs.
+    resp = client.post(
+        dev_uri, data=json.dumps({'hostname': 'foo-bar6'}),
+        params={'async': 'true'}
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+
+    resp = client.post(
+        site.list_uri('device', site_id=site.id + 1),
+        data=json.dumps(devices), params={'async': 'true'}
+    )
+    assert_error(resp, status.HTTP_404_NOT_FOUND)
+
+
+def test_jobs_failure(site, client, settings, monkeypatch):
+    """Test that a failed Job keeps the chunks that were processed."""
+    settings.JOB_BULK_THRESHOLD = 3
+    dev_uri = site.list_uri('device')
+
+    # Below the threshold
+    resp = client.post(dev_uri, data=json.dumps([{'hostname': 'foo-bar1'}]))
+    assert resp.status_code == status.HTTP_201_CREATED
+
+    devices = [{'hostname': 'foo-bar%s' % i} for i in (2, 3, 1, 4)]
+    resp = client.post(dev_uri, data=json.dumps(devices))
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    job_uri = reverse('job-detail', args=(resp.json()['data']['job']['id'],))
+
+    run_jobs(chunk_size=2)
+
+    job = client.get(job_uri).json()['data']['job']
+    assert job['status'] == 'failed'
+    assert (job['total'], job['processed']) == (4, 2)
+    assert job['error']['code'] == status.HTTP_400_BAD_REQUEST
+    assert sorted(
+        models.Device.objects.values_list('hostname', flat=True)
+    ) == ['foo-bar1', 'foo-bar2', 'foo-bar3']
+
+    # A chunk whose results can't be recorded isn't kept either.
+    def fail(*args, **kwargs):
+        raise RuntimeError('Lost the database.')
+
+    devices = [{'hostname': 'foo-bar%s' % i} for i in (5, 6, 7)]
+    resp = client.post(dev_uri, data=json.dumps(devices))
+    job_uri = reverse('job-detail', args=(resp.json()['data']['job']['id'],))
+    monkeypatch.setattr(models.JobChunk.objects, 'create', fail)
+    run_jobs(chunk_size=2)
+    monkeypatch.undo()
+
+    job = client.get(job_uri).json()['data']['job']
+    assert (job['status'], job['processed']) == ('failed', 0)
+    assert job['error']['code'] == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert not models.Device.objects.filter(hostname='foo-bar5').exists()
+
+
+def test_jobs_reclaimed(site, client):
+    """Test that Jobs abandoned by a worker are resumed by another one."""
+    devices = [{'hostname': 'foo-bar%s' % i} for i in range(1, 5)]
+    resp = client.post(
+        site.list_uri('device'), data=json.dumps(devices),
+        params={'async': 'true'}
+    )
+    job_uri = reverse('job-detail', args=(resp.json()['data']['job']['id'],))
+
+    # A worker claims the Job and crashes after the first chunk.
+    abandoned = models.Job.objects.claim()
+    abandoned.add_results([{'hostname': 'foo-bar1'}, {'hostname': 'foo-bar2'}])
+    models.Device.objects.create(site_id=site.id, hostname='foo-bar1')
+    models.Device.objects.create(site_id=site.id, hostname='foo-bar2')
+
+    # The Job isn't claimed again while it's still making progress.
+    run_jobs(chunk_size=2)
+    job = client.get(job_uri).json()['data']['job']
+    assert (job['status'], job['processed']) == ('running', 2)
+
+    past = timezone.now() - datetime.timedelta(hours=1)
+    models.Job.objects.filter(id=abandoned.id).update(heartbeat_at=past)
+    run_jobs(chunk_size=2)
+    job = client.get(job_uri).json()['data']['job']
+    assert (job['status'], job['processed']) == ('succeeded', 4)
+    assert [d['hostname'] for d in job['results']] == [
+        d['hostname'] for d in devices
+    ]
+    assert models.Device.objects.count() == 4
+
+    # The worker that abandoned the Job can no longer update it.
+    with pytest.raises(exc.Conflict):
+        abandoned.finish(error={'code': 500, 'message': 'Crashed.'})
+    assert client.get(job_uri).json()['data']['job']['status'] == 'succeeded'
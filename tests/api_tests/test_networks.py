@@ -8,10 +8,13 @@ pytestmark = pytest.mark.django_db
 
 import copy
 from django.core.urlresolvers import reverse
+import ipaddress
 import json
 import logging
 from rest_framework import status
 
+from nsot.api import pagination
+
 from .fixtures import live_server, client, user, site
 from .util import (
     assert_created, assert_error, assert_success, assert_deleted, load_json,
@@ -111,6 +114,45 @@ def test_bulk_operations(site, client):
     assert updated == expected
 
 
+def test_bulk_create_partial(site, client):
+    """Test creating multiple Networks, skipping the invalid ones."""
+    net_uri = site.list_uri('network')
+    collection = [
+        {'cidr': '10.0.0.1/32'},
+        {'cidr': '10.0.0.0/8'},
+        {'cidr': 'bogus'},
+        {'cidr': '10.0.0.0/8'},
+    ]
+
+    # By default nothing is created if any of them fail.
+    resp = client.post(net_uri, data=json.dumps(collection))
+    assert_error(resp, status.HTTP_400_BAD_REQUEST)
+    resp = client.post(net_uri, data=json.dumps(collection[:2] * 2))
+    assert_error(resp, status.HTTP_409_CONFLICT)
+    assert client.get(net_uri).json()['data']['networks'] == []
+
+    resp = client.post(
+        net_uri, data=json.dumps(collection), params={'partial': 'true'}
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    data = resp.json()['data']
+    assert [n['network_address'] for n in data['networks']] == [
+        '10.0.0.1', '10.0.0.0'
+    ]
+    assert data['networks'][0]['parent_id'] == data['networks'][1]['id']
+    assert [(e['index'], e['code']) for e in data['errors']] == [
+        (2, status.HTTP_400_BAD_REQUEST), (3, status.HTTP_409_CONFLICT)
+    ]
+
+    assert_success(
+        client.get(net_uri),
+        {
+            'networks': data['networks'], 'limit': None, 'offset': 0,
+            'total': 2,
+        }
+    )
+
+
 def test_filters(site, client):
     """Test cidr/address/prefix/attribute filters for Networks."""
 
@@ -259,6 +301,61 @@ def test_set_queries(client, site):
     )
 
 
+def test_keyset_pagination(site, client):
+    """Test walking through Networks using cursors."""
+    net_uri = site.list_uri('network')
+    cidrs = [
+        '10.0.0.0/8', '10.0.0.0/24', '10.0.0.1/32', '10.10.0.0/16',
+        '192.168.0.0/16', '2001:db8::/32', '2001:db8::/64', '2001:db8::1/128',
+    ]
+    client.post(
+        net_uri, data=json.dumps([{'cidr': cidr} for cidr in cidrs])
+    )
+
+    # Walk all pages.
+    seen = []
+    cursor = ''
+    while True:
+        resp = client.retrieve(net_uri, limit=3, cursor=cursor)
+        data = resp.json()['data']
+        assert data['total'] == len(cidrs)
+        assert 'offset' not in data
+        seen.extend(
+            '%s/%s' % (n['network_address'], n['prefix_length'])
+            for n in data['networks']
+        )
+        cursor = data['next']
+        if cursor is None:
+            break
+    assert seen == [ipaddress.ip_network(cidr).exploded for cidr in cidrs]
+
+    # Without a limit, everything is returned at once.
+    resp = client.retrieve(net_uri, cursor='', count='false')
+    data = resp.json()['data']
+    assert 'total' not in data
+    assert data['next'] is None
+    assert len(data['networks']) == len(cidrs)
+
+    # Counting can also be skipped with limit/offset.
+    resp = client.retrieve(net_uri, limit=2, offset=2, count='false')
+    data = resp.json()['data']
+    assert 'total' not in data
+    assert data['offset'] == 2
+
+    assert_error(
+        client.retrieve(net_uri, cursor='bogus'), status.HTTP_400_BAD_REQUEST
+    )
+
+    # Cursors that were tampered with are rejected too.
+    for values in (['4', 'notanip', 8, 1], ['4', '', 8, 1],
+                   ['4', '10.0.0.0', 'bogus', 1], ['4', None, 8, 1]):
+        cursor = pagination.encode_cursor(values)
+        assert_error(
+            client.retrieve(net_uri, cursor=cursor),
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
 def test_update(live_server, user, site):
     admin_client = Client(live_server, 'admin')
     user_client = Client(live_server, 'user')
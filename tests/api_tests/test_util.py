@@ -4,8 +4,15 @@ from __future__ import unicode_literals, print_function
 Test NSoT utilities.
 """
 
-from nsot.util import SetQuery, parse_set_query
-from nsot.util import stats
+from django.core.management import call_command
+from django.test import override_settings
+import gzip
+from nsot.util import SetQuery, diff_dict, parse_set_query, patch_dict
+import os
+import threading
+import time
+
+from nsot.util import cache, staticfiles, stats
 
 
 def test_parse_set_query():
@@ -93,3 +100,224 @@ def test_stats_get_utilization(parent=PARENT, hosts=HOSTS):
     output = stats.calculate_network_utilization(parent, hosts, as_string=True)
 
     assert output == expected
+
+
+def test_diff_dict():
+    """Test computing and applying deltas between dicts."""
+    old = {
+        'id': 1, 'hostname': 'foo-bar1', 'addresses': ['10.0.0.1/32'],
+        'attributes': {'owner': 'jathan', 'vlan': '100'},
+    }
+    new = {
+        'id': 1, 'hostname': 'foo-bar2', 'addresses': ['10.0.0.1/32'],
+        'attributes': {'owner': 'gary'}, 'speed': 1000,
+    }
+    delta = diff_dict(old, new)
+    assert delta == {
+        'set': {'hostname': 'foo-bar2', 'speed': 1000},
+        'patch': {'attributes': {'set': {'owner': 'gary'}, 'unset': ['vlan']}},
+    }
+    assert patch_dict(old, delta) == new
+    assert patch_dict(new, diff_dict(new, old)) == old
+    assert diff_dict(old, old) == {}
+
+
+def test_cache_versions(locmem_cache):
+    """
+    Make sure that invalidating a resource only bumps the versions of the
+    resource type, its site, and the object itself.
+    """
+    def versions():
+        return {
+            'all': cache.get_version('Interface'),
+            'site1': cache.get_version('Interface', site_id=1),
+            'site2': cache.get_version('Interface', site_id=2),
+            'obj1': cache.get_version('Interface', obj_id=1),
+            'obj2': cache.get_version('Interface', obj_id=2),
+            'device': cache.get_version('Device', site_id=1),
+        }
+
+    before = versions()
+    assert versions() == before  # Versions are stable until invalidated
+
+    cache.invalidate('Interface', site_id=1, obj_id=1)
+    after = versions()
+
+    changed = set(k for k in before if before[k] != after[k])
+    assert changed == set(['all', 'site1', 'obj1'])
+
+    # New objects only invalidate the list views.
+    cache.invalidate('Interface', site_id=2)
+    changed = set(k for k, v in versions().iteritems() if after[k] != v)
+    assert changed == set(['all', 'site2'])
+
+    # Many objects are invalidated at once.
+    before = versions()
+    cache.invalidate_many('Interface', site_ids=[1, 1], obj_ids=[1, 2])
+    changed = set(k for k, v in versions().iteritems() if before[k] != v)
+    assert changed == set(['all', 'site1', 'obj1', 'obj2'])
+
+
+def test_local_cache(monkeypatch):
+    """Test LRU eviction, expiry and statistics of the in-process cache."""
+    local = cache.LocalCache(max_entries=2, timeout=60)
+    local.set('a', {'value': 1})
+    local.set('b', {'value': 2})
+
+    # Callers get their own copy.
+    value = local.get('a')
+    value['value'] = 3
+    assert local.get('a') == {'value': 1}
+
+    # 'b' is the least recently used.
+    local.set('c', {'value': 4})
+    assert local.get('b') is None
+    assert local.get('c') == {'value': 4}
+
+    # Entries expire after the smallest of both timeouts.
+    local.set('d', 'short', timeout=1)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 2)
+    assert local.get('d') is None
+    assert local.get('c') == {'value': 4}
+
+    assert local.stats() == {
+        'hits': 4, 'misses': 2, 'hit_rate': 4 / 6.0, 'entries': 1,
+        'max_entries': 2,
+    }
+
+    local.clear()
+    assert local.stats()['hits'] == 0
+    assert local.stats()['entries'] == 0
+
+
+def test_tiered_cache(locmem_cache):
+    """The in-process cache is checked before the cache backend."""
+    tiered = cache.TieredCache(cache.LocalCache(max_entries=10, timeout=60))
+    tiered.set('key', 'value', 60)
+    tiered.backend.delete('key')
+    assert tiered.get('key') == 'value'
+
+    # Values found in the backend are kept in the in-process cache.
+    tiered.local.clear()
+    tiered.backend.set('other', 'value')
+    assert tiered.get('other') == 'value'
+    tiered.backend.delete('other')
+    assert tiered.get('other') == 'value'
+    assert tiered.local.stats()['hits'] == 1
+
+    tiered.delete('key')
+    assert tiered.get('key') is None
+
+
+def test_tiered_cache_disabled():
+    """Nothing is cached in-process when using the dummy cache."""
+    tiered = cache.TieredCache(cache.LocalCache(max_entries=10, timeout=60))
+    tiered.set('key', 'value', 60)
+    assert tiered.get('key') is None
+    assert tiered.local.stats()['entries'] == 0
+
+
+def test_coalesce(locmem_cache):
+    """Concurrent callers for the same key only compute the value once."""
+    tiered = cache.TieredCache(cache.LocalCache(max_entries=10, timeout=60))
+    computed = []
+
+    def get_value():
+        value = tiered.get('key')
+        if value is None:
+            with cache.coalesce('key', tiered):
+                value = tiered.get('key')
+                if value is None:
+                    time.sleep(0.1)
+                    computed.append(1)
+                    value = 'value'
+                    tiered.set('key', value, 60)
+        return value
+
+    threads = [threading.Thread(target=get_value) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert computed == [1]
+
+
+def test_coalesce_across_workers(locmem_cache):
+    """Callers wait on a lock held by another worker in the cache backend."""
+    tiered = cache.TieredCache(cache.LocalCache(max_entries=10, timeout=60))
+    backend = tiered.backend
+    backend.set('nsot:lock:key', 1)
+
+    def other_worker():
+        time.sleep(0.1)
+        backend.set('key', 'value')
+        backend.delete('nsot:lock:key')
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    with cache.coalesce('key', tiered):
+        assert tiered.get('key') == 'value'
+    thread.join()
+
+    # The lock is released once the value is computed.
+    with cache.coalesce('other', tiered):
+        assert backend.get('nsot:lock:other') == 1
+    assert backend.get('nsot:lock:other') is None
+
+
+def test_staticfiles(tmpdir):
+    """Test collecting and serving hashed and gzipped static files."""
+    src = tmpdir.mkdir('static')
+    root = tmpdir.mkdir('staticfiles')
+    src.join('style.css').write('body { color: black; }\n' * 100)
+    src.join('tiny.js').write('var x = 1;\n')
+    src.join('missing.css').write('body { background: url(missing.png); }')
+
+    with override_settings(
+        STATICFILES_DIRS=[str(src)], STATIC_ROOT=str(root),
+        STATICFILES_FINDERS=[
+            'django.contrib.staticfiles.finders.FileSystemFinder'
+        ]
+    ):
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        # Hashed copies of files are created and text files are gzipped if
+        # they're big enough.
+        names = set(os.listdir(str(root)))
+        hashed_css = [
+            n for n in names if n.startswith('style.') and n.endswith('.css')
+            and n != 'style.css'
+        ][0]
+        assert 'style.css.gz' in names
+        assert hashed_css + '.gz' in names
+        assert 'tiny.js.gz' not in names
+        gz = gzip.open(str(root.join(hashed_css + '.gz')))
+        assert gz.read() == src.join('style.css').read()
+
+        # Hashed files are served with far-future caching, gzipped if the
+        # client accepts it.
+        app = staticfiles.Cling(lambda environ, start_response: [])
+
+        def get(name):
+            result = {}
+
+            def start_response(status, headers, *args):
+                result.update(headers)
+                result['status'] = status
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': '/static/' + name,
+                'HTTP_ACCEPT_ENCODING': 'gzip, deflate',
+            }
+            body = b''.join(app(environ, start_response))
+            return result, body
+
+        headers, body = get(hashed_css)
+        assert headers['status'].startswith('200')
+        assert headers['Cache-Control'].startswith('public, max-age=')
+        assert headers['Content-Encoding'] == 'gzip'
+        assert body == root.join(hashed_css + '.gz').read('rb')
+
+        headers, body = get('style.css')
+        assert headers['status'].startswith('200')
+        assert 'Cache-Control' not in headers
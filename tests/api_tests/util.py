@@ -89,6 +89,8 @@ class Client(object):
         if method.lower() in ("put", "post"):
             headers["Content-type"] = "application/json"
 
+        headers.update(kwargs.pop("headers", {}))
+
         from betamax import Betamax
         cassette = sha1(url).hexdigest()  # SHA1 the URI!
         with Betamax(self.session).use_cassette(cassette):
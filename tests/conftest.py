@@ -0,0 +1,18 @@
+"""
+Fixtures shared by the API and model tests.
+"""
+
+from django.test import override_settings
+import pytest
+
+
+@pytest.yield_fixture
+def locmem_cache():
+    """Use a real (local memory) cache backend instead of the dummy cache."""
+    caches = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    with override_settings(CACHES=caches):
+        yield
@@ -5,16 +5,20 @@ import pytest
 # Allow everything in there to access the DB
 pytestmark = pytest.mark.django_db
 
-from django.db import IntegrityError
+from django.db import connection, IntegrityError
 from django.db.models import ProtectedError
 from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.test.utils import CaptureQueriesContext
 import ipaddress
 import logging
 
 from nsot import exc, models
+from nsot.util import cache
 
-from .fixtures import admin_user, device, site, user, transactional_db
+from .fixtures import (
+    admin_user, device, site, user, transactional_db
+)
 
 
 def test_creation(device):
@@ -229,3 +233,63 @@ def _test_parenting(device):
     # Disallow setting non-Interface objects as parent.
 
 # test_retrieve_interfaces
+
+
+def test_cache_invalidation(device, locmem_cache):
+    """Saving an Interface only invalidates cached views that include it."""
+    iface = models.Interface.objects.create(device=device, name='eth0')
+    other_site = device.site_id + 1
+
+    site_version = cache.get_version('Interface', site_id=device.site_id)
+    other_version = cache.get_version('Interface', site_id=other_site)
+    obj_version = cache.get_version('Interface', obj_id=iface.id)
+
+    iface.description = 'changed'
+    iface.save()
+
+    assert cache.get_version('Interface', site_id=device.site_id) != \
+        site_version
+    assert cache.get_version('Interface', site_id=other_site) == other_version
+    assert cache.get_version('Interface', obj_id=iface.id) != obj_version
+
+
+def test_to_dicts(device):
+    """``to_dicts()`` must match ``to_dict()`` exactly."""
+    models.Attribute.objects.create(
+        site=device.site, resource_name='Interface', name='vlan'
+    )
+    models.Network.objects.create(site=device.site, cidr='10.0.0.0/24')
+    models.Network.objects.create(site=device.site, cidr='2001:db8::/64')
+    eth0 = models.Interface.objects.create(
+        device=device, name='eth0', mac_address='00:de:ad:be:ef:00',
+        attributes={'vlan': '100'}, addresses=['10.0.0.1/32']
+    )
+    models.Interface.objects.create(
+        device=device, name='eth0.100', parent=eth0,
+        addresses=['2001:db8::1/128']
+    )
+
+    for model in (models.Device, models.Network, models.Interface):
+        queryset = model.objects.order_by('id')
+        expected = [obj.to_dict() for obj in queryset]
+        assert list(model.to_dicts(queryset)) == expected
+
+
+def test_to_dicts_keys(device):
+    """Only the columns of the selected keys are fetched."""
+    models.Interface.objects.create(
+        device=device, name='eth0', mac_address='00:de:ad:be:ef:00'
+    )
+    queryset = models.Interface.objects.all()
+
+    with CaptureQueriesContext(connection) as ctx:
+        out = list(
+            models.Interface.to_dicts(queryset, keys=['name', 'mac_address'])
+        )
+    assert out == [{'name': 'eth0', 'mac_address': '00:DE:AD:BE:EF:00'}]
+    assert len(ctx.captured_queries) == 1
+    sql = ctx.captured_queries[0]['sql']
+    assert '_attributes_cache' not in sql
+    assert '_addresses_cache' not in sql
+
+    assert list(models.Interface.to_dicts(queryset, keys=[])) == [{}]
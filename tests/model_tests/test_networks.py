@@ -12,6 +12,7 @@ import ipaddress
 import logging
 
 from nsot import exc, models
+from nsot.util import cache
 
 from .fixtures import admin_user, user, site, transactional_db
 
@@ -67,6 +68,127 @@ def test_seqential_creation(site):
     assert net_8.id == net_22_3.parent_id
 
 
+def test_bulk_create_networks(site):
+    """Test that bulk creation sets the same parents as saving each one."""
+    models.Attribute.objects.create(
+        site=site, resource_name='Network', name='vlan'
+    )
+    net_8 = models.Network.objects.create(site=site, cidr=u'10.0.0.0/8')
+    net_24 = models.Network.objects.create(site=site, cidr=u'10.1.2.0/24')
+    ip = models.Network.objects.create(site=site, cidr=u'10.1.2.3/32')
+    v6 = models.Network.objects.create(site=site, cidr=u'2001:db8::/32')
+
+    cidrs = [
+        u'10.1.2.4/32', u'10.1.0.0/16', u'10.1.2.0/25', u'2001:db8:1::/48',
+        u'10.2.0.0/16',
+    ]
+    items = [
+        (cidr, {'cidr': cidr, 'site_id': site.id}) for cidr in cidrs
+    ]
+    items[1][1]['attributes'] = {'vlan': '300'}
+    result = models.Network.objects.bulk_create_networks(items, chunk_size=1)
+    assert result.errors == []
+    assert [n.cidr for n in result.created] == [
+        u'10.1.2.4/32', u'10.1.0.0/16', u'10.1.2.0/25',
+        u'2001:0db8:0001:0000:0000:0000:0000:0000/48', u'10.2.0.0/16',
+    ]
+
+    by_cidr = {
+        n.cidr: n for n in models.Network.objects.filter(site=site)
+    }
+    created = [by_cidr[n.cidr] for n in result.created]
+    assert [n.id for n in created] == [n.id for n in result.created]
+    assert [n.parent_id for n in created] == [
+        created[2].id, net_8.id, net_24.id, v6.id, net_8.id
+    ]
+    assert [n.to_dict() for n in created] == [
+        n.to_dict() for n in result.created
+    ]
+    assert created[1].get_attributes() == {'vlan': '300'}
+    assert created[1].attributes.get().value == '300'
+
+    # Existing networks inside the new ones are reparented.
+    net_24.refresh_from_db()
+    ip.refresh_from_db()
+    assert net_24.parent_id == created[1].id
+    assert ip.parent_id == created[2].id
+
+
+def test_bulk_create_networks_errors(site):
+    items = [
+        (0, {'cidr': u'10.0.0.0/8', 'site_id': site.id}),
+        (1, {'cidr': u'10.0.0.0/8', 'site_id': site.id}),
+        (2, {'cidr': u'11.0.0.1/32', 'site_id': site.id}),
+        (3, {'cidr': u'10.0.0.1/8', 'site_id': site.id}),
+        (4, {'cidr': u'10.0.0.1/32', 'site_id': site.id + 1}),
+        (5, {'cidr': u'10.0.0.1/32', 'site_id': site.id}),
+    ]
+    with pytest.raises(exc.ValidationError):
+        models.Network.objects.bulk_create_networks(items)
+    with pytest.raises(exc.Conflict):
+        models.Network.objects.bulk_create_networks(items[:2])
+    assert not models.Network.objects.exists()
+
+    result = models.Network.objects.bulk_create_networks(items, partial=True)
+    assert [n.cidr for n in result.created] == [u'10.0.0.0/8', u'10.0.0.1/32']
+    assert [
+        (key, type(err)) for key, err in sorted(result.errors)
+    ] == [
+        (1, exc.Conflict), (2, exc.ValidationError),
+        (3, exc.ValidationError), (4, exc.ValidationError),
+    ]
+    assert models.Network.objects.count() == 2
+
+
+def test_delete_plan(site, admin_user, locmem_cache):
+    """Test deleting Networks with a DeletePlan."""
+    models.Attribute.objects.create(
+        site=site, resource_name='Network', name='vlan'
+    )
+    net_8 = models.Network.objects.create(site=site, cidr=u'10.0.0.0/8')
+    net_24 = models.Network.objects.create(
+        site=site, cidr=u'10.1.0.0/24', attributes={'vlan': '100'}
+    )
+    device = models.Device.objects.create(site=site, hostname='foo-bar1')
+    iface = models.Interface.objects.create(
+        device=device, name='eth0', addresses=[u'10.0.0.1/32', u'10.0.0.2/32']
+    )
+    address = models.Network.objects.get_by_address(u'10.0.0.1/32')
+
+    # Networks can't be deleted without their children.
+    with pytest.raises(exc.Conflict):
+        models.DeletePlan(models.Network, [net_8.id])
+    with pytest.raises(exc.NotFound):
+        models.DeletePlan(models.Network, [net_8.id], site_id=site.id + 1)
+
+    plan = models.DeletePlan(models.Network, [net_24.id, address.id])
+    assert plan.updated_interface_ids == [iface.id]
+    assert plan.orphaned_ids == []
+    versions = cache.get_versions([
+        ('Network', site.id, None), ('Interface', None, iface.id),
+        ('Device', None, device.id),
+    ])
+    plan.execute(admin_user)
+
+    # Only the cache of what changed is invalidated.
+    after = cache.get_versions([
+        ('Network', site.id, None), ('Interface', None, iface.id),
+        ('Device', None, device.id),
+    ])
+    assert [v != a for v, a in zip(versions, after)] == [True, True, False]
+    assert not models.Value.objects.filter(
+        resource_name='Network', resource_id=net_24.id
+    ).exists()
+
+    assert list(models.Network.objects.all()) == [
+        net_8, models.Network.objects.get_by_address(u'10.0.0.2/32')
+    ]
+    iface.refresh_from_db()
+    assert iface.get_addresses() == [u'10.0.0.2/32']
+    assert iface.get_networks() == [u'10.0.0.0/8']
+    assert models.Change.objects.filter(event='Delete').count() == 2
+
+
 def test_network_create_hostbits_set(site):
     with pytest.raises(exc.ValidationError):
         models.Network.objects.create(site=site, cidr=u'10.0.0.0/0')
@@ -289,3 +411,23 @@ def test_reservation(site):
 
     addresses = [u'192.168.3.1/32', u'192.168.3.2/32', u'192.168.3.3/32']
     assert reserved.get_next_address(num=3, as_objects=False) == addresses
+
+
+def test_cache_invalidation(site, locmem_cache):
+    """Reparenting and attribute changes invalidate cached Networks."""
+    models.Attribute.objects.create(
+        site=site, resource_name='Network', name='owner'
+    )
+    child = models.Network.objects.create(site=site, cidr='10.1.0.0/16')
+    child_version = cache.get_version('Network', obj_id=child.id)
+
+    # Reparenting is done with an update, which doesn't send signals.
+    models.Network.objects.create(site=site, cidr='10.0.0.0/8')
+    assert cache.get_version('Network', obj_id=child.id) != child_version
+
+    # Setting attributes changes the results of set queries.
+    child_version = cache.get_version('Network', obj_id=child.id)
+    site_version = cache.get_version('Network', site_id=site.id)
+    child.set_attributes({'owner': 'jathan'})
+    assert cache.get_version('Network', obj_id=child.id) != child_version
+    assert cache.get_version('Network', site_id=site.id) != site_version